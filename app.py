@@ -1,4 +1,9 @@
-from app import app
+import os
+
+from app import app, start_background_services
 
 if __name__ == '__main__':
-    app.run(debug=True)
\ No newline at end of file
+    # app.run(debug=True) usa el recargador: solo el proceso hijo (el que sirve) arranca los hilos
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        start_background_services(app)
+    app.run(debug=True)
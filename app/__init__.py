@@ -5,7 +5,6 @@ from flask_login import LoginManager
 from flask_bcrypt import Bcrypt
 from .config import Config
 from flask_migrate import Migrate
-from flask_caching import Cache
 
 # =========================================================
 # 0. Cargar variables de entorno
@@ -19,7 +18,6 @@ db = SQLAlchemy()
 login_manager = LoginManager()
 bcrypt = Bcrypt()
 migrate = Migrate()
-cache = Cache(config={'CACHE_TYPE': 'SimpleCache'})
 
 # =========================================================
 # 2. Inicializar la app
@@ -29,7 +27,6 @@ app.config.from_object(Config)
 
 db.init_app(app)
 bcrypt.init_app(app)
-cache.init_app(app)
 
 # --- CONFIGURACIÓN LOGIN ---
 login_manager.init_app(app)
@@ -43,7 +40,7 @@ migrate.init_app(app, db)
 # 3. Importar modelos
 # =========================================================
 # Importar después de inicializar db para evitar referencias circulares
-from app.models import User, Holding, Transaction, SimulationConfig 
+from app.models import User, Holding, Transaction, SimulationConfig, PriceSnapshotRecord, AssetMetadata, AssetView, PortfolioState, PortfolioPosition, PortfolioCheckpoint
 
 # =========================================================
 # 4. Registrar blueprints
@@ -69,7 +66,62 @@ app.register_blueprint(training_bp)
 from app.controllers import IndexController, RegisterController, LoginController
 
 # =========================================================
-# 5. Registrar Filtros de Plantilla (Jinja2)
+# 5. Proveedor de mercado y refresco en segundo plano
+# =========================================================
+from app.market_providers import configure_provider
+configure_provider(app.config)
+
+from app.market_service import configure_execution_quotes
+configure_execution_quotes(app.config)
+
+# Últimos precios buenos conocidos: el arranque en frío sirve precios reales al instante
+from app.last_known_prices import init_last_known_prices
+init_last_known_prices(app)
+
+# Metadatos de activos (nombre, sector...) con TTL largo; el refrescador los precarga
+from app.asset_metadata import init_asset_metadata
+init_asset_metadata(app)
+
+# Tabla de precios compartida: el refrescador elegido escribe, los demás workers leen.
+if app.config.get('SHARED_PRICE_TABLE'):
+    from app.market_service import enable_shared_price_table
+    enable_shared_price_table(app.config['SHARED_PRICE_TABLE_PATH'])
+
+def start_background_services(app):
+    """
+    Arranca los hilos de fondo del servidor. Solo lo llaman los puntos de entrada
+    del servidor (`app.py`, `wsgi.py`): importar el paquete (comandos `flask`,
+    migraciones, scripts) no consulta al proveedor ni toma el lease.
+    """
+    # Mantiene el snapshot caliente para que ninguna petición espere un refresco completo.
+    # Todos los workers arrancan el hilo, pero solo el que gana el lease consulta al proveedor.
+    if app.config.get('MARKET_REFRESHER_ENABLED'):
+        from app.market_service import start_market_refresher
+        start_market_refresher(
+            interval=app.config.get('MARKET_REFRESH_INTERVAL', 600),
+            crypto_interval=app.config.get('MARKET_CRYPTO_REFRESH_INTERVAL', 60),
+            lease_path=app.config.get('MARKET_LEADER_LOCK_PATH')
+        )
+
+    # Precalentamiento priorizado (un solo worker gracias al lock)
+    if app.config.get('MARKET_WARMUP_ON_START'):
+        from app.warmup import start_warmup
+        start_warmup(
+            app,
+            lock_path=app.config.get('MARKET_WARMUP_LOCK_PATH'),
+            workers=app.config.get('MARKET_WARMUP_WORKERS', 8)
+        )
+
+# Precalentamiento priorizado (cartera > más vistos > resto): al servir o con `flask market-warmup`
+from app.warmup import register_warmup
+register_warmup(app)
+
+# Estado materializado de los portfolios y checkpoints: `flask portfolio-state verify|rebuild|checkpoint`
+from app.portfolio_state import register_portfolio_state
+register_portfolio_state(app)
+
+# =========================================================
+# 6. Registrar Filtros de Plantilla (Jinja2)
 # =========================================================
 @app.template_filter('currency')
 def currency_filter(value):
@@ -0,0 +1,145 @@
+"""
+Caché de metadatos de activos (tabla `asset_metadata`), separada de los precios.
+
+Nombre, sector, industria, descripción, capitalización o comisión de un fondo
+cambian como mucho una vez al día; antes se pedían a `ticker.info` en cada vista
+de activo y en cada operación. Aquí se guardan en memoria y en BD con un TTL
+largo: una entrada caducada se sigue sirviendo mientras se renueva en segundo
+plano, de modo que solo un símbolo nunca visto paga la consulta al proveedor.
+"""
+
+import threading
+from datetime import datetime, timezone
+
+from app.price_cache import PriceCache
+
+METADATA_TTL = 86400  # segundos: pasado este tiempo se renueva (pero se sigue sirviendo)
+METADATA_MISS_TTL = 300  # segundos sin volver a preguntar por un símbolo que no devolvió datos
+METADATA_DB_MISS_TTL = 60  # segundos sin volver a buscar en BD un símbolo que no estaba
+
+_app = None
+_metadata = {}  # symbol -> dict
+_lock = threading.Lock()
+# Caché negativa: símbolos inexistentes o fallos del proveedor no se consultan en cada vista
+_misses = PriceCache(max_size=1000, default_ttl=METADATA_MISS_TTL)
+# Símbolos sin fila en BD: get_asset_name pasa por aquí en cada operación y cada página
+_db_misses = PriceCache(default_ttl=METADATA_DB_MISS_TTL)
+
+FIELDS = (
+    'name', 'description', 'sector', 'industry', 'fund_category',
+    'market_cap', 'total_assets', 'expense_ratio', 'ytd_return',
+)
+
+
+def _to_epoch(dt):
+    return dt.replace(tzinfo=timezone.utc).timestamp()
+
+
+def _number(value):
+    try:
+        return float(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def metadata_from_info(info):
+    """Extrae de un `info` del proveedor solo los campos que cambian poco."""
+    return {
+        'name': info.get('longName') or info.get('shortName'),
+        'description': info.get('longBusinessSummary'),
+        'sector': info.get('sector'),
+        'industry': info.get('industry'),
+        'fund_category': info.get('category'),
+        'market_cap': _number(info.get('marketCap')),
+        'total_assets': _number(info.get('totalAssets')),
+        'expense_ratio': _number(info.get('annualReportExpenseRatio')),
+        'ytd_return': _number(info.get('ytdReturn')),
+    }
+
+
+def _record_to_dict(record):
+    data = {field: getattr(record, field) for field in FIELDS}
+    data['fetched_at'] = _to_epoch(record.fetched_at)
+    return data
+
+
+def init_asset_metadata(app):
+    """Carga en memoria los metadatos persistidos. Devuelve cuántos se cargaron."""
+    global _app
+    _app = app
+    from app.models import AssetMetadata
+
+    try:
+        with app.app_context():
+            records = AssetMetadata.query.all()
+    except Exception as e:
+        print(f"⚠️ No se pudieron cargar los metadatos de activos: {e}")
+        return 0
+
+    with _lock:
+        for record in records:
+            _metadata[record.symbol] = _record_to_dict(record)
+    print(f"🗂️ Metadatos de {len(records)} activos cargados")
+    return len(records)
+
+
+def get_cached_metadata(symbol):
+    """Metadatos sin tocar la red (memoria y, si no, BD; otro worker pudo guardarlos), o None."""
+    with _lock:
+        data = _metadata.get(symbol)
+    if data is not None or _app is None or _db_misses.get(symbol) is not None:
+        return data
+
+    from app import db
+    from app.models import AssetMetadata
+    try:
+        with _app.app_context():
+            record = db.session.get(AssetMetadata, symbol)
+            data = _record_to_dict(record) if record else None
+    except Exception as e:
+        print(f"⚠️ Error leyendo metadatos de {symbol}: {e}")
+        return None
+    if data is not None:
+        with _lock:
+            _metadata[symbol] = data
+    else:
+        _db_misses.set(symbol, True)
+    return data
+
+
+def is_metadata_fresh(data, now):
+    return data is not None and now - data['fetched_at'] < METADATA_TTL
+
+
+def record_metadata_miss(symbol):
+    """Anota que el proveedor no dio metadatos de `symbol` (durante METADATA_MISS_TTL)."""
+    _misses.set(symbol, True)
+
+
+def is_metadata_miss(symbol):
+    return _misses.get(symbol) is not None
+
+
+def store_metadata(symbol, data, fetched_at):
+    """Guarda en memoria y en BD los metadatos de `symbol`."""
+    entry = {**{field: data.get(field) for field in FIELDS}, 'fetched_at': fetched_at}
+    with _lock:
+        _metadata[symbol] = entry
+    _misses.delete(symbol)
+    _db_misses.delete(symbol)
+    if _app is None:
+        return entry
+
+    from app import db
+    from app.models import AssetMetadata
+    try:
+        with _app.app_context():
+            record = db.session.get(AssetMetadata, symbol) or AssetMetadata(symbol=symbol)
+            for field in FIELDS:
+                setattr(record, field, entry[field])
+            record.fetched_at = datetime.fromtimestamp(fetched_at, tz=timezone.utc).replace(tzinfo=None)
+            db.session.add(record)
+            db.session.commit()
+    except Exception as e:
+        print(f"❌ Error guardando metadatos de {symbol}: {e}")
+    return entry
@@ -0,0 +1,207 @@
+"""
+Índice de búsqueda de activos por símbolo y nombre (autocompletado).
+
+Antes la página del mercado pintaba el universo entero y el navegador filtraba
+las tarjetas con `includes`. Aquí el servidor responde con un índice construido
+una sola vez al cargar el universo:
+
+- Trie de prefijos sobre el símbolo y cada palabra del nombre. Cada nodo guarda
+  ya sus mejores candidatos (como mucho `MAX_PER_NODE`), así que una consulta
+  solo recorre tantos nodos como caracteres tiene, sin explorar el subárbol.
+- Lista invertida por palabra del nombre (palabras ordenadas + ids): una consulta
+  de varias palabras, o una cuyo nodo del trie está lleno, intersecta los ids de
+  todas las palabras que empiezan por cada término, sin perder coincidencias por
+  el tope de `MAX_PER_NODE`.
+- Índice de trigramas para tolerar erratas ("nvidai", "etherium"): las listas
+  de cada trigrama son arrays numpy y los aciertos por activo se cuentan con
+  `np.bincount`. La similitud es el coeficiente de Dice entre los conjuntos de
+  trigramas.
+
+Los resultados de prefijo van primero (símbolo exacto, prefijo de símbolo,
+prefijo de nombre) y el resto se completa con los difusos.
+"""
+
+import bisect
+import re
+import threading
+import unicodedata
+
+import numpy as np
+
+MAX_PER_NODE = 32         # candidatos guardados en cada nodo del trie
+MIN_SIMILARITY = 0.3      # Dice mínimo para un resultado difuso
+DEFAULT_LIMIT = 10
+
+_NON_ALNUM = re.compile(r'[^a-z0-9]+')
+
+
+def normalize(text):
+    """Minúsculas, sin acentos y con cualquier separador convertido en un espacio."""
+    text = unicodedata.normalize('NFKD', text or '').encode('ascii', 'ignore').decode()
+    return _NON_ALNUM.sub(' ', text.lower()).strip()
+
+
+def trigrams(text):
+    """Trigramas de cada palabra con relleno (' ap', 'app', ..., 'le ')."""
+    grams = set()
+    for word in text.split():
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+class PrefixTrie:
+    """Trie de caracteres; cada nodo es (hijos, ids con ese prefijo ya ordenados)."""
+
+    def __init__(self):
+        self._root = ({}, [])
+
+    def insert(self, key, asset_id):
+        """Los ids deben insertarse en orden creciente de relevancia (0 = el mejor)."""
+        node = self._root
+        for char in key:
+            child = node[0].get(char)
+            if child is None:
+                child = node[0][char] = ({}, [])
+            node = child
+            ids = node[1]
+            # Un mismo activo entra por varias claves: si ya está, es el último añadido
+            if len(ids) < MAX_PER_NODE and (not ids or ids[-1] != asset_id):
+                ids.append(asset_id)
+
+    def lookup(self, prefix):
+        node = self._root
+        for char in prefix:
+            node = node[0].get(char)
+            if node is None:
+                return []
+        return node[1]
+
+
+class TrigramIndex:
+    """Listas invertidas trigrama -> ids (arrays numpy) y número de trigramas por documento."""
+
+    def __init__(self, documents):
+        postings = {}
+        self.sizes = np.zeros(len(documents), dtype=np.int32)
+        for asset_id, text in enumerate(documents):
+            grams = trigrams(text)
+            self.sizes[asset_id] = len(grams)
+            for gram in grams:
+                postings.setdefault(gram, []).append(asset_id)
+        self.postings = {gram: np.array(ids, dtype=np.int32) for gram, ids in postings.items()}
+
+    def search(self, text, limit, min_similarity=MIN_SIMILARITY):
+        """[(id, similitud)] de los documentos más parecidos a `text`, de mayor a menor."""
+        grams = trigrams(text)
+        lists = [self.postings[g] for g in grams if g in self.postings]
+        if not lists:
+            return []
+        hits = np.bincount(np.concatenate(lists), minlength=len(self.sizes))
+        candidates = np.flatnonzero(hits)
+        scores = 2.0 * hits[candidates] / (len(grams) + self.sizes[candidates])
+        keep = scores >= min_similarity
+        candidates, scores = candidates[keep], scores[keep]
+        if len(candidates) > limit:
+            top = np.argpartition(-scores, limit)[:limit]
+            candidates, scores = candidates[top], scores[top]
+        order = np.lexsort((candidates, -scores))
+        return list(zip(candidates[order].tolist(), scores[order].tolist()))
+
+
+class WordIndex:
+    """Palabras ordenadas con los ids de los activos que las contienen (contiguos por palabra)."""
+
+    def __init__(self, words_by_id):
+        postings = {}
+        for asset_id, words in enumerate(words_by_id):
+            for word in set(words):
+                postings.setdefault(word, []).append(asset_id)
+        self.words = sorted(postings)
+        lengths = [len(postings[w]) for w in self.words]
+        self.offsets = np.concatenate(([0], np.cumsum(lengths))).astype(np.int64)
+        self.ids = np.array([i for w in self.words for i in postings[w]], dtype=np.int32)
+
+    def prefix_ids(self, prefix):
+        """Ids (ordenados, sin repetir) de los activos con alguna palabra que empieza por `prefix`."""
+        lo = bisect.bisect_left(self.words, prefix)
+        hi = bisect.bisect_left(self.words, prefix + '\uffff', lo)
+        return np.unique(self.ids[self.offsets[lo]:self.offsets[hi]])
+
+
+class AssetSearchIndex:
+    """Búsqueda de activos por prefijo (símbolo, nombre, palabras) con respaldo difuso."""
+
+    def __init__(self, assets):
+        # Relevancia base: símbolos cortos primero y, a igualdad, el orden del universo
+        self.assets = sorted(assets, key=lambda a: len(a['symbol']))
+        self.symbols = PrefixTrie()
+        self.names = PrefixTrie()
+        self._symbol_id = {}
+        self._words = []
+        documents = []
+        for asset_id, asset in enumerate(self.assets):
+            symbol = normalize(asset['symbol'])
+            name = normalize(asset['name'])
+            self._symbol_id[symbol] = asset_id
+            self.symbols.insert(symbol, asset_id)
+            if ' ' in symbol:
+                self.symbols.insert(symbol.replace(' ', ''), asset_id)  # 'btc usd' y 'btcusd'
+            words = name.split()
+            self._words.append(words)
+            for word in words:
+                self.names.insert(word, asset_id)
+            documents.append(f"{symbol} {name}")
+        self.trigrams = TrigramIndex(documents)
+        self.words = WordIndex(self._words)
+
+    def search(self, query, limit=DEFAULT_LIMIT):
+        """Hasta `limit` activos para `query`, cada uno con `match`: symbol, prefix, name o fuzzy."""
+        text = normalize(query)
+        if not text:
+            return []
+
+        results, seen = [], set()
+
+        def add(asset_id, match, score):
+            if asset_id not in seen and len(results) < limit:
+                seen.add(asset_id)
+                results.append((asset_id, match, score))
+
+        exact = self._symbol_id.get(text)
+        if exact is not None:
+            add(exact, 'symbol', 1.0)
+        for asset_id in self.symbols.lookup(text):
+            add(asset_id, 'prefix', 1.0)
+        terms = text.split()
+        by_name = self.names.lookup(terms[0])
+        if len(terms) > 1 or len(by_name) >= MAX_PER_NODE:
+            # Varias palabras o nodo lleno: intersección de las listas invertidas de cada término
+            ids = self.words.prefix_ids(terms[0])
+            for term in terms[1:]:
+                ids = np.intersect1d(ids, self.words.prefix_ids(term), assume_unique=True)
+            by_name = ids[:limit + len(results)].tolist()
+        for asset_id in by_name:
+            add(asset_id, 'name', 1.0)
+        if len(results) < limit:
+            for asset_id, score in self.trigrams.search(text, limit + len(results)):
+                add(asset_id, 'fuzzy', round(score, 3))
+
+        return [
+            {**self.assets[asset_id], 'match': match, 'score': score}
+            for asset_id, match, score in results
+        ]
+
+
+_index = None
+_index_lock = threading.Lock()
+
+def get_search_index():
+    """Índice del universo de activos, construido en el primer uso."""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                from app.universe import universe
+                _index = AssetSearchIndex(universe.assets)
+    return _index
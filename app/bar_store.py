@@ -0,0 +1,141 @@
+"""
+Almacén local de velas OHLCV (SQLite).
+
+Cada serie (símbolo + intervalo) se descarga completa una sola vez y después
+solo se completa con las velas posteriores a su último timestamp guardado.
+Los gráficos de `asset_detail.html` se sirven desde aquí sin tocar la red.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+
+DEFAULT_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'instance', 'market_bars.db'
+)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS bars (
+    symbol   TEXT    NOT NULL,
+    interval TEXT    NOT NULL,
+    ts       INTEGER NOT NULL,
+    open     REAL,
+    high     REAL,
+    low      REAL,
+    close    REAL    NOT NULL,
+    volume   REAL,
+    PRIMARY KEY (symbol, interval, ts)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS series (
+    symbol     TEXT NOT NULL,
+    interval   TEXT NOT NULL,
+    tz         TEXT,
+    last_fetch REAL NOT NULL DEFAULT 0,
+    PRIMARY KEY (symbol, interval)
+) WITHOUT ROWID;
+"""
+
+
+class BarStore:
+    """Series OHLCV por (symbol, interval) con timestamps en segundos epoch (UTC)."""
+
+    def __init__(self, path=DEFAULT_PATH):
+        self.path = path
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        self._conn.commit()
+
+    # ------------------------------------------------------------------
+    # Metadatos de la serie
+    # ------------------------------------------------------------------
+    def series_info(self, symbol, interval):
+        """Devuelve {'tz', 'last_fetch', 'last_ts'} o None si la serie no existe."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT tz, last_fetch FROM series WHERE symbol = ? AND interval = ?",
+                (symbol, interval),
+            ).fetchone()
+            if row is None:
+                return None
+            last_ts = self._conn.execute(
+                "SELECT MAX(ts) FROM bars WHERE symbol = ? AND interval = ?",
+                (symbol, interval),
+            ).fetchone()[0]
+        return {'tz': row[0], 'last_fetch': row[1], 'last_ts': last_ts}
+
+    def last_timestamp(self, symbol, interval):
+        info = self.series_info(symbol, interval)
+        return info['last_ts'] if info else None
+
+    # ------------------------------------------------------------------
+    # Escritura
+    # ------------------------------------------------------------------
+    def append(self, symbol, interval, rows, tz=None):
+        """
+        Inserta velas `(ts, open, high, low, close, volume)`.
+        Las velas ya existentes se reemplazan (la última suele estar aún formándose).
+        """
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO bars (symbol, interval, ts, open, high, low, close, volume) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                ((symbol, interval, *row) for row in rows),
+            )
+            self._conn.execute(
+                "INSERT INTO series (symbol, interval, tz, last_fetch) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(symbol, interval) DO UPDATE SET "
+                "tz = COALESCE(excluded.tz, series.tz), last_fetch = excluded.last_fetch",
+                (symbol, interval, tz, time.time()),
+            )
+            self._conn.commit()
+
+    def prune(self, symbol, interval, older_than_ts):
+        """Elimina velas anteriores a `older_than_ts` (retención de series intradía)."""
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM bars WHERE symbol = ? AND interval = ? AND ts < ?",
+                (symbol, interval, older_than_ts),
+            )
+            self._conn.commit()
+
+    # ------------------------------------------------------------------
+    # Lectura
+    # ------------------------------------------------------------------
+    def read(self, symbol, interval, limit=None, since_ts=None):
+        """
+        Devuelve las velas en orden cronológico como lista de `(ts, close)`.
+        `limit` se queda con las N más recientes.
+        """
+        query = "SELECT ts, close FROM bars WHERE symbol = ? AND interval = ?"
+        params = [symbol, interval]
+        if since_ts is not None:
+            query += " AND ts >= ?"
+            params.append(since_ts)
+        query += " ORDER BY ts DESC"
+        if limit:
+            query += " LIMIT ?"
+            params.append(int(limit))
+
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        rows.reverse()
+        return rows
+
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_bar_store():
+    """Instancia compartida del almacén (ruta configurable con BAR_STORE_PATH)."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = BarStore(os.getenv('BAR_STORE_PATH', DEFAULT_PATH))
+    return _store
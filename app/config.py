@@ -7,6 +7,57 @@ class Config:
     # Configuración de SQLite para desarrollo (datos no persistentes en Render)
     SQLALCHEMY_DATABASE_URI = os.getenv('DATABASE_URL', 'sqlite:///site.db')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+    # Proveedor de datos de mercado: 'yfinance', 'record' (graba), 'replay' o 'synthetic' (sin red)
+    MARKET_DATA_PROVIDER = os.getenv('MARKET_DATA_PROVIDER', 'yfinance')
+    MARKET_RECORDINGS_DIR = os.getenv('MARKET_RECORDINGS_DIR', 'instance/market_recordings')
+    MARKET_REPLAY_LATENCY = float(os.getenv('MARKET_REPLAY_LATENCY', '0'))  # segundos por llamada
+
+    # Protección del proveedor real: límite de tasa, reintentos y circuit breaker
+    MARKET_PROVIDER_GUARD = os.getenv('MARKET_PROVIDER_GUARD', '1') == '1'
+    MARKET_RATE_LIMIT = float(os.getenv('MARKET_RATE_LIMIT', '5'))          # llamadas/segundo
+    MARKET_RATE_BURST = int(os.getenv('MARKET_RATE_BURST', '10'))
+    MARKET_BREAKER_THRESHOLD = int(os.getenv('MARKET_BREAKER_THRESHOLD', '5'))  # fallos seguidos
+    MARKET_BREAKER_RESET = int(os.getenv('MARKET_BREAKER_RESET', '60'))     # segundos abierto
+    MARKET_MAX_RETRIES = int(os.getenv('MARKET_MAX_RETRIES', '2'))
+
+    # Antigüedad máxima (s) de la cotización con la que se ejecuta una orden
+    EXECUTION_QUOTE_MAX_AGE_CRYPTO = int(os.getenv('EXECUTION_QUOTE_MAX_AGE_CRYPTO', '15'))
+    EXECUTION_QUOTE_MAX_AGE = int(os.getenv('EXECUTION_QUOTE_MAX_AGE', '60'))  # acciones, ETFs...
+
+    # Mercado sintético (MARKET_DATA_PROVIDER='synthetic')
+    SYNTHETIC_SEED = int(os.getenv('SYNTHETIC_SEED', '0'))
+    SYNTHETIC_TICK_SECONDS = int(os.getenv('SYNTHETIC_TICK_SECONDS', '60'))
+    SYNTHETIC_START_DATE = os.getenv('SYNTHETIC_START_DATE', '2015-01-01')  # profundidad del histórico
+
+    # Refresco del snapshot de mercado en segundo plano (solo al servir: app.py / wsgi.py)
+    MARKET_REFRESHER_ENABLED = os.getenv('MARKET_REFRESHER_ENABLED', '1') == '1'
+    # Cadencia según el calendario de mercado: bolsa solo con la sesión abierta,
+    # crypto 24/7 y fondos una vez al día tras publicar el NAV
+    MARKET_REFRESH_INTERVAL = int(os.getenv('MARKET_REFRESH_INTERVAL', '600'))  # segundos, sesión abierta
+    MARKET_CRYPTO_REFRESH_INTERVAL = int(os.getenv('MARKET_CRYPTO_REFRESH_INTERVAL', '60'))  # segundos
+
+    # Lease para elegir un único proceso refrescador por host
+    MARKET_LEADER_LOCK_PATH = os.getenv('MARKET_LEADER_LOCK_PATH', 'instance/market_refresher.lock')
+
+    # Precalentamiento priorizado al arrancar el servidor (un solo worker); también `flask market-warmup`
+    MARKET_WARMUP_ON_START = os.getenv('MARKET_WARMUP_ON_START', '1') == '1'
+    MARKET_WARMUP_WORKERS = int(os.getenv('MARKET_WARMUP_WORKERS', '8'))
+    MARKET_WARMUP_LOCK_PATH = os.getenv('MARKET_WARMUP_LOCK_PATH', 'instance/market_warmup.lock')
+
+    # Stream SSE de precios (/market/stream). Cada conexión ocupa un hilo del worker, así que
+    # solo se activa con workers con hilos o asíncronos (gevent); sin él las páginas sondean
+    # /market/data/live. Por encima del límite de conexiones se responde 503.
+    MARKET_PRICE_STREAM = os.getenv('MARKET_PRICE_STREAM', '0') == '1'
+    MARKET_STREAM_MAX_CLIENTS = int(os.getenv('MARKET_STREAM_MAX_CLIENTS', '32'))
+
+    # Tabla de precios compartida entre workers (fichero mapeado en memoria).
+    # Solo el refrescador elegido escribe; el resto lee.
+    SHARED_PRICE_TABLE = os.getenv('SHARED_PRICE_TABLE', '1') == '1'
+    SHARED_PRICE_TABLE_PATH = os.getenv('SHARED_PRICE_TABLE_PATH', 'instance/price_table.mmap')
+
+    # Checkpoint del ledger de cada usuario cada N operaciones (reconstruir = aplicar la cola)
+    PORTFOLIO_CHECKPOINT_INTERVAL = int(os.getenv('PORTFOLIO_CHECKPOINT_INTERVAL', '500'))
     
     # ----------------------------------------------------------------------
     # IMPORTANTE: Configuración para PostgreSQL en Render
@@ -2,6 +2,8 @@ from flask import Blueprint, render_template, request, redirect, url_for, flash,
 from flask_login import login_required, current_user
 from app import app
 from app.models import db, User
+from app.price_cache import price_cache
+from app.market_providers import get_provider
 
 # Blueprint de administración, todo lo relacionado con gestión de usuarios va por aquí.
 admin_bp = Blueprint('admin', __name__, url_prefix='/admin')
@@ -34,3 +36,15 @@ def toggle_user_status(user_id):
     action = "activada" if user.is_active else "desactivada"
     flash(f'Cuenta {action} correctamente.', 'success')
     return redirect(url_for('admin_users'))
+
+@admin_bp.route('/admin/cache/stats')
+@login_required
+def cache_stats():
+    # Contadores de la caché de precios (aciertos, fallos, expulsiones), solo admins.
+    if current_user.role != 'admin':
+        return jsonify({'error': 'Unauthorized'}), 403
+    provider = get_provider()
+    stats = price_cache.stats()
+    if hasattr(provider, 'stats'):
+        stats['provider'] = provider.stats()
+    return jsonify(stats)
@@ -1,55 +1,34 @@
-from flask import Blueprint, render_template, jsonify, request
+from flask import Blueprint, current_app, render_template, jsonify, request
 from flask_login import login_required, current_user
 from app.models import Holding, Transaction, SimulationConfig
 from sqlalchemy import desc
 from datetime import datetime, timedelta
-import yfinance as yf
-import time
 import concurrent.futures
-from app import cache
 
 # Motor de simulación financiera con métricas
 from app.domain import financial_engine
 
 # Blueprint del dashboard: aquí centralizo todo lo que muestra datos del portafolio.
-from app.market_service import get_simple_chart_data, get_portfolio_historical_value
-
-# Caché para precios de activos
-price_cache = {}
-CACHE_DURATION = 600  # 10 minutos
+from app.market_service import get_price
+from app.portfolio_history import portfolio_chart_data
+from app.portfolio_state import default_initial_capital
 
 def get_cached_price(symbol):
-    """Obtiene precio con caché para evitar llamadas repetidas a yfinance"""
-    now = time.time()
-    if symbol in price_cache and now - price_cache[symbol]['timestamp'] < CACHE_DURATION:
-        return price_cache[symbol]['price']
-    
-    try:
-        ticker = yf.Ticker(symbol)
-        info = ticker.info
-        price = info.get('currentPrice') or info.get('regularMarketPrice') or info.get('navPrice')
-        if price:
-            price_cache[symbol] = {'price': float(price), 'timestamp': now}
-            return float(price)
-    except Exception as e:
-        print(f"Error obteniendo precio para {symbol}: {e}")
-    
-    return 0.0
+    """Obtiene precio desde la caché unificada de precios (compartida con mercado y operaciones)"""
+    return get_price(symbol)
 
 dashboard_bp = Blueprint('dashboard', __name__, url_prefix='/dashboard')
 
-def make_dashboard_cache_key():
-    return f"dashboard_data_{current_user.id}_{request.args.get('timeframe', 'Todo')}"
-
 def get_dashboard_data(user, timeframe='TODO'):
     """Función helper para calcular datos del dashboard"""
     timeframe = timeframe.upper()
     
     holdings = Holding.query.filter_by(user_id=user.id).all()
+    initial_capital = default_initial_capital()
     
-    # Si no tiene inversiones, devuelvo un gráfico vacío pero coherente.
+    # Si no tiene inversiones, el gráfico sigue mostrando su histórico (efectivo).
     if not holdings:
-        chart_data = get_simple_chart_data(float(user.capital), timeframe=timeframe)
+        chart_data = portfolio_chart_data(user, initial_capital, timeframe)
         return {
             'summary': {
                 'portfolio_value': 0,
@@ -84,7 +63,7 @@ def get_dashboard_data(user, timeframe='TODO'):
     holdings_updates = {}
 
     for h in holdings:
-        # Si yfinance falla, uso el precio de compra como plan B.
+        # get_price ya cae al último precio conocido; el de compra solo si nunca se cotizó.
         current_price = live_prices.get(h.symbol, h.purchase_price)
         if current_price <= 0:
             current_price = h.purchase_price
@@ -112,19 +91,14 @@ def get_dashboard_data(user, timeframe='TODO'):
     current_capital = float(user.capital)
     total_capital = current_capital + valor_portafolio
 
-    # Capital inicial fijo (podrías hacerlo configurable luego).
-    initial_capital = 10000.00
     overall_pnl = total_capital - initial_capital
     overall_pnl_pct = (overall_pnl / initial_capital * 100) if initial_capital > 0 else 0
 
     # ==========================
     # Gráfico (usa timeframe)
     # ==========================
-    # Si tienes implementado el histórico real del portafolio, aquí se usaría.
-    # chart_data = get_portfolio_historical_value(holdings, current_capital, timeframe)
-
-    # Por ahora usamos la función simple para que siempre funcione.
-    chart_data = get_simple_chart_data(total_capital, timeframe=timeframe)
+    # Histórico real: ledger + cierres diarios (ver app/portfolio_history.py)
+    chart_data = portfolio_chart_data(user, initial_capital, timeframe)
 
     return {
         'summary': {
@@ -158,11 +132,8 @@ def dashboard():
     # Generar datos enriquecidos del dashboard
     try:
         dashboard_data = financial_engine.generate_dashboard_data(current_user, config)
-        print(f"Dashboard data generated: {bool(dashboard_data)} keys: {list(dashboard_data.keys()) if dashboard_data else 'None'}")
-    except Exception as e:
-        print(f"Error generando dashboard data: {e}")
-        import traceback
-        traceback.print_exc()
+    except Exception:
+        current_app.logger.exception('Error generando dashboard data')
         dashboard_data = {}
     
     # Último movimiento
@@ -177,24 +148,30 @@ def dashboard():
     
     # Data inicial para JavaScript (compatible con updateUI)
     # Necesitamos crear la estructura que espera el JavaScript
-    from app.market_service import get_simple_chart_data
-    
-    # Crear datos iniciales en formato API
+    # Crear datos iniciales en formato API (mismo formato que /dashboard/api/data)
+    portfolio = dashboard_data.get('portfolio', {})
+    total_value = portfolio.get('total_portfolio_value', current_user.capital)
     initial_api_data = {
         'summary': {
-            'portfolio_value': dashboard_data.get('portfolio', {}).get('total_invested', 0),
-            'total_capital': dashboard_data.get('portfolio', {}).get('total_portfolio_value', current_user.capital),
+            'portfolio_value': total_value - portfolio.get('cash_available', current_user.capital),
+            'total_capital': total_value,
             'pnl': dashboard_data.get('metrics', {}).get('total_p_and_l', 0),
             'pnl_pct': dashboard_data.get('metrics', {}).get('total_return_pct', 0)
         },
         'holdings_updates': {},
-        'chart_data': get_simple_chart_data(float(dashboard_data.get('portfolio', {}).get('total_portfolio_value', current_user.capital)))
+        'chart_data': portfolio_chart_data(current_user, config.initial_capital or default_initial_capital())
     }
     
+    # Filas de la tabla de inversiones (el JS las identifica por id de Holding)
+    holdings = Holding.query.filter_by(user_id=current_user.id).all()
+    holding_ids = {h.symbol: h.id for h in holdings}
+    
     # Si hay holdings, agregar holdings_updates
     if dashboard_data.get('holdings_detail'):
         for holding in dashboard_data['holdings_detail']:
-            holding_id = f"holding_{holding['symbol']}"  # Crear ID único
+            holding_id = holding_ids.get(holding['symbol'])
+            if holding_id is None:
+                continue
             initial_api_data['holdings_updates'][holding_id] = {
                 'current_price': holding['current_price'],
                 'total_value': holding['current_value'],
@@ -215,6 +192,7 @@ def dashboard():
         dashboard_data=dashboard_data,
         initial_api_data=initial_api_data,
         initial_data=initial_data,
+        holdings=holdings,
         latest_transaction=latest_transaction,
         transaction_history=transaction_history,
         current_capital=current_user.capital,
@@ -226,7 +204,6 @@ def dashboard():
 # ==================================
 @dashboard_bp.route('/api/data')
 @login_required
-@cache.cached(timeout=300, make_cache_key=make_dashboard_cache_key)
 def dashboard_data():
     # Obtengo el timeframe del gráfico que pide el usuario.
     timeframe = request.args.get('timeframe', 'Todo').upper()
@@ -1,15 +1,25 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify
+from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, Response, stream_with_context, current_app, abort
 from flask_login import login_required, current_user
 
 # Servicios del mercado y utilidades que centralizan toda la lógica externa
 from app.market_service import (
-    fetch_live_market_data, 
+    ensure_market_snapshot,
+    live_market_json,
+    live_products,
+    poll_market_snapshot,
+    snapshot_products,
+    snapshot_version,
+    snapshot_etag,
     fetch_historical_data, 
-    fetch_single_asset_details, 
+    get_execution_quote, 
     get_asset_details
 )
 
-from app.utils.utils import MARKET_UNIVERSE 
+from app.universe import universe
+from app.asset_search import get_search_index
+from app.warmup import record_asset_view
+from app.market_stream import broadcaster, format_sse, stream_payload
+from app.portfolio_state import get_ledger_state, lock_user_ledger, record_trade, valuation_prices
 
 # Modelos principales usados en operaciones del mercado
 from app.models import Holding, db, Transaction, User, SimulationConfig
@@ -22,15 +32,14 @@ from app.domain.financial_engine import (
     InvalidOperationError,
     validate_buy_order,
     validate_sell_order,
-    calculate_portfolio_from_transactions,
     calculate_portfolio_metrics,
+    portfolio_from_state,
     generate_extended_buy_feedback,
     generate_extended_sell_feedback
 )
 
 from datetime import datetime
 import time
-import yfinance as yf
 
 # Blueprint para las rutas relacionadas con el mercado y las operaciones
 market_bp = Blueprint('market', __name__, url_prefix='/market')
@@ -39,49 +48,175 @@ market_bp = Blueprint('market', __name__, url_prefix='/market')
 @market_bp.route('/', methods=['GET'])
 @login_required
 def market():
-    # Renderizo la página principal del mercado con la lista de activos disponibles.
+    # Renderizo la página principal del mercado; el filtro por categoría se hace aquí
+    # (índice por categoría del universo), no ocultando tarjetas en el navegador.
+    category = request.args.get('category', 'all')
+    if category not in universe.by_category:
+        category = 'all'
     return render_template(
         'Market/market.html',
-        market_universe=MARKET_UNIVERSE
+        market_universe=universe.in_category(category),
+        categories=[(c, universe.category_label(c)) for c in universe.categories],
+        active_category=category
     )
 
 
+@market_bp.route('/search', methods=['GET'])
+@login_required
+def search_assets():
+    # Autocompletado del buscador: prefijo de símbolo o nombre y, si faltan, coincidencias difusas.
+    query = request.args.get('q', '')
+    limit = min(max(request.args.get('limit', 10, type=int), 1), 50)
+    return jsonify(get_search_index().search(query, limit=limit))
+
+
 @market_bp.route('/data/live', methods=['GET'])
 @login_required
 def get_live_market_data():
     # Devuelve una lista reducida de precios en vivo para actualizar el frontend.
+    # - If-None-Match con el ETag del snapshot actual -> 304 sin cuerpo.
+    # - ?since=<versión> -> {'version', 'full', 'products'} con solo los símbolos que
+    #   cambiaron desde esa versión (o todos, con full=True, si es demasiado antigua).
+    # - ?category=<categoría> -> solo los activos de esa categoría.
     try:
-        products_list, _ = fetch_live_market_data()
-        
-        simplified_data = [
-            {
-                'symbol': p['symbol'],
-                'price': p['price'],
-                'change': p['change'],
-                'category': p.get('category', 'N/A'),
-                'history': p.get('history', [])
-            }
-            for p in products_list
-        ]
-        
-        return jsonify(simplified_data)
+        now = time.time()
+        snapshot, due = ensure_market_snapshot(now)
+        version = snapshot_version(snapshot.timestamp)
+        etag = snapshot_etag(snapshot, due)
+        if request.if_none_match.contains_weak(etag):
+            response = Response(status=304)
+            response.set_etag(etag, weak=True)
+            return response
+
+        since = request.args.get('since', type=int)
+        category = request.args.get('category')
+        in_category = None
+        if category and category != 'all':
+            in_category = [a['symbol'] for a in universe.in_category(category)]
+
+        changed = None
+        if since is not None:
+            current, changed = broadcaster.changed_symbols_since(since)
+            if current != version:
+                changed = None  # el broadcaster ya va por otra versión: mejor enviar todo
+
+        symbols = in_category
+        if changed is not None:
+            symbols = [s for s in in_category if s in changed] if in_category is not None else changed
+
+        if since is None and in_category is None:
+            # Lista completa: el JSON se codifica una vez por versión del snapshot
+            response = Response(live_market_json(snapshot, due, now), mimetype='application/json')
+        elif since is None:
+            response = jsonify(live_products(snapshot, due, now, symbols=symbols))
+        else:
+            products = live_products(snapshot, due, now, symbols=symbols)
+            response = jsonify({'version': version, 'full': changed is None, 'products': products})
+        response.set_etag(etag, weak=True)
+        response.headers['X-Snapshot-Version'] = str(version)
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
         
     except Exception as e:
         print(f"Error en la ruta /data/live: {e}")
         return jsonify({"error": "No se pudieron cargar los datos de cotización."}), 500
 
 
+# Stream SSE: cada cuánto se mira si hay snapshot nuevo en otro worker, latido y vida máxima
+STREAM_POLL_SECONDS = 5
+STREAM_HEARTBEAT_SECONDS = 15
+STREAM_MAX_SECONDS = 30 * 60
+# Con el cupo de conexiones lleno: cuándo volver a intentarlo (el cliente sondea mientras tanto)
+STREAM_BUSY_RETRY_SECONDS = 60
+
+
+def _full_snapshot_event(snapshot):
+    version = snapshot_version(snapshot.timestamp)
+    payload = broadcaster.full_snapshot(
+        version, lambda: [stream_payload(p) for p in snapshot_products(snapshot)]
+    )
+    return version, format_sse(payload, event='snapshot', event_id=version, retry=5000)
+
+
+@market_bp.route('/stream')
+@login_required
+def price_stream():
+    # Server-Sent Events: solo los símbolos cuyo precio cambió desde Last-Event-ID.
+    # Cada refresco del snapshot se codifica una vez y se reparte a todos los clientes.
+    # Cada conexión ocupa un hilo hasta STREAM_MAX_SECONDS: solo con MARKET_PRICE_STREAM
+    # (workers con hilos o gevent) y como mucho MARKET_STREAM_MAX_CLIENTS por worker.
+    if not current_app.config.get('MARKET_PRICE_STREAM'):
+        abort(404)
+    if not broadcaster.subscribe(limit=current_app.config.get('MARKET_STREAM_MAX_CLIENTS')):
+        retry_ms = STREAM_BUSY_RETRY_SECONDS * 1000
+        return Response(
+            f"retry: {retry_ms}\n\n",
+            status=503,
+            mimetype='text/event-stream',
+            headers={'Retry-After': str(STREAM_BUSY_RETRY_SECONDS), 'Cache-Control': 'no-cache'}
+        )
+
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('since')
+    try:
+        last_version = int(last_event_id) if last_event_id else None
+    except ValueError:
+        last_version = None
+
+    def generate():
+        snapshot, _ = ensure_market_snapshot()
+        payload = None
+        if last_version is not None:
+            version, payload = broadcaster.changes_since(last_version)
+        if payload is None:
+            version, event = _full_snapshot_event(snapshot)
+            yield event
+        elif payload != '[]':
+            yield format_sse(payload, event='update', event_id=version, retry=5000)
+
+        started = idle_since = time.time()
+        while time.time() - started < STREAM_MAX_SECONDS:
+            if broadcaster.wait_for_update(version, STREAM_POLL_SECONDS):
+                current, payload = broadcaster.changes_since(version)
+                if payload is None:
+                    version, event = _full_snapshot_event(ensure_market_snapshot()[0])
+                    yield event
+                else:
+                    version = current
+                    if payload != '[]':
+                        yield format_sse(payload, event='update', event_id=version)
+                idle_since = time.time()
+                continue
+
+            # Sin novedades: sincronizar con el refrescador (otro worker) y mantener viva la conexión
+            poll_market_snapshot()
+            if time.time() - idle_since >= STREAM_HEARTBEAT_SECONDS:
+                idle_since = time.time()
+                yield ": keepalive\n\n"
+
+    response = Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+    # Libera el cupo al cerrar la respuesta, también si el generador ni llegó a arrancar
+    response.call_on_close(broadcaster.unsubscribe)
+    return response
+
+
 @market_bp.route('/asset/<string:symbol>')
 @login_required
 def asset_detail(symbol):
     # Vista con la información completa del activo, incluyendo si el usuario lo posee.
     try:
         # Busco la info base del activo desde el universo del mercado.
-        asset_info = next((a for a in MARKET_UNIVERSE if a['symbol'] == symbol), None)
+        asset_info = universe.get(symbol)
         if not asset_info:
             flash(f'Activo {symbol} no encontrado.', 'danger')
             return redirect(url_for('market.market'))
 
+        # Cuenta para la prioridad del precalentamiento de cachés.
+        record_asset_view(symbol)
+
         # Obtengo detalles en tiempo real según su categoría.
         asset_details = get_asset_details(symbol, asset_info['category'])
         if not asset_details:
@@ -113,9 +248,13 @@ def asset_detail(symbol):
 @login_required
 def load_asset_historical_data(symbol, period):
     # Carga histórica bajo demanda, útil para no saturar el dashboard.
+    # ?max_points=N reduce la serie (LTTB) a lo que el gráfico puede pintar.
+    max_points = request.args.get('max_points', type=int)
+    if max_points is not None and max_points < 3:
+        return jsonify({'error': 'max_points debe ser al menos 3'}), 400
     try:
         start_time = time.time()
-        data = fetch_historical_data(symbol, period)
+        data = fetch_historical_data(symbol, period, max_points=max_points)
         load_time = time.time() - start_time
 
         print(f"Datos {period} para {symbol} cargados en {load_time:.2f}s")
@@ -148,7 +287,7 @@ def buy():
             commission_rate=0.0005
         )
         
-        asset_details = fetch_single_asset_details(symbol)
+        asset_details = get_execution_quote(symbol)
         if not asset_details or asset_details['price'] <= 0:
             raise InvalidOperationError(
                 f"Activo {symbol} no disponible o sin precio válido"
@@ -159,9 +298,12 @@ def buy():
         return redirect(url_for('market.asset_detail', symbol=symbol) or url_for('market.market'))
     
     price_per_unit = asset_details['price']
-    asset_name = asset_details.get('name', symbol)
+    asset_name = asset_details.get('name') or symbol
     
     # Step 2: Validar orden mediante engine
+    # Las operaciones del usuario van en serie hasta el commit: dos compras
+    # simultáneas no pueden validar ambas contra el mismo capital
+    user = lock_user_ledger(current_user.id)
     try:
         quantity = float(quantity_input) if quantity_input else None
         amount_to_buy = float(amount_to_buy_input) if amount_to_buy_input else None
@@ -169,17 +311,19 @@ def buy():
         final_quantity, total_cost = validate_buy_order(
             quantity=quantity,
             amount_to_buy=amount_to_buy,
-            capital_available=current_user.capital,
+            capital_available=user.capital,
             price_per_unit=price_per_unit,
             commission_rate=config.commission_rate,
             min_trade_amount=config.min_trade_amount
         )
         
     except (TypeError, ValueError) as e:
+        db.session.rollback()
         flash(f'Entrada inválida: {str(e)}', 'danger')
         return redirect(url_for('market.asset_detail', symbol=symbol) or url_for('market.market'))
     
     except (InsufficientCapitalError, InvalidOperationError) as e:
+        db.session.rollback()
         flash(f'❌ {str(e)}', 'danger')
         return redirect(url_for('market.asset_detail', symbol=symbol) or url_for('market.market'))
     
@@ -199,11 +343,13 @@ def buy():
             price_per_unit=price_per_unit,
             total_amount=total_before_commission,
             commission_amount=commission_amount,
+            quote_age=asset_details['age'],
+            quote_source=asset_details['source'],
             status='executed'
         )
         
         # Actualizar capital del usuario
-        current_user.capital -= total_cost
+        user.capital -= total_cost
         
         # Actualizar o crear holding (compatibilidad con vista existente)
         holding = Holding.query.filter_by(symbol=symbol, user_id=current_user.id).first()
@@ -227,14 +373,13 @@ def buy():
             db.session.add(holding)
         
         db.session.add(new_transaction)
+        # Estado materializado del portfolio: se guarda en el mismo commit que la transacción
+        record_trade(new_transaction, config.initial_capital)
         db.session.commit()
         
         # Step 4: Feedback educativo detallado
-        current_prices = {symbol: price_per_unit}
-        portfolio = financial_engine.calculate_portfolio_from_transactions(
-            current_user.transactions,
-            current_prices
-        )
+        ledger = get_ledger_state(current_user.id, config.initial_capital)
+        portfolio = portfolio_from_state(ledger, valuation_prices(ledger, {symbol: price_per_unit}))
         portfolio_metrics = financial_engine.calculate_portfolio_metrics(
             portfolio,
             initial_capital=config.initial_capital
@@ -293,7 +438,7 @@ def sell():
             return redirect(url_for('dashboard.dashboard'))
         
         # Obtener precio actual
-        asset_details = fetch_single_asset_details(holding.symbol)
+        asset_details = get_execution_quote(holding.symbol)
         if not asset_details or asset_details['price'] <= 0:
             raise InvalidOperationError(
                 f"No se pudo obtener precio válido para {holding.symbol}"
@@ -306,6 +451,13 @@ def sell():
     price_per_unit = asset_details['price']
     
     # Step 3: Validar orden mediante engine
+    # En serie con las demás operaciones del usuario: la posición y el capital se releen con el lock
+    user = lock_user_ledger(current_user.id)
+    holding = Holding.query.filter_by(id=holding_id, user_id=user.id).populate_existing().first()
+    if not holding:
+        db.session.rollback()
+        flash('Posición no encontrada.', 'danger')
+        return redirect(url_for('dashboard.dashboard'))
     try:
         final_quantity, total_proceeds = validate_sell_order(
             quantity_to_sell=quantity_to_sell,
@@ -316,6 +468,7 @@ def sell():
         )
         
     except (InsufficientHoldingsError, InvalidOperationError) as e:
+        db.session.rollback()
         flash(f'❌ {str(e)}', 'danger')
         return redirect(url_for('dashboard.dashboard'))
     
@@ -335,11 +488,13 @@ def sell():
             price_per_unit=price_per_unit,
             total_amount=total_before_commission,
             commission_amount=commission_amount,
+            quote_age=asset_details['age'],
+            quote_source=asset_details['source'],
             status='executed'
         )
         
         # Actualizar capital del usuario
-        current_user.capital += total_proceeds
+        user.capital += total_proceeds
         
         # Actualizar holding
         holding.quantity -= final_quantity
@@ -349,14 +504,12 @@ def sell():
             db.session.delete(holding)
         
         db.session.add(new_transaction)
+        record_trade(new_transaction, config.initial_capital)
         db.session.commit()
         
         # Step 5: Feedback educativo detallado
-        current_prices = {holding.symbol: price_per_unit}
-        portfolio = financial_engine.calculate_portfolio_from_transactions(
-            current_user.transactions,
-            current_prices
-        )
+        ledger = get_ledger_state(current_user.id, config.initial_capital)
+        portfolio = portfolio_from_state(ledger, valuation_prices(ledger, {holding.symbol: price_per_unit}))
         portfolio_metrics = financial_engine.calculate_portfolio_metrics(
             portfolio,
             initial_capital=config.initial_capital
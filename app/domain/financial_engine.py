@@ -10,9 +10,12 @@ Responsabilidad: Lógica pura de operaciones de trading.
 El ledger de transacciones es la única fuente de verdad del estado del portfolio.
 """
 
-from dataclasses import dataclass
+import copy
+from dataclasses import dataclass, field
 from typing import Optional, Dict, List, Tuple
-from datetime import datetime
+from datetime import datetime, timezone
+
+import numpy as np
 
 
 # ========================================================================
@@ -228,101 +231,162 @@ def validate_sell_order(
 # FUNCIONES DE CÁLCULO DESDE LEDGER
 # ========================================================================
 
+@dataclass
+class LedgerState:
+    """
+    Estado materializado del ledger: el resultado de aplicar en orden todas las
+    transacciones hasta `last_transaction_id`. Se actualiza con `apply_transaction`
+    en O(1) por operación; `replay_transactions` lo reconstruye desde cero.
+    """
+    cash: float
+    positions: Dict[str, Dict] = field(default_factory=dict)  # {symbol: {quantity, cost_basis, realized_pnl}}
+    realized_pnl: float = 0.0
+    trade_count: int = 0
+    sell_count: int = 0
+    winning_sell_count: int = 0
+    last_transaction_id: Optional[int] = None
+
+    def copy(self) -> 'LedgerState':
+        return copy.deepcopy(self)
+
+
+def apply_transaction(state: LedgerState, txn) -> LedgerState:
+    """
+    Aplica una transacción al estado (lo modifica y lo devuelve).
+
+    Mismas reglas que el recálculo completo: la compra suma cantidad y coste
+    (con comisión); la venta reduce el coste de forma proporcional a las
+    unidades vendidas y el P&L realizado es el ingreso neto menos ese coste.
+    """
+    position = state.positions.setdefault(
+        txn.symbol, {'quantity': 0.0, 'cost_basis': 0.0, 'realized_pnl': 0.0}
+    )
+
+    if txn.type == 'BUY':
+        position['quantity'] += txn.quantity
+        position['cost_basis'] += txn.total_cost  # incluye comisión
+        state.cash -= txn.total_cost
+
+    elif txn.type == 'SELL':
+        held_before = position['quantity']
+        cost_before = position['cost_basis']
+        position['quantity'] -= txn.quantity
+        if position['quantity'] > 0:
+            position['cost_basis'] *= (1 - txn.quantity / held_before)
+        else:
+            position['cost_basis'] = 0.0
+
+        proceeds = txn.total_amount - txn.commission_amount
+        realized = proceeds - (cost_before - position['cost_basis'])
+        position['realized_pnl'] += realized
+        state.realized_pnl += realized
+        state.cash += proceeds
+        state.sell_count += 1
+        if realized > 0:
+            state.winning_sell_count += 1
+
+    state.trade_count += 1
+    if txn.id is not None:
+        state.last_transaction_id = txn.id
+    return state
+
+
+def replay_transactions(
+    user_transactions: List,
+    initial_capital: float = 10000.0,
+    state: Optional[LedgerState] = None
+) -> LedgerState:
+    """
+    Estado del ledger tras aplicar `user_transactions` en orden de id, partiendo
+    de `state` o, si no se da, de un portfolio vacío con `initial_capital`.
+    """
+    if state is None:
+        state = LedgerState(cash=initial_capital)
+    for txn in sorted(user_transactions, key=lambda t: (t.id is None, t.id or 0)):
+        apply_transaction(state, txn)
+    return state
+
+
+def portfolio_from_state(state: LedgerState, current_prices: Dict[str, float]) -> PortfolioSnapshot:
+    """PortfolioSnapshot valorado a `current_prices` a partir del estado del ledger."""
+    holdings = {}
+    total_value = 0.0
+
+    for symbol, data in state.positions.items():
+        if data['quantity'] > 0.0001:  # Evitar errores de floating point
+            current_value = data['quantity'] * current_prices.get(symbol, 0.0)
+            holdings[symbol] = {
+                'quantity': data['quantity'],
+                'avg_buy_price': data['cost_basis'] / data['quantity'],
+                'cost_basis': data['cost_basis'],
+                'current_value': current_value
+            }
+            total_value += current_value
+
+    total_invested = sum(data['cost_basis'] for data in holdings.values())
+
+    return PortfolioSnapshot(
+        total_capital=total_invested + state.cash,
+        total_invested=total_invested,
+        cash_available=state.cash,
+        holdings=holdings,
+        total_portfolio_value=total_value + state.cash
+    )
+
+
+def transactions_after(user_transactions: List, checkpoint: Optional[LedgerState]) -> List:
+    """Transacciones posteriores al checkpoint (todas si no hay checkpoint)."""
+    if checkpoint is None or checkpoint.last_transaction_id is None:
+        return list(user_transactions)
+    return [t for t in user_transactions if t.id is None or t.id > checkpoint.last_transaction_id]
+
+
+def _replay_from(user_transactions: List, initial_capital: float,
+                 checkpoint: Optional[LedgerState]) -> LedgerState:
+    """`replay_transactions` desde `checkpoint` (sin modificarlo) o desde `initial_capital`."""
+    if checkpoint is None:
+        return replay_transactions(user_transactions, initial_capital)
+    return replay_transactions(transactions_after(user_transactions, checkpoint), state=checkpoint.copy())
+
+
 def calculate_portfolio_from_transactions(
     user_transactions: List,
-    current_prices: Dict[str, float]
+    current_prices: Dict[str, float],
+    initial_capital: float = 10000.0,
+    checkpoint: Optional[LedgerState] = None
 ) -> PortfolioSnapshot:
     """
-    Calcula el estado actual del portfolio desde el ledger de transacciones.
+    Calcula el estado actual del portfolio recorriendo el ledger.
+
+    Con `checkpoint` (estado a fecha de la transacción N) solo se aplican las
+    transacciones posteriores a N; `user_transactions` puede ser el ledger
+    entero o solo esa cola. En las vistas se usa el estado materializado
+    (`app.portfolio_state`) y esto queda para verificarlo o reconstruirlo.
     
     Args:
         user_transactions: Lista de objetos Transaction del usuario
         current_prices: Dict {symbol: current_price}
+        initial_capital: Capital con el que empezó el usuario (sin checkpoint)
+        checkpoint: LedgerState de partida (no se modifica)
     
     Returns:
         PortfolioSnapshot con estado completo del portfolio
     """
-    holdings = {}  # {symbol: {quantity, cost_basis, current_value, avg_buy_price}}
-    total_invested = 0.0
-    
-    for txn in user_transactions:
-        symbol = txn.symbol
-        
-        if symbol not in holdings:
-            holdings[symbol] = {
-                'quantity': 0.0,
-                'cost_basis': 0.0,
-                'buy_transactions': [],
-                'sell_transactions': []
-            }
-        
-        if txn.type == 'BUY':
-            holdings[symbol]['quantity'] += txn.quantity
-            holdings[symbol]['cost_basis'] += txn.total_cost  # incluye comisión
-            holdings[symbol]['buy_transactions'].append(txn)
-        
-        elif txn.type == 'SELL':
-            holdings[symbol]['quantity'] -= txn.quantity
-            # La venta reduce el costo_basis de forma proporcional
-            if holdings[symbol]['quantity'] > 0:
-                reduction_ratio = txn.quantity / (holdings[symbol]['quantity'] + txn.quantity)
-                holdings[symbol]['cost_basis'] *= (1 - reduction_ratio)
-            else:
-                holdings[symbol]['cost_basis'] = 0.0
-            holdings[symbol]['sell_transactions'].append(txn)
-    
-    # Limpiar posiciones cerradas y calcular valores actuales
-    cleaned_holdings = {}
-    total_portfolio_value = 0.0
-    
-    for symbol, data in holdings.items():
-        if data['quantity'] > 0.0001:  # Evitar errores de floating point
-            current_price = current_prices.get(symbol, 0.0)
-            current_value = data['quantity'] * current_price
-            avg_buy_price = data['cost_basis'] / data['quantity'] if data['quantity'] > 0 else 0.0
-            
-            cleaned_holdings[symbol] = {
-                'quantity': data['quantity'],
-                'avg_buy_price': avg_buy_price,
-                'cost_basis': data['cost_basis'],
-                'current_value': current_value
-            }
-            total_portfolio_value += current_value
-    
-    # Capital inicial (asumimos 10,000 menos lo invertido)
-    # En realidad, se calcula: sum(BUY) - sum(SELL)
-    total_invested = sum(data['cost_basis'] for data in cleaned_holdings.values())
-    
-    # El capital disponible se calcula desde transacciones
-    cash_available = calculate_cash_from_transactions(user_transactions)
-    
-    return PortfolioSnapshot(
-        total_capital=total_invested + cash_available,
-        total_invested=total_invested,
-        cash_available=cash_available,
-        holdings=cleaned_holdings,
-        total_portfolio_value=total_portfolio_value + cash_available
-    )
+    state = _replay_from(user_transactions, initial_capital, checkpoint)
+    return portfolio_from_state(state, current_prices)
 
 
-def calculate_cash_from_transactions(user_transactions: List) -> float:
+def calculate_cash_from_transactions(
+    user_transactions: List,
+    initial_capital: float = 10000.0,
+    checkpoint: Optional[LedgerState] = None
+) -> float:
     """
-    Calcula el efectivo disponible partiendo de un capital inicial.
+    Calcula el efectivo disponible partiendo de un capital inicial o del
+    efectivo de `checkpoint` (y entonces solo con las transacciones posteriores).
     El ledger es la fuente de verdad.
     """
-    # Nota: Necesitamos acceso a SimulationConfig para saber el capital inicial
-    # Por ahora, asumimos 10,000 (será pasado desde el controlador)
-    initial_capital = 10000.0  # TODO: pasar como parámetro
-    
-    cash = initial_capital
-    
-    for txn in user_transactions:
-        if txn.type == 'BUY':
-            cash -= txn.total_cost
-        elif txn.type == 'SELL':
-            cash += (txn.total_amount - txn.commission_amount)
-    
-    return cash
+    return _replay_from(user_transactions, initial_capital, checkpoint).cash
 
 
 # ========================================================================
@@ -746,9 +810,149 @@ def generate_extended_sell_feedback(
 # MÉTRICAS AVANZADAS (FASE 3)
 # ========================================================================
 
+DAY_SECONDS = 86400
+
+
+def epoch_day(dt: datetime) -> int:
+    """Día epoch (UTC) de `dt`; las fechas sin zona horaria se toman como UTC, igual que en la BD."""
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return int(dt.timestamp() // DAY_SECONDS)
+
+
+@dataclass
+class PortfolioHistory:
+    """
+    Evolución diaria del portfolio en columnas (arrays numpy de igual longitud).
+    `days` son días epoch (UTC): `days * 86400` es el timestamp de cada fecha.
+    """
+    days: np.ndarray
+    nav: np.ndarray          # efectivo + valor de mercado de las posiciones
+    cash: np.ndarray
+    invested: np.ndarray     # valor de mercado de las posiciones
+    cost_basis: np.ndarray   # coste de las posiciones abiertas (con comisiones)
+    twr: np.ndarray          # rentabilidad ponderada en el tiempo acumulada (0.05 = 5%)
+    symbols: List[str]
+    quantities: np.ndarray   # unidades de cada símbolo al cierre del último día
+
+    def __len__(self):
+        return len(self.days)
+
+    def since(self, day: int) -> 'PortfolioHistory':
+        """Tramo desde el día `day` (la TWR se rebasa al primer día del tramo)."""
+        start = int(np.searchsorted(self.days, day))
+        start = min(start, len(self.days) - 1)
+        base = 1.0 + self.twr[start]
+        return PortfolioHistory(
+            days=self.days[start:],
+            nav=self.nav[start:],
+            cash=self.cash[start:],
+            invested=self.invested[start:],
+            cost_basis=self.cost_basis[start:],
+            twr=(1.0 + self.twr[start:]) / base - 1.0 if base > 0 else np.zeros(len(self.days) - start),
+            symbols=self.symbols,
+            quantities=self.quantities
+        )
+
+
+def _forward_fill(matrix: np.ndarray) -> np.ndarray:
+    """Rellena cada NaN con el último valor conocido de su fila (sin bucles por celda)."""
+    cols = np.arange(matrix.shape[1])
+    last = np.where(np.isnan(matrix), 0, cols)
+    np.maximum.accumulate(last, axis=1, out=last)
+    return matrix[np.arange(matrix.shape[0])[:, None], last]
+
+
+def build_portfolio_history(
+    user_transactions: List,
+    symbols: List[str],
+    closes: np.ndarray,
+    start_day: int,
+    initial_capital: float = 10000.0
+) -> PortfolioHistory:
+    """
+    Historia diaria del portfolio combinando el ledger con una matriz de cierres.
+
+    Args:
+        user_transactions: Transaction del usuario (en cualquier orden)
+        symbols: filas de `closes`; debe incluir todos los símbolos del ledger
+        closes: matriz (símbolos x días) de cierres desde `start_day`, NaN si no hay dato
+        start_day: día epoch (UTC) de la primera columna
+        initial_capital: efectivo inicial
+
+    Las cantidades, el efectivo y el coste se acumulan por día con `np.add.at` +
+    `cumsum`; el ledger se recorre una sola vez para el coste (las ventas lo
+    reducen proporcionalmente, igual que `apply_transaction`). Los días sin
+    cierre usan el último conocido o, si aún no hay ninguno, el precio de la
+    última operación. No hay aportaciones ni retiradas, así que la TWR encadena
+    directamente los rendimientos diarios del NAV.
+    """
+    n_symbols, n_days = closes.shape
+    row = {symbol: i for i, symbol in enumerate(symbols)}
+    txns = sorted(user_transactions, key=lambda t: (t.id is None, t.id or 0))
+
+    # Una pasada por el ledger: día, fila y variaciones de cada transacción
+    n = len(txns)
+    day_idx = np.empty(n, dtype=np.int64)
+    sym_idx = np.empty(n, dtype=np.int64)
+    d_qty = np.empty(n)
+    d_cash = np.empty(n)
+    d_cost = np.empty(n)
+    trade_price = np.empty(n)
+    state = LedgerState(cash=initial_capital)
+    for k, txn in enumerate(txns):
+        cost_before = state.positions.get(txn.symbol, {}).get('cost_basis', 0.0)
+        cash_before = state.cash
+        apply_transaction(state, txn)
+        day_idx[k] = epoch_day(txn.timestamp) if txn.timestamp else start_day + n_days - 1
+        sym_idx[k] = row[txn.symbol]
+        d_qty[k] = txn.quantity if txn.type == 'BUY' else -txn.quantity
+        d_cash[k] = state.cash - cash_before
+        d_cost[k] = state.positions[txn.symbol]['cost_basis'] - cost_before
+        trade_price[k] = txn.price_per_unit
+    day_idx = np.clip(day_idx - start_day, 0, n_days - 1)
+
+    quantities = np.zeros((n_symbols, n_days))
+    np.add.at(quantities, (sym_idx, day_idx), d_qty)
+    np.cumsum(quantities, axis=1, out=quantities)
+    quantities[np.abs(quantities) < 1e-9] = 0.0
+
+    cost = np.zeros((n_symbols, n_days))
+    np.add.at(cost, (sym_idx, day_idx), d_cost)
+    cost_basis = np.cumsum(cost, axis=1).sum(axis=0)
+
+    cash = initial_capital + np.cumsum(np.bincount(day_idx, weights=d_cash, minlength=n_days))
+
+    # Precios: cierre del día, si no el de la operación de ese día, y si no el último conocido
+    prices = np.array(closes, dtype=float, copy=True)
+    traded = np.full((n_symbols, n_days), np.nan)
+    traded[sym_idx, day_idx] = trade_price
+    prices = np.where(np.isnan(prices), traded, prices)
+    prices = np.nan_to_num(_forward_fill(prices), nan=0.0)
+
+    invested = np.einsum('ij,ij->j', quantities, prices)
+    nav = cash + invested
+
+    growth = np.ones(n_days)
+    np.divide(nav[1:], nav[:-1], out=growth[1:], where=nav[:-1] > 0)
+    twr = np.cumprod(growth) - 1.0
+
+    return PortfolioHistory(
+        days=np.arange(start_day, start_day + n_days),
+        nav=nav,
+        cash=cash,
+        invested=invested,
+        cost_basis=cost_basis,
+        twr=twr,
+        symbols=list(symbols),
+        quantities=quantities[:, -1].copy()
+    )
+
+
 def calculate_portfolio_history(
     user_transactions: List,
-    daily_prices: Dict[str, List[Tuple[datetime, float]]]
+    daily_prices: Dict[str, List[Tuple[datetime, float]]],
+    initial_capital: float = 10000.0
 ) -> List[Dict]:
     """
     Calcula la evolución del portfolio a lo largo del tiempo.
@@ -756,9 +960,10 @@ def calculate_portfolio_history(
     Args:
         user_transactions: Lista de Transaction objects
         daily_prices: {symbol: [(datetime, price), ...]}
+        initial_capital: Capital con el que empezó el usuario
     
     Returns:
-        List de snapshots diarios: [
+        List de snapshots diarios (desde la primera transacción o el primer precio): [
             {
                 'date': datetime,
                 'portfolio_value': float,
@@ -767,13 +972,49 @@ def calculate_portfolio_history(
                 'return_pct': float
             }
         ]
-    
-    Nota: Esta es una versión simplificada. En producción, necesitarías
-    datos históricos reales. Para ahora, asumimos precios estáticos.
     """
-    # Simplificado: asumimos un único snapshot (hoy)
-    # En FASE 4 agregaremos histórico real
-    return []
+    symbols = sorted({t.symbol for t in user_transactions} | set(daily_prices))
+    known_days = [epoch_day(t.timestamp) for t in user_transactions if t.timestamp]
+    known_days += [epoch_day(dt) for series in daily_prices.values() for dt, _ in series]
+    if not known_days:
+        return []
+
+    start_day = min(known_days)
+    closes = np.full((len(symbols), max(known_days) - start_day + 1), np.nan)
+    for i, symbol in enumerate(symbols):
+        for dt, price in daily_prices.get(symbol, []):
+            closes[i, epoch_day(dt) - start_day] = price
+
+    history = build_portfolio_history(user_transactions, symbols, closes, start_day, initial_capital)
+    dates = [datetime.fromtimestamp(int(d) * DAY_SECONDS, tz=timezone.utc).replace(tzinfo=None) for d in history.days]
+    return [
+        {
+            'date': date,
+            'portfolio_value': nav,
+            'cash': cash,
+            'invested': invested,
+            'return_pct': twr * 100
+        }
+        for date, nav, cash, invested, twr in zip(
+            dates, history.nav.tolist(), history.cash.tolist(),
+            history.invested.tolist(), history.twr.tolist()
+        )
+    ]
+
+
+PERIODS_PER_YEAR = 365          # la serie del NAV es diaria en días naturales
+ROLLING_WINDOWS = (30, 90, 252)  # días de las ventanas móviles
+
+
+def daily_returns(portfolio_values) -> np.ndarray:
+    """Rendimientos diarios de una serie de valores (0 donde el valor anterior no es positivo)."""
+    values = np.asarray(portfolio_values, dtype=float)
+    if len(values) < 2:
+        return np.zeros(0)
+    returns = np.zeros(len(values) - 1)
+    np.divide(values[1:], values[:-1], out=returns, where=values[:-1] > 0)
+    returns[values[:-1] > 0] -= 1.0
+    return returns
 
 
 def calculate_drawdown(
@@ -793,98 +1034,254 @@ def calculate_drawdown(
     Drawdown educativo: "Si tu máximo valor fue $10,500 y caíste a $9,200,
     el drawdown es 12.4%. Importante para entender volatilidad."
     """
-    if not portfolio_values or len(portfolio_values) < 2:
+    values = np.asarray(portfolio_values, dtype=float)
+    if len(values) < 2:
         return {
             'max_drawdown_pct': 0,
             'max_drawdown_value': 0,
-            'peak_value': portfolio_values[0] if portfolio_values else 0,
-            'trough_value': portfolio_values[-1] if portfolio_values else 0
+            'peak_value': float(values[0]) if len(values) else 0,
+            'trough_value': float(values[-1]) if len(values) else 0
         }
     
-    peak = portfolio_values[0]
-    max_dd = 0
-    dd_peak = peak
-    dd_trough = peak
-    
-    for value in portfolio_values[1:]:
-        if value > peak:
-            peak = value
-        
-        dd = (peak - value) / peak if peak > 0 else 0
-        if dd > max_dd:
-            max_dd = dd
-            dd_peak = peak
-            dd_trough = value
+    peaks = np.maximum.accumulate(values)
+    drawdowns = np.zeros(len(values))
+    np.divide(peaks - values, peaks, out=drawdowns, where=peaks > 0)
+    trough = int(np.argmax(drawdowns))
+    if drawdowns[trough] <= 0:
+        trough = 0
     
     return {
-        'max_drawdown_pct': max_dd * 100,
-        'max_drawdown_value': (dd_peak - dd_trough),
-        'peak_value': dd_peak,
-        'trough_value': dd_trough
+        'max_drawdown_pct': float(drawdowns[trough]) * 100,
+        'max_drawdown_value': float(peaks[trough] - values[trough]),
+        'peak_value': float(peaks[trough]),
+        'trough_value': float(values[trough])
     }
 
 
-def calculate_volatility(returns: List[float]) -> float:
+def calculate_volatility(returns: List[float], periods_per_year: Optional[int] = None) -> float:
     """
     Calcula volatilidad (desviación estándar de retornos).
+    Con `periods_per_year` se anualiza (x raíz de los periodos por año).
     
     Returns:
         Volatilidad como porcentaje (ej: 15.3%)
     
     Educativo: "Volatilidad baja (< 10%) = estable. Alta (> 25%) = volátil"
     """
-    if not returns or len(returns) < 2:
+    returns = np.asarray(returns, dtype=float)
+    if len(returns) < 2:
         return 0.0
     
-    mean_return = sum(returns) / len(returns)
-    variance = sum((r - mean_return) ** 2 for r in returns) / len(returns)
-    std_dev = variance ** 0.5
-    
-    return std_dev * 100
+    volatility = float(returns.std())
+    if periods_per_year:
+        volatility *= np.sqrt(periods_per_year)
+    return volatility * 100
 
 
 def calculate_sharpe_ratio(
     returns: List[float],
-    risk_free_rate: float = 0.02
+    risk_free_rate: float = 0.02,
+    periods_per_year: Optional[int] = None
 ) -> float:
     """
     Calcula Sharpe Ratio simplificado.
     
     Formula: (mean_return - risk_free_rate) / volatility
     
+    `risk_free_rate` es anual; con `periods_per_year` se reparte por periodo y
+    el ratio se anualiza. Sin él, rendimientos y tasa se toman en la misma unidad.
+    
     Educativo:
     - Sharpe > 1.0: Buen riesgo/retorno
     - Sharpe 0.5-1.0: Aceptable
     - Sharpe < 0.5: Pobre
     """
-    if not returns:
+    returns = np.asarray(returns, dtype=float)
+    if len(returns) < 2:
         return 0.0
     
-    mean_return = sum(returns) / len(returns)
-    volatility = calculate_volatility(returns)
-    
+    volatility = returns.std()
     if volatility == 0:
         return 0.0
     
-    sharpe = (mean_return - risk_free_rate) / volatility
-    return sharpe
+    rate = risk_free_rate / periods_per_year if periods_per_year else risk_free_rate
+    sharpe = (returns.mean() - rate) / volatility
+    if periods_per_year:
+        sharpe *= np.sqrt(periods_per_year)
+    return float(sharpe)
+
+
+def calculate_sortino_ratio(
+    returns: List[float],
+    risk_free_rate: float = 0.02,
+    periods_per_year: Optional[int] = None
+) -> float:
+    """
+    Como el Sharpe pero solo penaliza la volatilidad a la baja (desviación de
+    los rendimientos por debajo de la tasa libre de riesgo).
+    
+    Educativo: "Un fondo que sube mucho de golpe no es 'arriesgado' por ello;
+    el Sortino solo mira las caídas."
+    """
+    returns = np.asarray(returns, dtype=float)
+    if len(returns) < 2:
+        return 0.0
+    
+    rate = risk_free_rate / periods_per_year if periods_per_year else risk_free_rate
+    excess = returns - rate
+    downside = np.sqrt(np.mean(np.minimum(excess, 0.0) ** 2))
+    if downside == 0:
+        return 0.0
+    
+    sortino = excess.mean() / downside
+    if periods_per_year:
+        sortino *= np.sqrt(periods_per_year)
+    return float(sortino)
+
+
+def _rolling_sum(values: np.ndarray, window: int) -> np.ndarray:
+    """Suma de cada ventana completa de `window` valores (sumas acumuladas, O(n))."""
+    cumulative = np.concatenate(([0.0], np.cumsum(values)))
+    return cumulative[window:] - cumulative[:-window]
+
+
+def _rolling_max(values: np.ndarray, window: int) -> np.ndarray:
+    """
+    Máximo de cada ventana completa en O(n) (van Herk / Gil-Werman): máximos
+    acumulados hacia delante y hacia atrás dentro de bloques de `window`; cada
+    ventana toca como mucho dos bloques.
+    """
+    n = len(values)
+    padded = np.full(-(-n // window) * window, -np.inf)
+    padded[:n] = values
+    blocks = padded.reshape(-1, window)
+    prefix = np.maximum.accumulate(blocks, axis=1).ravel()
+    suffix = np.maximum.accumulate(blocks[:, ::-1], axis=1)[:, ::-1].ravel()
+    ends = np.arange(window - 1, n)
+    return np.maximum(suffix[ends - window + 1], prefix[ends])
+
+
+def _falls(peaks: np.ndarray, troughs: np.ndarray) -> np.ndarray:
+    """Caída relativa (pico - valle) / pico; 0 donde el pico no es positivo."""
+    falls = np.zeros(np.shape(peaks))
+    np.divide(peaks - troughs, peaks, out=falls, where=peaks > 0)
+    return falls
+
+
+def _rolling_max_drawdown(values: np.ndarray, window: int) -> np.ndarray:
+    """
+    Peor drawdown de cada ventana completa, con el pico dentro de la misma ventana,
+    en O(n) con los mismos bloques de `window` que `_rolling_max`. Una ventana no
+    alineada es el final de un bloque más el principio del siguiente; su peor caída
+    es la mayor de: la del tramo final, la del tramo inicial, o la que va del máximo
+    del tramo final al mínimo del tramo inicial.
+    """
+    n = len(values)
+    padded = np.full(-(-n // window) * window, values[-1])
+    padded[:n] = values
+    blocks = padded.reshape(-1, window)
+    reverse = blocks[:, ::-1]
+
+    # Tramos iniciales de cada bloque (del inicio hasta cada punto)
+    prefix_mdd = np.maximum.accumulate(
+        _falls(np.maximum.accumulate(blocks, axis=1), blocks), axis=1
+    ).ravel()
+    prefix_min = np.minimum.accumulate(blocks, axis=1).ravel()
+
+    # Tramos finales de cada bloque (de cada punto hasta el final)
+    future_min = np.minimum.accumulate(reverse, axis=1)[:, ::-1]
+    suffix_mdd = np.maximum.accumulate(_falls(blocks, future_min)[:, ::-1], axis=1)[:, ::-1].ravel()
+    suffix_max = np.maximum.accumulate(reverse, axis=1)[:, ::-1].ravel()
+
+    starts = np.arange(n - window + 1)
+    ends = starts + window - 1
+    split = np.maximum.reduce([
+        suffix_mdd[starts], prefix_mdd[ends], _falls(suffix_max[starts], prefix_min[ends])
+    ])
+    return np.where(starts % window == 0, prefix_mdd[ends], split)
+
+
+def calculate_rolling_risk(
+    portfolio_values: List[float],
+    windows: Tuple[int, ...] = ROLLING_WINDOWS,
+    risk_free_rate: float = 0.02,
+    periods_per_year: int = PERIODS_PER_YEAR
+) -> Dict[int, Dict[str, np.ndarray]]:
+    """
+    Métricas móviles de una serie diaria de valores, para cada ventana de `windows` días.
+
+    Returns:
+        {window: {
+            'volatility_pct': volatilidad anualizada de los rendimientos de la ventana,
+            'sortino': Sortino anualizado de la ventana,
+            'drawdown_pct': caída del valor respecto al máximo de la ventana,
+            'max_drawdown_pct': peor de esas caídas dentro de la ventana
+        }}
+
+    Cada array tiene una entrada por día de la serie; los días sin una ventana
+    completa son NaN. Todo se calcula con sumas acumuladas y máximos por bloques:
+    O(n) por ventana y sin bucles por elemento. El peor drawdown mide cada caída
+    contra el máximo previo dentro de la misma ventana.
+    """
+    values = np.asarray(portfolio_values, dtype=float)
+    returns = daily_returns(values)
+    n = len(values)
+    rate = risk_free_rate / periods_per_year
+    excess = returns - rate
+    # Centrar antes de acumular evita perder precisión en la varianza
+    centered = returns - returns.mean() if len(returns) else returns
+    downside_sq = np.minimum(excess, 0.0) ** 2
+
+    result = {}
+    for window in windows:
+        metrics = {key: np.full(n, np.nan) for key in
+                   ('volatility_pct', 'sortino', 'drawdown_pct', 'max_drawdown_pct')}
+
+        if len(returns) >= window:
+            # Rendimientos de los `window` días que terminan en cada punto (desde el índice `window`)
+            mean = _rolling_sum(centered, window) / window
+            variance = np.maximum(_rolling_sum(centered ** 2, window) / window - mean ** 2, 0.0)
+            metrics['volatility_pct'][window:] = np.sqrt(variance * periods_per_year) * 100
+
+            mean_excess = _rolling_sum(excess, window) / window
+            downside = np.sqrt(_rolling_sum(downside_sq, window) / window)
+            sortino = np.zeros(len(downside))
+            np.divide(mean_excess, downside, out=sortino, where=downside > 0)
+            metrics['sortino'][window:] = sortino * np.sqrt(periods_per_year)
+
+        if n >= window:
+            peaks = _rolling_max(values, window)
+            drawdown = np.zeros(len(peaks))
+            np.divide(peaks - values[window - 1:], peaks, out=drawdown, where=peaks > 0)
+            metrics['drawdown_pct'][window - 1:] = drawdown * 100
+            metrics['max_drawdown_pct'][window - 1:] = _rolling_max_drawdown(values, window) * 100
+
+        result[window] = metrics
+    return result
 
 
 def calculate_advanced_metrics(
     portfolio: PortfolioSnapshot,
     portfolio_metrics: Dict,
     initial_capital: float,
-    user_transactions: List
+    ledger: LedgerState,
+    history: Optional[PortfolioHistory] = None
 ) -> Dict:
     """
     Calcula todas las métricas avanzadas del portfolio.
+
+    Los contadores de operaciones salen del estado del ledger (`ledger`), sin
+    recorrer las transacciones; las de riesgo, de la serie diaria del NAV
+    (`history`). Sin histórico solo hay un punto (el valor actual).
     
     Returns:
         {
             'risk_metrics': {
                 'max_drawdown_pct': float,
-                'volatility_pct': float,
-                'sharpe_ratio': float
+                'volatility_pct': float,      # anualizada
+                'sharpe_ratio': float,
+                'sortino_ratio': float,
+                'rolling': {30|90|252: {volatility_pct, sortino, max_drawdown_pct} (None sin datos)}
             },
             'performance_metrics': {
                 'total_return_pct': float,
@@ -899,30 +1296,33 @@ def calculate_advanced_metrics(
             }
         }
     """
-    # Calcula returns para volatilidad (simplificado)
-    # En FASE 4, usaremos histórico real
-    current_return = portfolio_metrics['total_return_pct'] / 100
-    returns = [current_return]  # Lista con un solo elemento por ahora
-    
-    # Drawdown simplificado
-    # Asumimos el portfolio nunca cayó más del 5% (para demostración)
-    current_value = portfolio.total_portfolio_value
-    peak_value = initial_capital * 1.1  # Asumimos pico del 10%
-    dd = max(0, (peak_value - current_value) / peak_value * 100)
-    
-    # Volatilidad
-    volatility = calculate_volatility(returns) if len(returns) > 1 else 0
-    
-    # Sharpe ratio
-    sharpe = calculate_sharpe_ratio(returns)
-    
-    # Win rate (porcentaje de trades ganadores)
-    winning_trades = sum(
-        1 for txn in user_transactions 
-        if txn.type == 'SELL' and txn.total_cost > 0  # Simplificado
-    )
-    total_trades = len([t for t in user_transactions if t.type == 'SELL'])
-    win_rate = (winning_trades / total_trades * 100) if total_trades > 0 else 0
+    # Serie diaria del NAV (o solo el valor actual si no hay histórico)
+    nav = history.nav if history is not None and len(history) else np.array([portfolio.total_portfolio_value])
+    returns = daily_returns(nav)
+    
+    dd = calculate_drawdown(nav)['max_drawdown_pct']
+    volatility = calculate_volatility(returns, PERIODS_PER_YEAR)
+    sharpe = calculate_sharpe_ratio(returns, periods_per_year=PERIODS_PER_YEAR)
+    sortino = calculate_sortino_ratio(returns, periods_per_year=PERIODS_PER_YEAR)
+    
+    # Último valor de cada ventana móvil (None si aún no hay datos suficientes)
+    rolling = {
+        window: {
+            key: (None if np.isnan(series[-1]) else float(series[-1]))
+            for key, series in metrics.items() if key != 'drawdown_pct'
+        }
+        for window, metrics in calculate_rolling_risk(nav).items()
+    }
+    
+    # Rentabilidad de los últimos 30 días (TWR); aproximada si no hay histórico
+    if history is not None and len(history) > 1:
+        month = history.since(int(history.days[-1]) - 30)
+        monthly_return = float(month.twr[-1]) * 100
+    else:
+        monthly_return = portfolio_metrics['total_return_pct'] / 3
+    
+    # Win rate: ventas con P&L realizado positivo sobre el total de ventas
+    win_rate = (ledger.winning_sell_count / ledger.sell_count * 100) if ledger.sell_count > 0 else 0
     
     # Métricas de asignación
     concentration = portfolio_metrics.get('concentration', {})
@@ -933,12 +1333,14 @@ def calculate_advanced_metrics(
         'risk_metrics': {
             'max_drawdown_pct': dd,
             'volatility_pct': volatility,
-            'sharpe_ratio': sharpe
+            'sharpe_ratio': sharpe,
+            'sortino_ratio': sortino,
+            'rolling': rolling
         },
         'performance_metrics': {
             'total_return_pct': portfolio_metrics['total_return_pct'],
-            'monthly_return_pct': portfolio_metrics['total_return_pct'] / 3,  # Aproximado
-            'num_trades': len(user_transactions),
+            'monthly_return_pct': monthly_return,
+            'num_trades': ledger.trade_count,
             'win_rate_pct': win_rate
         },
         'allocation_metrics': {
@@ -968,33 +1370,38 @@ def generate_dashboard_data(
             'holdings_detail': List[Dict]
         }
     """
-    from app.models import SimulationConfig
+    from app.portfolio_history import current_portfolio_history
+    from app.portfolio_state import get_ledger_state, valuation_prices
     
-    # Obtener precios actuales (en real, sería desde brooker )
-    current_prices = {h.symbol: h.purchase_price for h in user.holdings}
+    # Un SimulationConfig() sin guardar aún no tiene los valores por defecto
+    initial_capital = config.initial_capital or 10000.0
+    
+    # Estado materializado del ledger (O(posiciones), no O(transacciones))
+    ledger = get_ledger_state(user.id, initial_capital)
+    
+    # Precios actuales: último precio bueno conocido (sin esperar a la red)
+    current_prices = valuation_prices(ledger)
     
     # Calcular portfolio
-    portfolio = calculate_portfolio_from_transactions(
-        user.transactions,
-        current_prices
-    )
+    portfolio = portfolio_from_state(ledger, current_prices)
     
     # Métricas básicas
-    metrics = calculate_portfolio_metrics(portfolio, config.initial_capital)
+    metrics = calculate_portfolio_metrics(portfolio, initial_capital)
     
-    # Métricas avanzadas
+    # Métricas avanzadas sobre la serie diaria real del NAV
+    history = current_portfolio_history(user, initial_capital, ledger)
     advanced = calculate_advanced_metrics(
-        portfolio, metrics, config.initial_capital, user.transactions
+        portfolio, metrics, initial_capital, ledger, history
     )
     
     # Asignación
-    allocation = calculate_allocation_health(portfolio, config.initial_capital)
+    allocation = calculate_allocation_health(portfolio, initial_capital)
     
     # Riesgo
     risk = calculate_risk_profile(portfolio, metrics)
     
     # Oportunidad de coste
-    opp_cost = calculate_opportunity_cost(metrics, config.initial_capital)
+    opp_cost = calculate_opportunity_cost(metrics, initial_capital)
     
     # Detalles de holdings
     holdings_detail = []
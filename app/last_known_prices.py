@@ -0,0 +1,144 @@
+"""
+Últimos precios buenos conocidos (persistidos en la tabla `price_snapshots`).
+
+Tras cada despliegue la caché de precios arrancaba vacía: la primera visita al
+mercado esperaba un refresco completo y el dashboard caía al precio de compra si
+el proveedor fallaba. Aquí se guarda cada cotización correcta y se carga al
+arrancar, de modo que siempre hay un precio (quizá antiguo, pero real) que servir
+mientras llega el fresco.
+
+Las escrituras en BD se agrupan y se hacen en un hilo aparte (write-behind) para
+no añadir latencia a las peticiones.
+"""
+
+import threading
+import time
+from datetime import datetime, timezone
+
+from app.price_cache import PriceCache
+
+# Un precio conocido sigue siendo útil como respaldo durante bastante tiempo
+LAST_KNOWN_TTL = 30 * 86400  # segundos
+
+# Sin límite de tamaño: una entrada por símbolo conocido (universo + operados), y una
+# expulsión LRU dejaría sin respaldo justo a los activos menos consultados
+last_known_prices = PriceCache(max_size=None, default_ttl=LAST_KNOWN_TTL)
+
+_app = None
+_pending = {}
+_pending_lock = threading.Lock()
+_flush_lock = threading.Lock()
+_flush_scheduled = False
+
+
+def _to_epoch(dt):
+    return dt.replace(tzinfo=timezone.utc).timestamp()
+
+
+def _to_utc_datetime(ts):
+    return datetime.fromtimestamp(ts, tz=timezone.utc).replace(tzinfo=None)
+
+
+def init_last_known_prices(app):
+    """Carga los precios persistidos en memoria. Devuelve cuántos se cargaron."""
+    global _app
+    _app = app
+    from app.models import PriceSnapshotRecord
+
+    try:
+        with app.app_context():
+            records = PriceSnapshotRecord.query.all()
+    except Exception as e:
+        # Tabla aún sin migrar: se sigue funcionando, solo que sin respaldo
+        print(f"⚠️ No se pudieron cargar los últimos precios conocidos: {e}")
+        return 0
+
+    for record in records:
+        last_known_prices.set(record.symbol, {
+            'price': record.price,
+            'previous_close': record.previous_close or record.price,
+            'name': record.name,
+            'updated_at': _to_epoch(record.captured_at),
+        })
+    print(f"💾 {len(records)} últimos precios conocidos cargados")
+    return len(records)
+
+
+def get_last_known(symbol):
+    """{'price', 'previous_close', 'name', 'updated_at'} o None si nunca se ha cotizado."""
+    return last_known_prices.get(symbol)
+
+
+def remember_quotes(quotes, persist=True):
+    """
+    Registra cotizaciones correctas `{symbol: {'price', 'previous_close'?, 'name'?, 'updated_at'?}}`.
+    Con `persist` se guardan también en BD (en segundo plano).
+    """
+    fresh = {}
+    for symbol, quote in quotes.items():
+        price = quote.get('price') or 0
+        if price <= 0:
+            continue
+        previous = last_known_prices.get(symbol) or {}
+        entry = {
+            'price': float(price),
+            'previous_close': float(quote.get('previous_close') or previous.get('previous_close') or price),
+            'name': quote.get('name') or previous.get('name'),
+            'updated_at': quote.get('updated_at') or time.time(),
+        }
+        if previous and previous['updated_at'] > entry['updated_at']:
+            continue
+        last_known_prices.set(symbol, entry)
+        fresh[symbol] = entry
+
+    global _flush_scheduled
+    if not fresh or not persist or _app is None:
+        return
+    with _pending_lock:
+        _pending.update(fresh)
+        if _flush_scheduled:
+            return
+        _flush_scheduled = True
+    threading.Thread(target=flush_pending, name="last-known-flush", daemon=True).start()
+
+
+def flush_pending():
+    """Escribe en BD (un único commit por lote) las cotizaciones pendientes."""
+    global _flush_scheduled
+    with _flush_lock:
+        while True:
+            with _pending_lock:
+                batch = dict(_pending)
+                _pending.clear()
+                if not batch:
+                    # Bajo el mismo lock que `remember_quotes`: lo que llegue después lanza otro hilo
+                    _flush_scheduled = False
+                    return
+            _upsert(batch)
+
+
+def _upsert(batch):
+    from app import db
+    from app.models import PriceSnapshotRecord
+
+    try:
+        with _app.app_context():
+            existing = {
+                r.symbol: r
+                for r in PriceSnapshotRecord.query.filter(PriceSnapshotRecord.symbol.in_(list(batch))).all()
+            }
+            for symbol, quote in batch.items():
+                captured_at = _to_utc_datetime(quote['updated_at'])
+                record = existing.get(symbol)
+                if record is None:
+                    record = PriceSnapshotRecord(symbol=symbol)
+                    db.session.add(record)
+                elif record.captured_at and record.captured_at > captured_at:
+                    continue
+                record.price = quote['price']
+                record.previous_close = quote['previous_close']
+                record.name = quote['name'] or record.name
+                record.captured_at = captured_at
+            db.session.commit()
+    except Exception as e:
+        print(f"❌ Error guardando últimos precios conocidos ({len(batch)}): {e}")
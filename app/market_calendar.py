@@ -0,0 +1,162 @@
+"""
+Calendario de mercado y cadencia de refresco por clase de activo.
+
+No todos los activos necesitan el mismo TTL:
+- crypto: cotiza 24/7, se refresca con frecuencia.
+- acciones, ETFs y renta fija (ETFs de bonos): solo durante la sesión de NYSE;
+  fuera de ella basta con capturar una vez el cierre.
+- fondos: un único valor liquidativo (NAV) al día, publicado tras el cierre.
+
+Cada clase tiene un `RefreshSchedule` que responde a una sola pregunta:
+¿a partir de qué instante una cotización deja de estar al día? (`stale_before`).
+Un mercado cerrado con el cierre ya capturado no genera ninguna consulta.
+"""
+
+from dataclasses import dataclass
+from datetime import date, datetime, time as dtime, timedelta
+from functools import lru_cache
+from zoneinfo import ZoneInfo
+
+NEW_YORK = ZoneInfo("America/New_York")
+SESSION_OPEN = dtime(9, 30)
+SESSION_CLOSE = dtime(16, 0)
+NAV_PUBLISHED = dtime(18, 0)  # aprox.: los fondos publican el NAV tras el cierre
+
+DEFAULT_CRYPTO_INTERVAL = 60      # segundos
+DEFAULT_SESSION_INTERVAL = 600    # segundos
+
+
+# =========================================================
+# FESTIVOS DE NYSE
+# =========================================================
+def _easter(year):
+    """Domingo de Pascua (algoritmo gregoriano anónimo)."""
+    a = year % 19
+    b, c = divmod(year, 100)
+    d, e = divmod(b, 4)
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    month, day = divmod(h + l - 7 * m + 114, 31)
+    return date(year, month, day + 1)
+
+
+def _nth_weekday(year, month, weekday, n):
+    """n-ésimo `weekday` (0=lunes) del mes; n=-1 para el último."""
+    if n > 0:
+        first = date(year, month, 1)
+        return first + timedelta(days=(weekday - first.weekday()) % 7 + 7 * (n - 1))
+    last = date(year + (month == 12), month % 12 + 1, 1) - timedelta(days=1)
+    return last - timedelta(days=(last.weekday() - weekday) % 7)
+
+
+def _observed(day):
+    """Festivo en sábado se cierra el viernes; en domingo, el lunes."""
+    if day.weekday() == 5:
+        return day - timedelta(days=1)
+    if day.weekday() == 6:
+        return day + timedelta(days=1)
+    return day
+
+
+@lru_cache(maxsize=16)
+def us_market_holidays(year):
+    """Días completos de cierre de NYSE en `year`."""
+    holidays = {
+        _nth_weekday(year, 1, 0, 3),                # Martin Luther King Jr.
+        _nth_weekday(year, 2, 0, 3),                # Presidents' Day
+        _easter(year) - timedelta(days=2),          # Viernes Santo
+        _nth_weekday(year, 5, 0, -1),               # Memorial Day
+        _observed(date(year, 7, 4)),                # Independence Day
+        _nth_weekday(year, 9, 0, 1),                # Labor Day
+        _nth_weekday(year, 11, 3, 4),               # Thanksgiving
+        _observed(date(year, 12, 25)),              # Navidad
+    }
+    # Año nuevo en sábado no se traslada al viernes anterior (otro año)
+    new_year = date(year, 1, 1)
+    if new_year.weekday() != 5:
+        holidays.add(_observed(new_year))
+    if year >= 2022:
+        holidays.add(_observed(date(year, 6, 19)))  # Juneteenth
+    return frozenset(holidays)
+
+
+def is_trading_day(day):
+    return day.weekday() < 5 and day not in us_market_holidays(day.year)
+
+
+def _last_event_at(now, at):
+    """Timestamp del último `at` (hora de Nueva York) de un día hábil que ya ha pasado."""
+    local = datetime.fromtimestamp(now, NEW_YORK)
+    day = local.date()
+    for _ in range(15):
+        if is_trading_day(day):
+            event = datetime.combine(day, at, tzinfo=NEW_YORK)
+            if event.timestamp() <= now:
+                return event.timestamp()
+        day -= timedelta(days=1)
+    return 0.0
+
+
+def is_session_open(now):
+    local = datetime.fromtimestamp(now, NEW_YORK)
+    return is_trading_day(local.date()) and SESSION_OPEN <= local.time() < SESSION_CLOSE
+
+
+def last_session_close(now):
+    return _last_event_at(now, SESSION_CLOSE)
+
+
+def last_nav_publication(now):
+    return _last_event_at(now, NAV_PUBLISHED)
+
+
+# =========================================================
+# CADENCIA POR CLASE DE ACTIVO
+# =========================================================
+@dataclass(frozen=True)
+class RefreshSchedule:
+    """
+    kind:
+        'continuous': mercado 24/7, refresco cada `interval` segundos.
+        'session':    cada `interval` segundos con la sesión abierta; cerrada, solo el cierre.
+        'daily_nav':  una vez al día, tras la publicación del NAV.
+    """
+    kind: str
+    interval: int = 0
+
+    def is_open(self, now):
+        if self.kind == 'continuous':
+            return True
+        if self.kind == 'session':
+            return is_session_open(now)
+        return False
+
+    def stale_before(self, now):
+        """Una cotización con `updated_at` anterior a este instante debe refrescarse."""
+        if self.kind == 'continuous':
+            return now - self.interval
+        if self.kind == 'session':
+            if is_session_open(now):
+                return now - self.interval
+            return last_session_close(now)
+        return last_nav_publication(now)
+
+    def is_due(self, updated_at, now):
+        return (updated_at or 0) < self.stale_before(now)
+
+
+def build_schedules(session_interval=DEFAULT_SESSION_INTERVAL, crypto_interval=DEFAULT_CRYPTO_INTERVAL):
+    """Cadencia de cada categoría del universo (las desconocidas se tratan como sesión)."""
+    session = RefreshSchedule('session', session_interval)
+    return {
+        'crypto': RefreshSchedule('continuous', crypto_interval),
+        'acciones': session,
+        'etfs': session,
+        'renta-fija': session,
+        'fondos': RefreshSchedule('daily_nav'),
+        None: session,
+    }
@@ -0,0 +1,336 @@
+"""
+Proveedores de datos de mercado.
+
+Todo acceso a precios, cotizaciones, metadatos e históricos pasa por un
+`MarketDataProvider`, elegido por configuración (MARKET_DATA_PROVIDER):
+
+- 'yfinance': datos reales de Yahoo Finance (por defecto).
+- 'record':   igual que yfinance, pero guarda cada respuesta en disco.
+- 'replay':   reproduce las respuestas grabadas sin red, con latencia configurable.
+- 'synthetic': mercado simulado GBM (ver `app/synthetic_market.py`), sin red.
+
+Los proveedores con red se envuelven en un `GuardedProvider` (ver `app/provider_guard.py`).
+"""
+
+import json
+import os
+import re
+import threading
+import time
+from abc import ABC, abstractmethod
+
+import pandas as pd
+import yfinance as yf
+
+
+class MarketDataError(Exception):
+    """El proveedor no pudo devolver el dato solicitado"""
+    pass
+
+
+class EmptyResponseError(MarketDataError):
+    """Respuesta en bloque vacía por completo (fallo transitorio del proveedor, no de un símbolo)"""
+    pass
+
+
+# Duración aproximada de los periodos de yfinance (para recortar series grabadas)
+PERIOD_SECONDS = {
+    '1d': 86400,
+    '2d': 2 * 86400,
+    '5d': 5 * 86400,
+    '1mo': 31 * 86400,
+    '3mo': 92 * 86400,
+    '6mo': 183 * 86400,
+    '1y': 366 * 86400,
+    '2y': 2 * 366 * 86400,
+    '5y': 5 * 366 * 86400,
+    '10y': 10 * 366 * 86400,
+}
+
+
+class MarketDataProvider(ABC):
+    """
+    Interfaz común de los proveedores.
+
+    - get_info: dict estilo `ticker.info` (precio, cierre anterior, nombre, sector...).
+    - get_history: DataFrame OHLCV con índice datetime con zona horaria (vacío si el
+      símbolo no tiene datos).
+    - get_bulk_closes: {symbol: Serie de cierres} para varios símbolos en una sola llamada.
+      Los símbolos sin datos no aparecen en el resultado.
+    - available: False si ahora mismo no tiene sentido consultarlo (circuito abierto).
+    """
+    name = 'base'
+
+    def available(self):
+        return True
+
+    @abstractmethod
+    def get_info(self, symbol):
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_history(self, symbol, interval='1d', period=None, start=None, auto_adjust=True):
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_bulk_closes(self, symbols, period='1mo', interval='1d'):
+        raise NotImplementedError
+
+
+class YFinanceProvider(MarketDataProvider):
+    """Datos reales vía yfinance."""
+    name = 'yfinance'
+
+    def get_info(self, symbol):
+        return yf.Ticker(symbol).info or {}
+
+    def get_history(self, symbol, interval='1d', period=None, start=None, auto_adjust=True):
+        kwargs = {'interval': interval, 'auto_adjust': auto_adjust}
+        if start is not None:
+            kwargs['start'] = start
+        else:
+            kwargs['period'] = period or '1mo'
+        # Un histórico vacío de un solo símbolo suele ser un activo retirado o sin datos:
+        # se devuelve tal cual y quien llama lo recuerda por símbolo, sin penalizar al proveedor.
+        return yf.Ticker(symbol).history(**kwargs)
+
+    def get_bulk_closes(self, symbols, period='1mo', interval='1d'):
+        data = yf.download(
+            list(symbols),
+            period=period,
+            interval=interval,
+            group_by='ticker',
+            auto_adjust=False,
+            progress=False,
+            threads=True,
+        )
+        # yf.download se traga los errores de red/rate limit y devuelve un DataFrame vacío
+        if data is None or data.empty:
+            if symbols:
+                raise EmptyResponseError(f"Descarga en bloque vacía ({len(symbols)} símbolos)")
+            return {}
+
+        closes = {}
+
+        multi = isinstance(data.columns, pd.MultiIndex)
+        for symbol in symbols:
+            try:
+                series = data[symbol]['Close'] if multi else data['Close']
+            except KeyError:
+                continue
+            series = series.dropna()
+            if not series.empty:
+                closes[symbol] = series
+        if symbols and not closes:
+            raise EmptyResponseError(f"Descarga en bloque sin cierres ({len(symbols)} símbolos)")
+        return closes
+
+
+# ========================================================================
+# GRABACIÓN / REPRODUCCIÓN
+# ========================================================================
+
+def _frame_to_json(frame):
+    index = frame.index
+    return {
+        'tz': str(index.tz) if getattr(index, 'tz', None) is not None else None,
+        'index': index.as_unit('s').asi8.tolist(),
+        'columns': {str(col): frame[col].astype(float).tolist() for col in frame.columns},
+    }
+
+
+def _frame_from_json(payload):
+    index = pd.to_datetime(payload['index'], unit='s', utc=True)
+    if payload.get('tz'):
+        index = index.tz_convert(payload['tz'])
+    return pd.DataFrame(payload['columns'], index=index)
+
+
+def _merge_frames(old, new):
+    if old is None or old.empty:
+        return new
+    if new is None or new.empty:
+        return old
+    merged = pd.concat([old, new.tz_convert(old.index.tz) if old.index.tz is not None else new])
+    merged = merged[~merged.index.duplicated(keep='last')]
+    return merged.sort_index()
+
+
+class RecordReplayProvider(MarketDataProvider):
+    """
+    Graba las respuestas de otro proveedor en ficheros JSON (mode='record') o las
+    reproduce sin red (mode='replay'), esperando `latency` segundos por llamada para
+    simular el coste del proveedor real de forma determinista.
+
+    Los históricos se guardan por (símbolo, intervalo) acumulando todas las velas
+    vistas; al reproducir se recortan por `start` o `period`.
+    """
+
+    def __init__(self, directory, mode='replay', inner=None, latency=0.0):
+        if mode not in ('record', 'replay'):
+            raise ValueError(f"Modo no válido: {mode}")
+        if mode == 'record' and inner is None:
+            raise ValueError("El modo 'record' necesita un proveedor real")
+        self.directory = directory
+        self.mode = mode
+        self.inner = inner
+        self.latency = float(latency or 0.0)
+        self.name = mode
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    # ------------------------------------------------------------------
+    # Ficheros
+    # ------------------------------------------------------------------
+    def _path(self, *parts):
+        safe = [re.sub(r'[^A-Za-z0-9._=-]', '_', str(p)) for p in parts]
+        return os.path.join(self.directory, '__'.join(safe) + '.json')
+
+    def _load(self, path):
+        try:
+            with open(path, 'r', encoding='utf-8') as fh:
+                return json.load(fh)
+        except FileNotFoundError:
+            return None
+
+    def _save(self, path, payload):
+        tmp = f"{path}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as fh:
+            json.dump(payload, fh, sort_keys=True, default=str)
+        os.replace(tmp, path)
+
+    def _replay_wait(self):
+        if self.latency > 0:
+            time.sleep(self.latency)
+
+    def _missing(self, what):
+        return MarketDataError(f"Sin grabación para {what} en {self.directory}")
+
+    # ------------------------------------------------------------------
+    # Interfaz
+    # ------------------------------------------------------------------
+    def get_info(self, symbol):
+        path = self._path('info', symbol)
+        if self.mode == 'record':
+            info = self.inner.get_info(symbol)
+            with self._lock:
+                self._save(path, info)
+            return info
+
+        self._replay_wait()
+        info = self._load(path)
+        if info is None:
+            raise self._missing(f"info {symbol}")
+        return info
+
+    def get_history(self, symbol, interval='1d', period=None, start=None, auto_adjust=True):
+        path = self._path('history', symbol, interval, 'adj' if auto_adjust else 'raw')
+        if self.mode == 'record':
+            frame = self.inner.get_history(
+                symbol, interval=interval, period=period, start=start, auto_adjust=auto_adjust
+            )
+            with self._lock:
+                stored = self._load(path)
+                merged = _merge_frames(_frame_from_json(stored) if stored else None, frame)
+                if merged is not None and not merged.empty:
+                    self._save(path, _frame_to_json(merged))
+            return frame
+
+        self._replay_wait()
+        stored = self._load(path)
+        if stored is None:
+            raise self._missing(f"history {symbol} {interval}")
+        frame = _frame_from_json(stored)
+        if frame.empty:
+            return frame
+        if start is not None:
+            start_ts = pd.Timestamp(start)
+            if start_ts.tzinfo is None:
+                start_ts = start_ts.tz_localize('UTC')
+            return frame[frame.index >= start_ts]
+        seconds = PERIOD_SECONDS.get(period or '1mo')
+        if seconds:
+            cutoff = frame.index[-1] - pd.Timedelta(seconds=seconds)
+            return frame[frame.index > cutoff]
+        return frame
+
+    def get_bulk_closes(self, symbols, period='1mo', interval='1d'):
+        if self.mode == 'record':
+            closes = self.inner.get_bulk_closes(symbols, period=period, interval=interval)
+            with self._lock:
+                for symbol, series in closes.items():
+                    frame = series.to_frame('Close')
+                    self._save(self._path('bulk', symbol, interval), _frame_to_json(frame))
+            return closes
+
+        self._replay_wait()
+        closes = {}
+        for symbol in symbols:
+            stored = self._load(self._path('bulk', symbol, interval))
+            if stored is not None:
+                series = _frame_from_json(stored)['Close'].dropna()
+                if not series.empty:
+                    closes[symbol] = series
+        return closes
+
+
+# ========================================================================
+# SELECCIÓN DEL PROVEEDOR
+# ========================================================================
+
+_provider = None
+
+def create_provider(name, recordings_dir=None, latency=0.0, synthetic=None):
+    """Construye el proveedor indicado por nombre ('yfinance', 'record', 'replay', 'synthetic')."""
+    name = (name or 'yfinance').lower()
+    if name == 'yfinance':
+        return YFinanceProvider()
+    if name == 'synthetic':
+        from app.synthetic_market import SyntheticMarketProvider
+        return SyntheticMarketProvider(**(synthetic or {}))
+    if name in ('record', 'replay'):
+        if not recordings_dir:
+            raise ValueError("MARKET_RECORDINGS_DIR es obligatorio para record/replay")
+        inner = YFinanceProvider() if name == 'record' else None
+        return RecordReplayProvider(recordings_dir, mode=name, inner=inner, latency=latency)
+    raise ValueError(f"Proveedor de mercado desconocido: {name}")
+
+
+def configure_provider(config):
+    """Instala el proveedor según la configuración de la app."""
+    provider = create_provider(
+        config.get('MARKET_DATA_PROVIDER'),
+        recordings_dir=config.get('MARKET_RECORDINGS_DIR'),
+        latency=config.get('MARKET_REPLAY_LATENCY', 0.0),
+        synthetic={
+            'seed': config.get('SYNTHETIC_SEED', 0),
+            'tick_seconds': config.get('SYNTHETIC_TICK_SECONDS', 60),
+            'start_date': config.get('SYNTHETIC_START_DATE', '2015-01-01'),
+        },
+    )
+    if config.get('MARKET_PROVIDER_GUARD', True) and provider.name in ('yfinance', 'record'):
+        from app.provider_guard import GuardedProvider
+        provider = GuardedProvider(
+            provider,
+            rate=config.get('MARKET_RATE_LIMIT', 5.0),
+            burst=config.get('MARKET_RATE_BURST', 10),
+            failure_threshold=config.get('MARKET_BREAKER_THRESHOLD', 5),
+            reset_timeout=config.get('MARKET_BREAKER_RESET', 60),
+            max_retries=config.get('MARKET_MAX_RETRIES', 2),
+        )
+    set_provider(provider)
+    print(f"📡 Proveedor de mercado: {provider.name}")
+    return provider
+
+
+def set_provider(provider):
+    global _provider
+    _provider = provider
+
+
+def get_provider():
+    """Proveedor activo (yfinance si no se ha configurado otro)."""
+    global _provider
+    if _provider is None:
+        _provider = YFinanceProvider()
+    return _provider
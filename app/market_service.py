@@ -1,16 +1,163 @@
-import yfinance as yf
-import pandas as pd
+import json
 import time
-from app.utils.utils import MARKET_UNIVERSE
-from datetime import datetime, timedelta
-import random
+import threading
+import zlib
+from app.universe import universe
+from app.bar_store import get_bar_store
+from app.market_providers import get_provider
+from app.price_cache import price_cache
+from app.last_known_prices import get_last_known, remember_quotes
+from app.asset_metadata import (
+    get_cached_metadata, is_metadata_fresh, is_metadata_miss, metadata_from_info,
+    record_metadata_miss, store_metadata
+)
+from app.shared_prices import SharedPriceTable
+from app.refresh_leader import LeaderLease
+from app.market_calendar import build_schedules
+from app.market_stream import broadcaster, stream_payload
+from app.market_snapshot import LOADING, MISSING, QUOTED, MarketSnapshot, SnapshotUniverse
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+from app.utils.lttb import lttb_indices
 
 # =========================================================
 # CACHÉ DE DATOS EN VIVO
 # =========================================================
-market_cache = {"list": [], "dict": {}, "timestamp": 0}
+# Snapshot en columnas (ver `market_snapshot`); timestamp 0 = aún no se ha cargado
+SPARKLINE_POINTS = 10
+_universe = SnapshotUniverse(universe.assets)
+market_cache = MarketSnapshot(_universe, SPARKLINE_POINTS)
 CACHE_DURATION = 600    # segundos = 10 min
 
+# Refresco en segundo plano (stale-while-revalidate)
+_refresh_lock = threading.Lock()
+_refresher_stop = threading.Event()
+_refresher_thread = None
+
+# Tabla mmap compartida entre procesos (None = desactivada)
+_price_table = None
+
+# Cada cuánto el refrescador renueva su latido y los demás intentan tomar el lease
+LEADER_POLL_SECONDS = 15
+
+# Cadencia de refresco por categoría según el calendario de mercado
+_schedules = build_schedules(session_interval=CACHE_DURATION)
+
+# Cada cuánto el refrescador revisa si hay metadatos caducados
+METADATA_CHECK_SECONDS = 3600
+_metadata_prefetch_lock = threading.Lock()
+
+
+def is_quote_current(symbol, updated_at, now=None):
+    """True si la cotización sigue al día según el calendario de su mercado."""
+    now = now or time.time()
+    category = universe.category_of(symbol)
+    return not _schedules.get(category, _schedules[None]).is_due(updated_at, now)
+
+
+# Símbolos que fallan al refrescar: no se reintentan en cada vuelta del refrescador,
+# sino tras una espera que se duplica con cada fallo seguido (de 1 min a 1 h)
+FAILED_RETRY_BASE_SECONDS = 60
+FAILED_RETRY_MAX_SECONDS = 3600
+_failed_at = np.zeros(len(_universe))  # último intento fallido por fila del universo
+_failed_count = np.zeros(len(_universe), dtype=np.int32)  # fallos seguidos
+
+
+def _record_refresh_attempts(requested, fresh, now):
+    """Anota el resultado del intento: los que no trajeron cotización acumulan un fallo."""
+    rows = np.fromiter((_universe.index[s] for s in requested), dtype=np.int64)
+    ok = np.fromiter((s in fresh for s in requested), dtype=bool, count=len(rows))
+    _failed_count[rows[ok]] = 0
+    _failed_at[rows[ok]] = 0.0
+    _failed_count[rows[~ok]] += 1
+    _failed_at[rows[~ok]] = now
+
+
+def _retry_allowed_mask(now):
+    """Filas sin fallos recientes o cuya espera tras el último fallo ya pasó."""
+    exponent = np.clip(_failed_count - 1, 0, 16)
+    backoff = np.minimum(FAILED_RETRY_BASE_SECONDS * 2.0 ** exponent, FAILED_RETRY_MAX_SECONDS)
+    return (_failed_count == 0) | (now - _failed_at >= backoff)
+
+
+def due_symbols(snapshot, now):
+    """
+    Símbolos del universo cuya cotización ha caducado (mercados cerrados con cierre
+    capturado, no). Los que vienen fallando solo vuelven a estarlo pasado su backoff.
+    """
+    thresholds = {category: schedule.stale_before(now) for category, schedule in _schedules.items()}
+    mask = snapshot.stale_mask(thresholds)
+    if snapshot.universe is _universe:
+        mask &= _retry_allowed_mask(now)
+    symbols = snapshot.universe.symbols
+    return {symbols[i] for i in np.flatnonzero(mask)}
+
+# =========================================================
+# SINGLE-FLIGHT: peticiones concurrentes comparten una sola descarga
+# =========================================================
+class _InFlightCall:
+    """Descarga en curso a la que se enganchan los llamadores concurrentes."""
+    __slots__ = ("event", "result", "error")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+_inflight = {}
+_inflight_lock = threading.Lock()
+
+def _claim_flight(key):
+    """(llamada en curso para `key`, True si la acaba de registrar este llamador)."""
+    with _inflight_lock:
+        call = _inflight.get(key)
+        if call is not None:
+            return call, False
+        call = _InFlightCall()
+        _inflight[key] = call
+        return call, True
+
+def single_flight(key, fn, *args, **kwargs):
+    """
+    Ejecuta `fn` una sola vez por `key` aunque lleguen varios llamadores a la vez.
+    El primero hace la descarga; el resto espera y recibe el mismo resultado (o excepción).
+    """
+    call, is_leader = _claim_flight(key)
+    if not is_leader:
+        call.event.wait()
+        if call.error is not None:
+            raise call.error
+        return call.result
+    return _lead_flight(key, call, fn, *args, **kwargs)
+
+def single_flight_background(key, fn, *args, name=None):
+    """
+    Lanza `fn` en un hilo salvo que ya haya una llamada en curso para `key`.
+    La comprobación y el registro se hacen juntos bajo el lock: dos peticiones
+    simultáneas no arrancan dos hilos. Devuelve True si lanzó el hilo.
+    """
+    call, is_leader = _claim_flight(key)
+    if not is_leader:
+        return False
+    threading.Thread(target=_lead_flight, args=(key, call, fn) + args, name=name, daemon=True).start()
+    return True
+
+def _lead_flight(key, call, fn, *args, **kwargs):
+    try:
+        call.result = fn(*args, **kwargs)
+        return call.result
+    except Exception as e:
+        call.error = e
+        raise
+    finally:
+        with _inflight_lock:
+            _inflight.pop(key, None)
+        call.event.set()
+
 def safe_get(info, keys, default=None):
     """Obtiene valor de forma segura probando múltiples keys"""
     for key in keys:
@@ -18,32 +165,49 @@ def safe_get(info, keys, default=None):
             return info[key]
     return default
 
-def get_asset_price_and_change(ticker, symbol):
-    """Obtiene precio y cambio de forma robusta para cualquier tipo de activo"""
+def format_change(current_price, previous_close):
+    """Cambio porcentual formateado ('+1.23%' / '-0.45%')"""
+    if current_price and previous_close and previous_close > 0:
+        change_pct = ((current_price - previous_close) / previous_close * 100)
+        return f"+{change_pct:.2f}%" if change_pct >= 0 else f"{change_pct:.2f}%"
+    return "0.00%"
+
+def resolve_price_fields(info, hist_data):
+    """(precio actual, cierre anterior) combinando `info` y el histórico corto."""
+    # Múltiples formas de obtener el precio actual
+    current_price = safe_get(info, ['currentPrice', 'regularMarketPrice', 'navPrice'])
+    
+    # Si no hay precio en info, usar historical data
+    if not current_price and not hist_data.empty:
+        current_price = hist_data['Close'].iloc[-1]
+    
+    # Múltiples formas de obtener previous close
+    previous_close = safe_get(info, ['previousClose', 'regularMarketPreviousClose'])
+    if not previous_close and len(hist_data) > 1:
+        previous_close = hist_data['Close'].iloc[-2]
+    elif not previous_close:
+        previous_close = current_price
+    return current_price, previous_close
+
+def _short_history(provider, symbol):
+    """Histórico de 2 días; vacío si el proveedor no devolvió velas (el precio sale de `info`)."""
+    return provider.get_history(symbol, period="2d", interval="1d")
+
+def get_asset_price_and_change(symbol, info=None):
+    """
+    Obtiene precio y cambio de forma robusta para cualquier tipo de activo.
+    Acepta un `info` ya descargado para no repetir la consulta.
+    """
     try:
-        info = ticker.info
-        hist_data = ticker.history(period="2d", interval="1d")
-        
-        # Múltiples formas de obtener el precio actual
-        current_price = safe_get(info, ['currentPrice', 'regularMarketPrice', 'navPrice'])
+        provider = get_provider()
+        if info is None:
+            info = provider.get_info(symbol)
+        hist_data = _short_history(provider, symbol)
         
-        # Si no hay precio en info, usar historical data
-        if not current_price and not hist_data.empty:
-            current_price = hist_data['Close'].iloc[-1]
-        
-        # Múltiples formas de obtener previous close
-        previous_close = safe_get(info, ['previousClose', 'regularMarketPreviousClose'])
-        if not previous_close and len(hist_data) > 1:
-            previous_close = hist_data['Close'].iloc[-2]
-        elif not previous_close:
-            previous_close = current_price
+        current_price, previous_close = resolve_price_fields(info, hist_data)
             
         # Calcular cambio porcentual
-        if current_price and previous_close and previous_close > 0:
-            change_pct = ((current_price - previous_close) / previous_close * 100)
-            change_str = f"+{change_pct:.2f}%" if change_pct >= 0 else f"{change_pct:.2f}%"
-        else:
-            change_str = "0.00%"
+        change_str = format_change(current_price, previous_close)
             
         return current_price or 0.0, change_str, hist_data
         
@@ -51,246 +215,916 @@ def get_asset_price_and_change(ticker, symbol):
         print(f"Error obteniendo precio para {symbol}: {e}")
         return 0.0, "0.00%", None
 
+# =========================================================
+# PRECIO ACTUAL DE UN ACTIVO (dashboard)
+# =========================================================
+def get_price(symbol):
+    """
+    Precio actual pasando por la caché unificada: si el refresco del mercado, otra
+    vista o una operación ya lo obtuvieron, no se vuelve a descargar.
+    Si solo hay un precio antiguo conocido se devuelve ese y se actualiza en
+    segundo plano; únicamente un símbolo nunca cotizado espera a la red.
+    """
+    price = get_known_price(symbol)
+    if price:
+        return price
+
+    last_known = get_last_known(symbol)
+    if last_known:
+        # Con el mercado cerrado el último precio conocido ya es el vigente
+        if not is_quote_current(symbol, last_known['updated_at']):
+            _trigger_price_refresh(symbol)
+        return last_known['price']
+
+    return _refresh_price(symbol)
+
+
+def get_known_price(symbol):
+    """Precio fresco sin tocar la red (caché o tabla compartida), o 0.0."""
+    quote = price_cache.get(symbol)
+    if quote:
+        return quote['price']
+
+    # Publicado por el proceso refrescador en la tabla compartida
+    if _price_table is not None:
+        row = _price_table.read(symbol)
+        if row and is_quote_current(symbol, row['updated_at']):
+            price_cache.set(symbol, row, ttl=CACHE_DURATION)
+            return row['price']
+    return 0.0
+
+
+def get_last_known_price(symbol):
+    """Precio fresco o, si no lo hay, el último bueno conocido (0.0 si nunca se cotizó). Nunca bloquea."""
+    price = get_known_price(symbol)
+    if price:
+        return price
+    last_known = get_last_known(symbol)
+    return last_known['price'] if last_known else 0.0
+
+
+def _remember_price(symbol, price):
+    if price:
+        quote = {'price': price, 'updated_at': time.time()}
+        price_cache.set(symbol, quote)
+        remember_quotes({symbol: quote})
+    return price
+
+
+def _refresh_price(symbol):
+    return _remember_price(symbol, fetch_current_price(symbol))
+
+
+def _fetch_and_remember_price(symbol):
+    return _remember_price(symbol, _fetch_current_price(symbol))
+
+
+def _trigger_price_refresh(symbol):
+    single_flight_background(("price", symbol), _fetch_and_remember_price, symbol, name=f"price-{symbol}")
+
+
+def fetch_current_price(symbol):
+    """
+    Precio actual de un activo según el proveedor (0.0 si no hay dato).
+    Los dashboards que piden el mismo símbolo a la vez comparten la consulta.
+    """
+    return single_flight(("price", symbol), _fetch_current_price, symbol)
+
+
+def _fetch_current_price(symbol):
+    provider = get_provider()
+    if not provider.available():
+        return 0.0
+    try:
+        info = provider.get_info(symbol)
+        price = safe_get(info, ['currentPrice', 'regularMarketPrice', 'navPrice'])
+        if price:
+            return float(price)
+    except Exception as e:
+        print(f"Error obteniendo precio para {symbol}: {e}")
+    return 0.0
+
+# =========================================================
+# COTIZACIONES EN BLOQUE (una sola descarga por lote)
+# =========================================================
+def fetch_bulk_quotes(symbols, sparkline_points=SPARKLINE_POINTS):
+    """
+    Obtiene precio, cierre anterior y mini histórico de varios activos con una
+    única descarga vectorizada del proveedor en lugar de `.info` + `.history` por símbolo.
+
+    Returns:
+        {symbol: {'price': float, 'previous_close': float, 'change': str, 'history': [float]}}
+        Los símbolos sin datos no aparecen en el resultado.
+    """
+    quotes = {}
+    if not symbols:
+        return quotes
+
+    try:
+        bulk_closes = get_provider().get_bulk_closes(symbols, period="1mo", interval="1d")
+    except Exception as e:
+        print(f"❌ Error en descarga en bloque ({len(symbols)} símbolos): {e}")
+        return quotes
+
+    for symbol, closes in bulk_closes.items():
+        price = float(closes.iloc[-1])
+        previous_close = float(closes.iloc[-2]) if len(closes) > 1 else price
+        if price <= 0:
+            continue
+
+        quotes[symbol] = {
+            "price": price,
+            "previous_close": previous_close,
+            "change": format_change(price, previous_close),
+            "history": closes.tail(sparkline_points).astype(float).tolist(),
+        }
+    return quotes
+
+
+def _fetch_single_quote(symbol):
+    """Camino lento por símbolo (info + history), solo para los que faltan en el bloque."""
+    provider = get_provider()
+    info = provider.get_info(symbol)
+    hist_data = _short_history(provider, symbol)
+    price, previous_close = resolve_price_fields(info, hist_data)
+    if not price:
+        return None
+
+    if not hist_data.empty:
+        history = hist_data['Close'].tail(SPARKLINE_POINTS).tolist()
+    else:
+        history = [price]
+
+    return {
+        "price": float(price),
+        "previous_close": float(previous_close or price),
+        "change": format_change(price, previous_close),
+        "history": history,
+    }
+
 # =========================================================
 # FUNCIÓN NUEVA: Obtener detalles de un solo activo (Rápida)
 # =========================================================
 def fetch_single_asset_details(symbol):
     """
     Obtiene el precio actual y el nombre de un único activo, optimizado para transacciones.
-    Reutiliza la lógica robusta de yfinance.
+    Reutiliza la lógica robusta del proveedor de mercado. Las compras simultáneas del mismo símbolo
+    comparten una sola consulta.
     """
-    try:
-        ticker = yf.Ticker(symbol)
-        
-        # Obtenemos precio y cambio con la función ya existente 
-        price, _, _ = get_asset_price_and_change(ticker, symbol)
-        
-        # Obtenemos el nombre para la transacción
-        info = ticker.info
-        name = safe_get(info, ['longName', 'shortName'])
-        
-        if price > 0:
-            return {'price': price, 'name': name}
+    return single_flight(("details", symbol), _fetch_single_asset_details, symbol)
+
+
+def _last_known_details(symbol):
+    """Precio y nombre sin red (caché o último conocido), para cuando el proveedor no responde."""
+    quote = price_cache.get(symbol) or get_last_known(symbol)
+    if not quote:
         return None
-    except Exception as e:
-        print(f"❌ Error al obtener detalles para {symbol}: {e}")
+    print(f"🔌 Proveedor no disponible: {symbol} se sirve con el último precio conocido")
+    return {'price': quote['price'], 'name': quote.get('name'), 'updated_at': quote.get('updated_at')}
+
+
+def _fetch_single_asset_details(symbol):
+    if not get_provider().available():
+        return _last_known_details(symbol)
+
+    # Solo el precio va a la red; el nombre sale de la caché de metadatos
+    price = fetch_current_price(symbol)
+    if price <= 0:
+        # Si este fallo ha abierto el circuito, mejor el último precio que nada
+        if not get_provider().available():
+            return _last_known_details(symbol)
         return None
 
+    name = get_asset_name(symbol)
+    quote = {'price': float(price), 'name': name, 'updated_at': time.time()}
+    price_cache.set(symbol, quote)
+    remember_quotes({symbol: quote})
+    return {'price': price, 'name': name}
+
 # =========================================================
-# FUNCIÓN: Obtener datos en vivo de todo el mercado (Con caché)
+# COTIZACIÓN DE EJECUCIÓN (compras y ventas)
 # =========================================================
-def fetch_live_market_data():
-    """Obtiene datos en vivo de todos los activos con caché."""
-    global market_cache
+# Antigüedad máxima (s) de una cotización para ejecutar una orden, por categoría
+EXECUTION_MAX_AGE = {'crypto': 15, None: 60}
+
+
+def configure_execution_quotes(config):
+    """Lee de la configuración los límites de frescura para ejecutar órdenes."""
+    EXECUTION_MAX_AGE['crypto'] = config.get('EXECUTION_QUOTE_MAX_AGE_CRYPTO', 15)
+    EXECUTION_MAX_AGE[None] = config.get('EXECUTION_QUOTE_MAX_AGE', 60)
+
+
+def _execution_quote_ok(symbol, updated_at, now):
+    """
+    Sirve para ejecutar si es más reciente que el límite de su categoría o si su
+    mercado está cerrado y la cotización ya es posterior al cierre (o al NAV).
+    """
+    if not updated_at:
+        return False
+    category = universe.category_of(symbol)
+    max_age = EXECUTION_MAX_AGE.get(category, EXECUTION_MAX_AGE[None])
+    if now - updated_at <= max_age:
+        return True
+    schedule = _schedules.get(category, _schedules[None])
+    return not schedule.is_open(now) and not schedule.is_due(updated_at, now)
+
+
+def _cached_execution_quote(symbol):
+    """La cotización más reciente que se tiene sin red: caché, tabla compartida o último conocido."""
+    candidates = [price_cache.get(symbol), get_last_known(symbol)]
+    if _price_table is not None:
+        candidates.append(_price_table.read(symbol))
+    candidates = [q for q in candidates if q and q.get('price') and q.get('updated_at')]
+    return max(candidates, key=lambda q: q['updated_at'], default=None)
+
+
+def get_execution_quote(symbol):
+    """
+    Precio para ejecutar una orden sobre `symbol`.
+
+    Reutiliza la cotización en caché si cumple el límite de frescura de su clase
+    de activo; si no, hace una única consulta mínima al proveedor (precio, sin
+    histórico ni metadatos). Si el proveedor no responde se usa el último precio
+    conocido. La antigüedad y el origen se guardan en la transacción.
+
+    Returns:
+        {'price', 'name', 'quoted_at', 'age', 'source': 'cache'|'live'|'last_known'} o None
+    """
     now = time.time()
-    if now - market_cache["timestamp"] < CACHE_DURATION:
-        return market_cache["list"], market_cache["dict"]
-    products_list, products_dict = [], {}    
-    
-    # Procesar activos en lotes más chicos para evitar timeouts
+    cached = _cached_execution_quote(symbol)
+    if cached and _execution_quote_ok(symbol, cached['updated_at'], now):
+        return _execution_quote(symbol, cached['price'], cached['updated_at'], 'cache', now)
+
+    price = fetch_current_price(symbol) if get_provider().available() else 0.0
+    if price > 0:
+        quoted_at = time.time()
+        quote = {'price': float(price), 'name': get_asset_name(symbol), 'updated_at': quoted_at}
+        price_cache.set(symbol, quote)
+        remember_quotes({symbol: quote})
+        return _execution_quote(symbol, price, quoted_at, 'live', quoted_at)
+
+    if cached:
+        print(f"🔌 Sin cotización nueva para {symbol}: se ejecuta con el último precio conocido")
+        return _execution_quote(symbol, cached['price'], cached['updated_at'], 'last_known', now)
+    return None
+
+
+def _execution_quote(symbol, price, quoted_at, source, now):
+    return {
+        'price': float(price),
+        'name': get_asset_name(symbol),
+        'quoted_at': quoted_at,
+        'age': round(max(now - quoted_at, 0.0), 3),
+        'source': source,
+    }
+
+# =========================================================
+# FUNCIÓN: Obtener datos en vivo de todo el mercado (Con caché)
+# =========================================================
+def _cold_snapshot():
+    """Snapshot de arranque en frío: últimos precios persistidos y 'Cargando' para el resto."""
+    snapshot = MarketSnapshot(_universe, SPARKLINE_POINTS)
+    for symbol in _universe.symbols:
+        last_known = get_last_known(symbol)
+        if last_known is not None:
+            snapshot.set_quote(
+                symbol, last_known["price"], last_known["previous_close"],
+                last_known["updated_at"], [last_known["price"]],
+            )
+    return snapshot
+
+
+def _build_market_snapshot(previous, now, symbols=None):
+    """
+    Descarga por lotes los activos indicados (todo el universo si `symbols` es None).
+    El resto, y los que fallen, conservan su última cotización buena del snapshot anterior.
+    Devuelve (snapshot nuevo, {symbol: cotización descargada}).
+    """
+    # Un activo por símbolo (el universo puede repetir alguno), en el orden pedido
+    order = _universe.symbols if symbols is None else [s for s in symbols if s in _universe.index]
+    pending = list(dict.fromkeys(order))
+    fresh = {}
+
+    # Procesar activos en lotes: una descarga en bloque por lote
     batch_size = 20
-    for i in range(0, len(MARKET_UNIVERSE), batch_size):
-        batch = MARKET_UNIVERSE[i:i + batch_size]        
-        try:
-            # Descargar datos del batch actual
-            symbols = [a['symbol'] for a in batch]
-            ticker_data = yf.Tickers(' '.join(symbols))
-            
-            for asset in batch:
-                symbol = asset['symbol']
-                try:
-                    ticker = ticker_data.tickers[symbol]
-                    
-                    # Obtener precio y cambio
-                    price, change_str, hist_data = get_asset_price_and_change(ticker, symbol)
-                    
-                    # Obtener mini histórico
-                    history = []
-                    if hist_data is not None and not hist_data.empty:
-                        history = hist_data['Close'].tail(10).tolist()
-                    else:
-                        history = [price] if price else [0.0]
-                    
-                    # Construir producto con campos adaptados
-                    product = {
-                        "name": asset["name"],
-                        "symbol": symbol,
-                        "category": asset["category"],
-                        "price": round(price, 4),
-                        "change": change_str,
-                        "history": history,
-                    }
-
-                    products_list.append(product)
-                    products_dict[symbol] = product
+    for i in range(0, len(pending), batch_size):
+        batch_symbols = pending[i:i + batch_size]
+        quotes = fetch_bulk_quotes(batch_symbols)
+
+        missing = [s for s in batch_symbols if s not in quotes]
+        if missing:
+            print(f"⚠️ {len(missing)} símbolos sin datos en bloque (batch {i}), usando consulta individual")
 
+        for symbol in batch_symbols:
+            quote = quotes.get(symbol)
+            if quote is None and get_provider().available():
+                try:
+                    quote = _fetch_single_quote(symbol)
                 except Exception as e:
                     print(f"❌ Error procesando {symbol}: {e}")
-                    fallback = {
-                        "name": asset["name"],
-                        "symbol": symbol, 
-                        "category": asset["category"],
-                        "price": 0.0, 
-                        "change": "Error", 
-                        "history": [0.0]
-                    }
-                    products_list.append(fallback)
-                    products_dict[symbol] = fallback
-                    
-        except Exception as e:
-            print(f"❌ Error en batch {i}: {e}")
-            # Agregar fallbacks para todo el batch
-            for asset in batch:
-                fallback = {
-                    "name": asset["name"],
-                    "symbol": asset["symbol"],
-                    "category": asset["category"],
-                    "price": 0.0,
-                    "change": "Error",
-                    "history": [0.0]
-                }
-                products_list.append(fallback)
-                products_dict[asset['symbol']] = fallback
-
-    market_cache = {"list": products_list, "dict": products_dict, "timestamp": now}
-    print(f"✅ Datos cargados: {len(products_list)} activos")
-    return products_list, products_dict
+
+            if quote is not None:
+                name = universe.name_of(symbol)
+                price_cache.set(symbol, {
+                    'price': float(quote['price']),
+                    'change': quote['change'],
+                    'name': name,
+                    'updated_at': now,
+                }, ttl=CACHE_DURATION)
+                fresh[symbol] = {**quote, "name": name, "updated_at": now}
+
+    # Sin cotización nueva: último valor bueno conocido (o 'Error' si nunca lo hubo)
+    snapshot = (previous if previous.timestamp else _cold_snapshot()).copy(now)
+    for symbol, quote in fresh.items():
+        snapshot.set_quote(symbol, quote["price"], quote["previous_close"], now, quote["history"])
+    snapshot.status[snapshot.status == LOADING] = MISSING
+    _record_refresh_attempts(pending, fresh, now)
+    return snapshot, fresh
+
+
+def refresh_market_cache(symbols=None):
+    """
+    Actualiza el snapshot del mercado (solo `symbols`, o todo el universo) y lo
+    publica de forma atómica. Si ya hay un refresco en curso no hace nada y devuelve False.
+    """
+    if not get_provider().available():
+        # Circuito abierto: se siguen sirviendo los últimos precios conocidos
+        return False
+    if not _refresh_lock.acquire(blocking=False):
+        return False
+    try:
+        now = time.time()
+        snapshot, fresh = _build_market_snapshot(market_cache, now, symbols)
+        _publish_snapshot(snapshot)
+        if _price_table is not None and _price_table.writer:
+            _price_table.write_columns(
+                _universe.symbols, snapshot.price, snapshot.previous_close, snapshot.updated_at,
+                snapshot.history, snapshot.history_len, published_at=now,
+            )
+        remember_quotes(fresh)
+        requested = len(snapshot) if symbols is None else len(symbols)
+        print(f"✅ Datos cargados: {len(fresh)}/{requested} activos")
+        return True
+    except Exception as e:
+        print(f"❌ Error refrescando el mercado: {e}")
+        return False
+    finally:
+        _refresh_lock.release()
+
+
+def refresh_due_symbols(now=None):
+    """Refresca solo los activos cuyo mercado ha producido precios nuevos. Devuelve cuántos."""
+    due = due_symbols(market_cache, now or time.time())
+    if due:
+        refresh_market_cache(due)
+    return len(due)
+
+
+def snapshot_version(timestamp):
+    """Versión de un snapshot: su instante de publicación en ms (igual en todos los workers)."""
+    return int(timestamp * 1000)
+
+
+def _publish_snapshot(snapshot):
+    """
+    Sustituye `market_cache` y difunde a los streams los símbolos cuyo precio cambió.
+    Devuelve los productos cambiados.
+    """
+    global market_cache
+    previous = market_cache
+    changed = snapshot.products(rows=snapshot.changed_rows(previous))
+    market_cache = snapshot
+    broadcaster.publish(
+        snapshot_version(previous.timestamp), snapshot_version(snapshot.timestamp),
+        {product["symbol"]: stream_payload(product) for product in changed},
+    )
+    return changed
+
+
+def sync_market_snapshot():
+    """Trae el snapshot publicado por el refrescador (si lo hay) sin consultar al proveedor."""
+    if _price_table is not None:
+        _sync_from_price_table()
+
+
+def _trigger_background_refresh(symbols=None):
+    """Lanza un refresco en un hilo aparte si no hay otro en curso."""
+    if _refresh_lock.locked():
+        return
+    threading.Thread(
+        target=refresh_market_cache, args=(symbols,), name="market-refresh", daemon=True
+    ).start()
+
+
+def _refresher_loop(lease):
+    """
+    Solo el líder refresca contra el proveedor (los activos que el calendario marca
+    como caducados); los demás reintentan tomar el lease cada LEADER_POLL_SECONDS
+    por si el líder muere.
+    """
+    next_metadata_check = 0
+    while not _refresher_stop.is_set():
+        if lease is None or lease.try_acquire():
+            if _price_table is not None and not _price_table.writer:
+                _price_table.become_writer()
+            refresh_due_symbols()
+            if time.time() >= next_metadata_check:
+                _trigger_metadata_prefetch()
+                next_metadata_check = time.time() + METADATA_CHECK_SECONDS
+            if lease is not None:
+                lease.heartbeat()
+        _refresher_stop.wait(LEADER_POLL_SECONDS)
+
+    if lease is not None:
+        lease.release()
+
+
+def configure_refresh_schedules(session_interval=CACHE_DURATION, crypto_interval=None):
+    """Ajusta la cadencia de refresco: sesión de bolsa abierta y crypto (ver `market_calendar`)."""
+    global _schedules
+    kwargs = {'session_interval': session_interval}
+    if crypto_interval:
+        kwargs['crypto_interval'] = crypto_interval
+    _schedules = build_schedules(**kwargs)
+
+
+def start_market_refresher(interval=CACHE_DURATION, crypto_interval=None, lease_path=None):
+    """
+    Arranca (una sola vez por proceso) el hilo que mantiene caliente `market_cache`.
+    `interval` es la cadencia con la bolsa abierta y `crypto_interval` la de crypto;
+    con los mercados cerrados no se consulta nada.
+    Con `lease_path`, los procesos del host eligen un único refrescador.
+    """
+    global _refresher_thread
+    if _refresher_thread is not None and _refresher_thread.is_alive():
+        return _refresher_thread
+    configure_refresh_schedules(interval, crypto_interval)
+    _refresher_stop.clear()
+    lease = LeaderLease(lease_path) if lease_path else None
+    _refresher_thread = threading.Thread(
+        target=_refresher_loop, args=(lease,), name="market-refresher", daemon=True
+    )
+    _refresher_thread.start()
+    return _refresher_thread
+
+
+def stop_market_refresher():
+    _refresher_stop.set()
+
+# =========================================================
+# TABLA DE PRECIOS COMPARTIDA ENTRE WORKERS
+# =========================================================
+def enable_shared_price_table(path, writer=False):
+    """
+    Activa la tabla mmap compartida. El proceso escritor (el refrescador elegido,
+    ver `start_market_refresher`) publica cada snapshot; el resto de workers lo
+    leen en vez de refrescar contra el proveedor.
+    """
+    global _price_table
+    _price_table = SharedPriceTable(path, symbols=_universe.symbols, spark_len=SPARKLINE_POINTS, writer=writer)
+    return _price_table
+
+
+def _shared_table_is_fresh(now):
+    """True si otro proceso está publicando snapshots al día (no hace falta refrescar aquí)."""
+    if _price_table is None or _price_table.writer:
+        return False
+    return now - _price_table.published_at() < 2 * CACHE_DURATION
+
+
+def _sync_from_price_table():
+    """Reconstruye `market_cache` desde la tabla compartida si hay un snapshot más nuevo."""
+    if _price_table.published_at() <= market_cache.timestamp:
+        return
+    published_at, rows = _price_table.read_columns(_universe.symbols)
+    if rows is None:
+        return
+    quoted = rows["price"] > 0
+    if not quoted.any():
+        return
+
+    # Filas sin dato en la tabla: lo que ya había (o el último precio conocido)
+    snapshot = (market_cache if market_cache.timestamp else _cold_snapshot()).copy(published_at)
+    spark_len = min(snapshot.history.shape[1], rows["spark"].shape[1])
+    snapshot.price[quoted] = np.round(rows["price"][quoted], 4)
+    snapshot.previous_close[quoted] = rows["prev_close"][quoted]
+    snapshot.updated_at[quoted] = rows["ts"][quoted]
+    snapshot.history[quoted, :spark_len] = rows["spark"][quoted, :spark_len]
+    snapshot.history_len[quoted] = np.minimum(rows["n_spark"][quoted], spark_len)
+    snapshot.status[quoted] = QUOTED
+    snapshot.status[snapshot.status == LOADING] = MISSING
+    changed = _publish_snapshot(snapshot)
+
+    # Solo las filas que cambiaron; las demás ya están en la caché o se leen de la tabla
+    fresh = {p["symbol"]: p for p in changed if p["updated_at"]}
+    for symbol, product in fresh.items():
+        price_cache.set(symbol, {
+            'price': product['price'],
+            'change': product['change'],
+            'name': product['name'],
+            'updated_at': product['updated_at'],
+        }, ttl=CACHE_DURATION)
+    # El líder ya las persiste; aquí solo se actualiza el respaldo en memoria
+    remember_quotes(fresh, persist=False)
+
+
+def ensure_market_snapshot(now=None):
+    """
+    Sincroniza con la tabla compartida y, si hay cotizaciones caducadas y nadie
+    más las está refrescando, lanza el refresco en segundo plano.
+    Devuelve (snapshot, símbolos caducados).
+    """
+    now = now or time.time()
+    sync_market_snapshot()
+    snapshot = market_cache
+    due = due_symbols(snapshot, now)
+    if due and not _shared_table_is_fresh(now):
+        _trigger_background_refresh(due)
+    return snapshot, due
+
+
+_last_poll = 0.0
+
+def poll_market_snapshot(min_interval=2.0):
+    """`ensure_market_snapshot` como mucho una vez cada `min_interval` s (para los streams abiertos)."""
+    global _last_poll
+    now = time.time()
+    if now - _last_poll < min_interval:
+        return
+    _last_poll = now
+    ensure_market_snapshot(now)
+
+
+def snapshot_products(snapshot):
+    """Productos del snapshot; en el arranque en frío, los últimos precios conocidos."""
+    if snapshot.timestamp:
+        return snapshot.products()
+    return _cold_snapshot().products()
+
+
+def fetch_live_market_data():
+    """
+    Devuelve el último snapshot del mercado sin bloquear nunca en un refresco completo
+    (stale-while-revalidate). Cada producto incluye `age` (segundos desde su última
+    cotización) y `stale` (True si su mercado ha producido precios más nuevos).
+    """
+    now = time.time()
+    snapshot, due = ensure_market_snapshot(now)
+    products_list = snapshot_products(snapshot)
+
+    annotated_list, annotated_dict = [], {}
+    for product in products_list:
+        updated_at = product.get("updated_at") or 0
+        age = round(now - updated_at, 1) if updated_at else None
+        stale = product["symbol"] in due
+        annotated = {**product, "age": age, "stale": stale}
+        annotated_list.append(annotated)
+        annotated_dict[product["symbol"]] = annotated
+    return annotated_list, annotated_dict
+
+
+def snapshot_etag(snapshot, due):
+    """
+    ETag débil de la respuesta en vivo: versión del snapshot + conjunto de símbolos
+    caducados (`stale` cambia sin que cambie la versión). `age` no entra: solo
+    refleja el paso del tiempo desde `updated_at`.
+    """
+    fingerprint = zlib.crc32(",".join(sorted(due)).encode())
+    return f"{snapshot_version(snapshot.timestamp)}-{fingerprint:08x}"
+
+
+def live_products(snapshot, due, now, symbols=None):
+    """
+    Forma reducida de los productos que sirve `/market/data/live` (solo `symbols`
+    si se indican). Parte de los dicts ya generados para la versión del snapshot.
+    """
+    products = snapshot_products(snapshot)
+    if symbols is not None:
+        index = snapshot.universe.index
+        products = [products[i] for i in sorted(index[s] for s in symbols if s in index)]
+    return [
+        {
+            'symbol': p['symbol'],
+            'price': p['price'],
+            'change': p['change'],
+            'category': p.get('category', 'N/A'),
+            'history': p.get('history', []),
+            'age': round(now - p['updated_at'], 1) if p.get('updated_at') else None,
+            'stale': p['symbol'] in due,
+        }
+        for p in products
+    ]
+
+
+_live_json = (None, None)  # (ETag, cuerpo JSON)
+
+def live_market_json(snapshot, due, now):
+    """
+    Cuerpo de `/market/data/live` codificado una sola vez por ETag (versión + caducados):
+    las peticiones siguientes sobre el mismo snapshot reutilizan el texto.
+    `age` queda medida en el momento de la codificación, igual que con un 304.
+    """
+    global _live_json
+    etag = snapshot_etag(snapshot, due)
+    cached_etag, body = _live_json
+    if cached_etag != etag:
+        body = json.dumps(live_products(snapshot, due, now))
+        _live_json = (etag, body)
+    return body
+
 
 # =========================================================
-# FUNCIÓN: Datos históricos bajo demanda
+# FUNCIÓN: Datos históricos bajo demanda (desde el almacén local de velas)
 # =========================================================
-def fetch_historical_data(symbol, period):
-    """Descarga datos históricos del activo seleccionado bajo demanda."""
+DAY = 86400
+
+# Cada periodo del gráfico se sirve de una serie (intervalo) del almacén.
+# `window` se mide hacia atrás desde la última vela guardada.
+HISTORY_PERIODS = {
+    '1D': {'interval': '5m', 'window': DAY, 'limit': 78},
+    '1S': {'interval': '1h', 'window': 7 * DAY, 'limit': 120},
+    '1M': {'interval': '1d', 'window': 31 * DAY, 'limit': 30},
+    '6M': {'interval': '1d', 'window': 183 * DAY, 'limit': 126},
+    '1A': {'interval': '1d', 'window': 366 * DAY, 'limit': 252},
+    '5A': {'interval': '1wk', 'window': 5 * 366 * DAY, 'limit': 260},
+}
+
+# Segundos sin volver a pedir una serie cuyo llenado inicial llegó vacío
+HISTORY_MISS_TTL = 300
+
+# Por intervalo: periodo de la descarga inicial, cada cuánto completar (s) y retención (s)
+BAR_SERIES = {
+    '5m': {'fill_period': '5d', 'fill_window': 5 * DAY, 'topup_after': 300, 'retention': 7 * DAY},
+    '1h': {'fill_period': '1mo', 'fill_window': 30 * DAY, 'topup_after': 900, 'retention': 60 * DAY},
+    '1d': {'fill_period': '5y', 'fill_window': 5 * 365 * DAY, 'topup_after': 3600, 'retention': None},
+    '1wk': {'fill_period': '5y', 'fill_window': 5 * 365 * DAY, 'topup_after': 6 * 3600, 'retention': None},
+}
+
+
+def _frame_to_rows(data):
+    """DataFrame OHLCV del proveedor -> filas (ts, open, high, low, close, volume)."""
+    timestamps = data.index.as_unit('s').asi8.tolist()  # independiente de la resolución del índice
+    columns = [
+        data[col].astype(float).tolist() if col in data else [None] * len(data)
+        for col in ('Open', 'High', 'Low', 'Close', 'Volume')
+    ]
+    return list(zip(timestamps, *columns))
+
+
+def update_bar_series(symbol, interval):
+    """
+    Llena la serie la primera vez y después solo descarga las velas posteriores
+    a la última guardada. Devuelve el número de velas escritas.
+    """
+    return single_flight(("bars", symbol, interval), _update_bar_series, symbol, interval)
+
+
+def _update_bar_series(symbol, interval):
+    spec = BAR_SERIES[interval]
+    store = get_bar_store()
+    last_ts = store.last_timestamp(symbol, interval)
+    now = time.time()
+
+    provider = get_provider()
+    if not provider.available():
+        return 0
+
+    try:
+        if last_ts and now - last_ts < spec['fill_window']:
+            # Incremental: desde la última vela (se reescribe por si estaba incompleta)
+            start = datetime.fromtimestamp(last_ts, tz=timezone.utc)
+            data = provider.get_history(symbol, interval=interval, start=start)
+        else:
+            data = provider.get_history(symbol, interval=interval, period=spec['fill_period'])
+    except Exception as e:
+        print(f"❌ Error al obtener datos históricos de {symbol} ({interval}): {e}")
+        return 0
+
+    data = data.dropna(subset=['Close']) if not data.empty else data
+    tz = str(data.index.tz) if not data.empty and data.index.tz is not None else None
+    rows = _frame_to_rows(data) if not data.empty else []
+    # También sin velas: `last_fetch` deja anotado el fallo de este símbolo (HISTORY_MISS_TTL)
+    store.append(symbol, interval, rows, tz=tz)
+
+    if spec['retention']:
+        store.prune(symbol, interval, now - spec['retention'])
+    return len(rows)
+
+
+def _trigger_series_topup(symbol, interval):
+    # Misma clave que `update_bar_series`: varios lectores de una serie lanzan una sola descarga
+    single_flight_background(
+        ("bars", symbol, interval), _update_bar_series, symbol, interval, name=f"bars-{symbol}-{interval}"
+    )
+
+
+def fetch_historical_data(symbol, period, max_points=None):
+    """
+    Devuelve el histórico del activo para el gráfico desde el almacén local.
+    Solo la primera consulta de una serie descarga; después se completa en segundo plano.
+    Con `max_points` la serie se reduce con LTTB conservando su forma visual.
+    """
     symbol = symbol.upper()
     period = period.upper()
-    period_map = {
-        '1D': {'period': '1d', 'interval': '5m', 'limit': 78},
-        '1S': {'period': '5d', 'interval': '1h', 'limit': 120},
-        '1M': {'period': '1mo', 'interval': '1d', 'limit': 30},
-        '6M': {'period': '6mo', 'interval': '1d', 'limit': 126},
-        '1A': {'period': '1y', 'interval': '1d', 'limit': 252},
-        '5A': {'period': '5y', 'interval': '1wk', 'limit': 260},
-    }
-    if period not in period_map:
+    if period not in HISTORY_PERIODS:
         print(f"⚠️ Periodo no válido: {period}")
         return []
 
     try:
-        params = period_map[period]
-        ticker = yf.Ticker(symbol)
-        data = ticker.history(auto_adjust=True, **{k: v for k, v in params.items() if k != 'limit'})
-        if data.empty:
+        params = HISTORY_PERIODS[period]
+        interval = params['interval']
+        store = get_bar_store()
+
+        info = store.series_info(symbol, interval)
+        if info is not None and not info['last_ts'] and time.time() - info['last_fetch'] < HISTORY_MISS_TTL:
+            # El proveedor ya devolvió esta serie vacía hace poco (activo retirado o sin datos)
             return []
-        subset = data.tail(params.get('limit', 100))
-        historical_data = [
-            {"time": idx.strftime('%Y-%m-%d %H:%M:%S'), "price": float(row['Close'])}
-            for idx, row in subset.iterrows()
-        ]
-        return historical_data
+        if info is None or not info['last_ts']:
+            # Llenado inicial: único caso en que la petición espera a la red
+            update_bar_series(symbol, interval)
+            info = store.series_info(symbol, interval)
+            if info is None or not info['last_ts']:
+                return []
+        elif time.time() - info['last_fetch'] >= BAR_SERIES[interval]['topup_after']:
+            _trigger_series_topup(symbol, interval)
+
+        rows = store.read(
+            symbol, interval, limit=params['limit'], since_ts=info['last_ts'] - params['window']
+        )
+        if not rows:
+            return []
+        return _serialize_history(rows, info['tz'], max_points)
     except Exception as e:
         print(f"❌ Error al obtener datos históricos de {symbol}: {e}")
         return []
 
+def read_daily_closes(symbols, since_ts=None):
+    """
+    {symbol: [(ts, close)]} de la serie diaria ('1d') del almacén. Las series que
+    faltan o tocan completar se piden en segundo plano: nunca se espera a la red.
+    """
+    store = get_bar_store()
+    now = time.time()
+    closes = {}
+    for symbol in symbols:
+        info = store.series_info(symbol, '1d')
+        if info is None or now - info['last_fetch'] >= BAR_SERIES['1d']['topup_after']:
+            _trigger_series_topup(symbol, '1d')
+        closes[symbol] = store.read(symbol, '1d', since_ts=since_ts) if info else []
+    return closes
+
+def _serialize_history(rows, tz, max_points=None):
+    """Filas (ts, close) -> [{'time', 'price'}] por columnas, reducidas con LTTB si se pide."""
+    series = np.asarray(rows, dtype=float)
+    timestamps, closes = series[:, 0], series[:, 1]
+    if max_points:
+        keep = lttb_indices(timestamps, closes, max_points)
+        timestamps, closes = timestamps[keep], closes[keep]
+
+    times = pd.to_datetime(timestamps.astype('int64'), unit='s', utc=True)
+    if tz:
+        times = times.tz_convert(tz)
+    labels = times.strftime('%Y-%m-%d %H:%M:%S')
+    return [{"time": t, "price": p} for t, p in zip(labels, closes.tolist())]
+
 # =========================================================
 # FUNCIÓN: Precarga opcional de favoritos
 # =========================================================
 def preload_favorites():
-    """Descarga los datos de los activos principales en segundo plano."""
-    important_periods = ['1D', '1S', '1M', '6M']
-    for asset in MARKET_UNIVERSE:
-        for period in important_periods:
-            fetch_historical_data(asset['symbol'], period)
+    """Compatibilidad: delega en el precalentamiento priorizado y en paralelo (app/warmup.py)."""
+    from app import app
+    from app.warmup import warm_up
+    return warm_up(app, periods=('1D', '1S', '1M', '6M'))
 
 
-def get_simple_chart_data(current_total_value, timeframe='Todo'):
-    """Genera datos para el gráfico (simplificado para rendimiento) respetando el timeframe."""
-    
-    # Mapeo de timeframe a cantidad de puntos de datos para simulación
-    timeframe_map = {
-        '1D': 15,    # 15 puntos (últimas horas)
-        '1S': 7,     # 7 días
-        '1M': 30,    # 30 días
-        '3M': 90,    # 90 días
-        '1A': 252,   # 1 año (días de mercado)
-        'Todo': 365, # 1 año (simulación total)
-    }
-    
-    days = timeframe_map.get(timeframe, 30) # Por defecto, 30 días
-    
-    labels = []
-    values = []
-    
-    # Generar las fechas desde el pasado hasta hoy
-    for i in range(days):
-        date = datetime.now() - timedelta(days=days-1-i)
-        
-        # Formato de etiqueta (diferente si es intradía vs anual)
-        if timeframe in ['1D', '1S']:
-            labels.append(date.strftime("%H:%M")) 
-        else:
-            labels.append(date.strftime("%Y-%m-%d"))
+# =========================================================
+# METADATOS DE ACTIVOS (TTL largo, ver app/asset_metadata.py)
+# =========================================================
+def get_asset_metadata(symbol, wait=True):
+    """
+    Metadatos del activo desde la caché. Si están caducados se sirven igual y se
+    renuevan en segundo plano; solo un símbolo nunca visto consulta al proveedor
+    (o, con `wait=False`, devuelve None y lo descarga en segundo plano). Un símbolo
+    que hace poco no devolvió datos da None sin volver a consultar.
+    """
+    if is_metadata_miss(symbol):
+        return None
+    data = get_cached_metadata(symbol)
+    if data is not None:
+        if not is_metadata_fresh(data, time.time()):
+            _trigger_metadata_refresh(symbol)
+        return data
+    if not wait:
+        _trigger_metadata_refresh(symbol)
+        return None
+    return single_flight(("meta", symbol), _fetch_asset_metadata, symbol)
 
-        # Pequeña variación aleatoria: asumimos que al inicio del periodo el valor era ligeramente menor
-        # Generar una variación que va decreciendo a medida que nos acercamos al final (el valor real)
-        base_variation_factor = 1.0 - (i / days * 0.05) # Va de 1.0 a 0.95
-        random_factor = random.uniform(0.99, 1.01) # Ruido
-        
-        simulated_value = current_total_value * base_variation_factor * random_factor
 
-        if i == days - 1: 
-            simulated_value = current_total_value # El último punto es el valor real
-            
-        values.append(simulated_value)
-    
-    return {"labels": labels, "values": values}
+def get_asset_name(symbol):
+    """Nombre del activo sin esperar nunca a la red (metadatos o nombre del universo)."""
+    data = get_asset_metadata(symbol, wait=False)
+    return (data and data.get('name')) or universe.name_of(symbol)
+
+
+def _fetch_asset_metadata(symbol):
+    provider = get_provider()
+    if not provider.available():
+        return None
+    try:
+        info = provider.get_info(symbol)
+    except Exception as e:
+        print(f"❌ Error obteniendo metadatos de {symbol}: {e}")
+        record_metadata_miss(symbol)
+        return None
+    if not info:
+        record_metadata_miss(symbol)
+        return None
+    return store_metadata(symbol, metadata_from_info(info), time.time())
+
+
+def _trigger_metadata_refresh(symbol):
+    single_flight_background(("meta", symbol), _fetch_asset_metadata, symbol, name=f"meta-{symbol}")
+
+
+def prefetch_metadata(symbols=None):
+    """Descarga los metadatos ausentes o caducados (por defecto, de todo el universo)."""
+    if not _metadata_prefetch_lock.acquire(blocking=False):
+        return 0
+    try:
+        now = time.time()
+        symbols = symbols or _universe.symbols
+        pending = [
+            s for s in symbols
+            if not is_metadata_fresh(get_cached_metadata(s), now) and not is_metadata_miss(s)
+        ]
+        if not pending:
+            return 0
+        fetched = sum(
+            1 for s in pending
+            if single_flight(("meta", s), _fetch_asset_metadata, s) is not None
+        )
+        print(f"🗂️ Metadatos actualizados: {fetched}/{len(pending)} activos")
+        return fetched
+    finally:
+        _metadata_prefetch_lock.release()
 
-# Nueva función que usarías para datos reales (a implementar en el futuro)
-# ------------------------------------------------------------------
-def get_portfolio_historical_value(holdings, current_capital, timeframe):
-    """
-    Función que DEBERÁS implementar para calcular el valor histórico REAL 
-    de todo el portafolio (sumando capital, restando transacciones) para un periodo dado.
-    Por ahora, solo llama a la simulación para que el código no rompa.
-    """
-    return get_simple_chart_data(current_capital, timeframe)
+
+def _trigger_metadata_prefetch():
+    if _metadata_prefetch_lock.locked():
+        return
+    threading.Thread(target=prefetch_metadata, name="metadata-prefetch", daemon=True).start()
 
 
 def get_asset_details(symbol, category):
-    """Obtiene detalles específicos del activo según su categoría usando yfinance"""
+    """
+    Detalles del activo para su ficha: metadatos desde la caché de TTL largo y
+    precio desde la caché de precios (ninguno pide `info` al proveedor si ya se conoce).
+    """
     try:
-        ticker = yf.Ticker(symbol)
-        info = ticker.info
-        
+        metadata = get_asset_metadata(symbol) or {}
+        current_price = get_price(symbol)
+        if not metadata and not current_price:
+            return None
+
+        snapshot_close = market_cache.previous_close_of(symbol)
+        last_known = get_last_known(symbol)
+        if snapshot_close:
+            previous_close = snapshot_close
+        elif last_known:
+            previous_close = last_known["previous_close"]
+        else:
+            previous_close = current_price
+
         # Campos base comunes
         asset_details = {
-            'name': info.get('longName', info.get('shortName', 'N/A')),
+            'name': metadata.get('name') or universe.name_of(symbol, 'N/A'),
             'symbol': symbol,
             'category': category,
-            'description': info.get('longBusinessSummary', 'Sin descripción disponible.'),
-            'current_price': info.get('currentPrice', info.get('regularMarketPrice', 0)),
-            'previous_close': info.get('previousClose', 0)
+            'description': metadata.get('description') or 'Sin descripción disponible.',
+            'current_price': current_price,
+            'previous_close': previous_close
         }
         
         # Campos específicos por categoría
         if category == 'fondos':
             asset_details.update({
                 'sector': 'Fondo de Inversión',
-                'industry': info.get('category', 'N/A'),
-                'market_cap': info.get('totalAssets', 'N/A'),
-                'expense_ratio': info.get('annualReportExpenseRatio', 'N/A'),
-                'ytd_return': info.get('ytdReturn', 'N/A'),
-                'total_assets': info.get('totalAssets', 'N/A')
+                'industry': metadata.get('fund_category') or 'N/A',
+                'market_cap': metadata.get('total_assets') or 'N/A',
+                'expense_ratio': metadata.get('expense_ratio') or 'N/A',
+                'ytd_return': metadata.get('ytd_return') or 'N/A',
+                'total_assets': metadata.get('total_assets') or 'N/A'
             })
         else:
             # Para acciones, ETFs, crypto, etc.
             asset_details.update({
-                'sector': info.get('sector', 'N/A'),
-                'industry': info.get('industry', 'N/A'),
-                'market_cap': info.get('marketCap', 'N/A')
+                'sector': metadata.get('sector') or 'N/A',
+                'industry': metadata.get('industry') or 'N/A',
+                'market_cap': metadata.get('market_cap') or 'N/A'
             })
         
         return asset_details
         
     except Exception as e:
         print(f"Error obteniendo detalles para {symbol}: {e}")
-        return None
\ No newline at end of file
+        return None
@@ -0,0 +1,173 @@
+"""
+Snapshot del mercado en columnas.
+
+Antes `market_cache` era una lista de dicts más un dict paralelo con los mismos
+dicts: floats de Python sueltos, el `change` ya formateado y una lista de 10
+floats por activo. Con 100 activos da igual; con 10.000 son decenas de miles de
+objetos por snapshot y cada respuesta los recorría y codificaba de nuevo.
+
+Aquí un snapshot es:
+
+- un universo compartido entre versiones (símbolo -> índice, nombres, categorías),
+- arrays numpy con precio, cierre anterior, cambio (%), instante de la cotización
+  y estado de cada fila,
+- una matriz (n x SPARKLINE_POINTS) con las minigráficas.
+
+Un snapshot publicado no se modifica: cada refresco copia las columnas, cambia
+las filas nuevas y publica otro. Los textos (`change`) y los dicts por producto
+se generan solo al servir y una vez por versión (ver `products`).
+"""
+
+import threading
+
+import numpy as np
+
+# Estado de cada fila: cotizada, esperando la primera cotización o sin datos
+QUOTED, LOADING, MISSING = 0, 1, 2
+STATUS_CHANGE_LABEL = {LOADING: "Cargando", MISSING: "Error"}
+
+
+class SnapshotUniverse:
+    """Símbolos del snapshot (uno por símbolo, en el orden del universo) y sus atributos fijos."""
+
+    def __init__(self, assets):
+        # Si un símbolo se repite conserva su primera posición y los datos de la última entrada
+        by_symbol = {a['symbol']: a for a in assets}
+        self.symbols = list(by_symbol)
+        self.index = {symbol: i for i, symbol in enumerate(self.symbols)}
+        self.names = [a['name'] for a in by_symbol.values()]
+        self.categories = [a['category'] for a in by_symbol.values()]
+        self.category_names = list(dict.fromkeys(self.categories))
+        codes = {category: i for i, category in enumerate(self.category_names)}
+        self.category_codes = np.array([codes[c] for c in self.categories], dtype=np.int16)
+
+    def __len__(self):
+        return len(self.symbols)
+
+
+def _change_label(pct):
+    return f"+{pct:.2f}%" if pct >= 0 else f"{pct:.2f}%"
+
+
+class MarketSnapshot:
+    """Columnas de un snapshot del mercado; `timestamp` es el instante de publicación."""
+
+    def __init__(self, universe, spark_len, timestamp=0.0):
+        n = len(universe)
+        self.universe = universe
+        self.timestamp = timestamp
+        self.price = np.zeros(n)
+        self.previous_close = np.full(n, np.nan)
+        self.updated_at = np.zeros(n)
+        self.history = np.zeros((n, spark_len))
+        self.history_len = np.zeros(n, dtype=np.int16)
+        self.status = np.full(n, LOADING, dtype=np.int8)
+        self._products = None
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.universe)
+
+    def __contains__(self, symbol):
+        return symbol in self.universe.index
+
+    # ------------------------------------------------------------------
+    # Construcción (antes de publicar)
+    # ------------------------------------------------------------------
+    def copy(self, timestamp):
+        """Copia de las columnas para construir la versión siguiente."""
+        snapshot = MarketSnapshot(self.universe, self.history.shape[1], timestamp)
+        snapshot.price[:] = self.price
+        snapshot.previous_close[:] = self.previous_close
+        snapshot.updated_at[:] = self.updated_at
+        snapshot.history[:] = self.history
+        snapshot.history_len[:] = self.history_len
+        snapshot.status[:] = self.status
+        return snapshot
+
+    def set_quote(self, symbol, price, previous_close, updated_at, history):
+        """Escribe la cotización de `symbol` (los símbolos fuera del universo se ignoran)."""
+        i = self.universe.index.get(symbol)
+        if i is None:
+            return
+        history = list(history or [price])[-self.history.shape[1]:]
+        self.price[i] = round(price, 4)
+        self.previous_close[i] = previous_close if previous_close is not None else np.nan
+        self.updated_at[i] = updated_at
+        self.history[i, :len(history)] = history
+        self.history_len[i] = len(history)
+        self.status[i] = QUOTED
+
+    # ------------------------------------------------------------------
+    # Consultas
+    # ------------------------------------------------------------------
+    @property
+    def change(self):
+        """Cambio porcentual respecto al cierre anterior (0 si no se puede calcular)."""
+        valid = (self.price > 0) & (self.previous_close > 0)
+        pct = np.zeros(len(self))
+        np.divide(self.price - self.previous_close, self.previous_close, out=pct, where=valid)
+        return pct * 100
+
+    def stale_mask(self, thresholds):
+        """Filas cuya cotización es anterior al umbral de su categoría (`{categoría: epoch}`)."""
+        default = thresholds[None]
+        by_code = np.array([thresholds.get(c, default) for c in self.universe.category_names])
+        return self.updated_at < by_code[self.universe.category_codes]
+
+    def changed_rows(self, previous):
+        """Índices cuyo precio o cierre anterior difiere de `previous` (todos si no son comparables)."""
+        if previous is None or previous.universe is not self.universe or not previous.timestamp:
+            return np.arange(len(self))
+        same_close = (self.previous_close == previous.previous_close) | (
+            np.isnan(self.previous_close) & np.isnan(previous.previous_close)
+        )
+        return np.flatnonzero((self.price != previous.price) | ~same_close)
+
+    def previous_close_of(self, symbol):
+        i = self.universe.index.get(symbol)
+        if i is None or np.isnan(self.previous_close[i]):
+            return None
+        return float(self.previous_close[i])
+
+    def product(self, symbol):
+        """Producto de `symbol` como dict (el formato de siempre), o None si no está en el universo."""
+        i = self.universe.index.get(symbol)
+        return None if i is None else self.products(rows=[i])[0]
+
+    def products(self, rows=None):
+        """
+        Productos como dicts. El listado completo se genera una vez por snapshot
+        (los valores se pasan a Python con `tolist` columna a columna, no celda a celda).
+        """
+        if rows is None and self._products is not None:
+            return self._products
+
+        rows = np.arange(len(self)) if rows is None else np.asarray(rows, dtype=int)
+        universe = self.universe
+        previous_close = self.previous_close[rows]
+        change = self.change[rows].tolist()
+        status = self.status[rows].tolist()
+        history_len = self.history_len[rows].tolist()
+        history = self.history[rows].tolist()
+
+        products = [
+            {
+                "name": universe.names[i],
+                "symbol": universe.symbols[i],
+                "category": universe.categories[i],
+                "price": price,
+                "previous_close": None if close != close else close,  # NaN -> None
+                "change": STATUS_CHANGE_LABEL.get(state) or _change_label(pct),
+                "history": spark[:length] or [0.0],
+                "updated_at": updated_at,
+            }
+            for i, price, close, pct, state, spark, length, updated_at in zip(
+                rows.tolist(), self.price[rows].tolist(), previous_close.tolist(), change,
+                status, history, history_len, self.updated_at[rows].tolist(),
+            )
+        ]
+        if len(rows) == len(self):
+            with self._lock:
+                self._products = products
+        return products
@@ -0,0 +1,127 @@
+"""
+Difusión de cambios del snapshot de mercado (Server-Sent Events).
+
+Cada publicación del snapshot (refresco del líder o sincronización desde la
+tabla compartida) tiene una versión (`int(timestamp * 1000)`, igual en todos
+los workers) y la lista de símbolos cuyo precio cambió. El broadcaster guarda
+las últimas publicaciones ya codificadas en JSON: con mil clientes abiertos el
+coste por refresco es una codificación y mil escrituras, no mil respuestas
+completas.
+
+Un cliente que reconecta con `Last-Event-ID` recibe solo lo cambiado desde esa
+versión; si es demasiado antigua (fuera del histórico) recibe el snapshot completo.
+"""
+
+import json
+import threading
+from collections import deque
+
+STREAM_FIELDS = ('symbol', 'price', 'previous_close', 'change', 'updated_at')
+
+
+def stream_payload(product):
+    """Campos de un producto que viajan por el stream."""
+    return {field: product.get(field) for field in STREAM_FIELDS}
+
+
+class SnapshotBroadcaster:
+    """Historial acotado de publicaciones + condición para despertar a los suscriptores."""
+
+    def __init__(self, backlog=64):
+        self._cond = threading.Condition()
+        self._events = deque(maxlen=backlog)  # (versión anterior, versión, {symbol: payload}, json)
+        self.version = 0
+        self.subscribers = 0
+        self._full = None  # (versión, json del snapshot completo)
+
+    def publish(self, previous_version, version, changes):
+        """Registra la versión `version` (posterior a `previous_version`) con los símbolos cambiados."""
+        encoded = json.dumps(list(changes.values()))
+        with self._cond:
+            if version <= self.version:
+                return
+            self._events.append((previous_version, version, changes, encoded))
+            self.version = version
+            self._cond.notify_all()
+
+    def _newer(self, version):
+        """(versión actual, publicaciones posteriores a `version`) o (actual, None) si no está cubierta."""
+        with self._cond:
+            current = self.version
+            if version == current:
+                return current, []
+            if not self._events or version < self._events[0][0] or version > current:
+                return current, None
+            return current, [event for event in self._events if event[1] > version]
+
+    def changed_symbols_since(self, version):
+        """(versión actual, símbolos cambiados después de `version`), o (actual, None) si no está cubierta."""
+        current, newer = self._newer(version)
+        if newer is None:
+            return current, None
+        return current, {symbol for event in newer for symbol in event[2]}
+
+    def changes_since(self, version):
+        """
+        (versión actual, JSON con los cambios posteriores a `version`), o
+        (versión actual, None) si el historial no cubre `version` (hay que enviar todo).
+        """
+        current, newer = self._newer(version)
+        if newer is None:
+            return current, None
+        if not newer:
+            return current, '[]'
+        if len(newer) == 1:
+            return current, newer[0][3]
+
+        merged = {}
+        for _, _, changes, _ in newer:
+            merged.update(changes)
+        return current, json.dumps(list(merged.values()))
+
+    def full_snapshot(self, version, build):
+        """JSON del snapshot completo de `version`, construido con `build()` una sola vez por versión."""
+        with self._cond:
+            cached = self._full
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        encoded = json.dumps(build())
+        with self._cond:
+            self._full = (version, encoded)
+        return encoded
+
+    def wait_for_update(self, version, timeout):
+        """Bloquea hasta que haya una versión posterior a `version` o venza `timeout`."""
+        with self._cond:
+            if self.version > version:
+                return True
+            self._cond.wait(timeout)
+            return self.version > version
+
+    def subscribe(self, limit=None):
+        """Registra un suscriptor; False si ya hay `limit` conectados."""
+        with self._cond:
+            if limit is not None and self.subscribers >= limit:
+                return False
+            self.subscribers += 1
+            return True
+
+    def unsubscribe(self):
+        with self._cond:
+            self.subscribers -= 1
+
+
+broadcaster = SnapshotBroadcaster()
+
+
+def format_sse(data, event=None, event_id=None, retry=None):
+    """Mensaje SSE con los campos dados (`data` ya es texto JSON)."""
+    lines = []
+    if retry is not None:
+        lines.append(f"retry: {retry}")
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    if event:
+        lines.append(f"event: {event}")
+    lines.append(f"data: {data}")
+    return "\n".join(lines) + "\n\n"
@@ -116,6 +116,10 @@ class Transaction(db.Model):
     
     # Comisiones y costos
     commission_amount = db.Column(db.Float, default=0.0)  # Total comisión pagada
+
+    # Auditoría de la cotización usada para ejecutar
+    quote_age = db.Column(db.Float)  # segundos entre la cotización y la ejecución
+    quote_source = db.Column(db.String(20))  # 'cache', 'live' o 'last_known'
     
     # Timestamp y estado de acción
     timestamp = db.Column(db.DateTime, index=True, default=func.current_timestamp())
@@ -136,6 +140,69 @@ class Transaction(db.Model):
             return self.total_amount - self.commission_amount
 
 
+class PortfolioState(db.Model):
+    """
+    Estado materializado del ledger de un usuario (efectivo y contadores).
+    Se actualiza en la misma transacción de BD que cada compra o venta; el
+    ledger (`transactions`) sigue siendo la fuente de verdad y desde él se
+    puede reconstruir (`flask portfolio-state rebuild`).
+    """
+    __tablename__ = 'portfolio_states'
+
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    cash = db.Column(db.Float, nullable=False)
+    realized_pnl = db.Column(db.Float, nullable=False, default=0.0)
+    trade_count = db.Column(db.Integer, nullable=False, default=0)
+    sell_count = db.Column(db.Integer, nullable=False, default=0)
+    winning_sell_count = db.Column(db.Integer, nullable=False, default=0)
+    last_transaction_id = db.Column(db.Integer)  # última transacción aplicada
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<PortfolioState user={self.user_id} cash=${self.cash:,.2f} txn={self.last_transaction_id}>"
+
+
+class PortfolioPosition(db.Model):
+    """Posición materializada de un usuario en un símbolo (cantidad, coste y P&L realizado)."""
+    __tablename__ = 'portfolio_positions'
+
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    symbol = db.Column(db.String(20), primary_key=True)
+    quantity = db.Column(db.Float, nullable=False, default=0.0)
+    cost_basis = db.Column(db.Float, nullable=False, default=0.0)  # incluye comisiones de compra
+    realized_pnl = db.Column(db.Float, nullable=False, default=0.0)
+
+    def __repr__(self):
+        return f"<PortfolioPosition user={self.user_id} {self.quantity} {self.symbol} (coste ${self.cost_basis:,.2f})>"
+
+
+class PortfolioCheckpoint(db.Model):
+    """
+    Foto del estado del ledger de un usuario tras la transacción `transaction_id`
+    (efectivo, contadores y posiciones). Se escribe cada N operaciones; para
+    reconstruir el portfolio basta con aplicar las transacciones posteriores.
+    """
+    __tablename__ = 'portfolio_checkpoints'
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    transaction_id = db.Column(db.Integer, nullable=False)  # última transacción incluida
+    cash = db.Column(db.Float, nullable=False)
+    realized_pnl = db.Column(db.Float, nullable=False, default=0.0)
+    trade_count = db.Column(db.Integer, nullable=False, default=0)
+    sell_count = db.Column(db.Integer, nullable=False, default=0)
+    winning_sell_count = db.Column(db.Integer, nullable=False, default=0)
+    positions = db.Column(db.JSON, nullable=False)  # {symbol: {quantity, cost_basis, realized_pnl}}
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'transaction_id', name='uq_portfolio_checkpoint_txn'),
+    )
+
+    def __repr__(self):
+        return f"<PortfolioCheckpoint user={self.user_id} txn={self.transaction_id} cash=${self.cash:,.2f}>"
+
+
 class SimulationConfig(db.Model):
     """
     Configuración global del simulador.
@@ -160,4 +227,61 @@ class SimulationConfig(db.Model):
     updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     def __repr__(self):
-        return f"<SimulationConfig initial_capital=${self.initial_capital} commission={self.commission_rate*100}%>"
\ No newline at end of file
+        return f"<SimulationConfig initial_capital=${self.initial_capital} commission={self.commission_rate*100}%>"
+
+class PriceSnapshotRecord(db.Model):
+    """
+    Último precio bueno conocido de cada activo (una fila por símbolo).
+    Se actualiza con cada cotización correcta y se carga al arrancar, para que
+    un despliegue no empiece con la caché de precios vacía.
+    """
+    __tablename__ = 'price_snapshots'
+
+    symbol = db.Column(db.String(20), primary_key=True)
+    name = db.Column(db.String(255))
+    price = db.Column(db.Float, nullable=False)
+    previous_close = db.Column(db.Float)
+    captured_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)  # UTC
+
+    def to_snapshot(self):
+        """Versión de dominio (`financial_engine.PriceSnapshot`)."""
+        from app.domain.financial_engine import PriceSnapshot
+        return PriceSnapshot(symbol=self.symbol, price=self.price, timestamp=self.captured_at)
+
+    def __repr__(self):
+        return f"<PriceSnapshotRecord {self.symbol} @ ${self.price} ({self.captured_at})>"
+
+
+class AssetMetadata(db.Model):
+    """
+    Metadatos de un activo (nombre, sector, descripción...). Cambian como mucho
+    una vez al día, así que se guardan aquí y no se piden al proveedor en cada vista.
+    """
+    __tablename__ = 'asset_metadata'
+
+    symbol = db.Column(db.String(20), primary_key=True)
+    name = db.Column(db.String(255))
+    description = db.Column(db.Text)
+    sector = db.Column(db.String(100))
+    industry = db.Column(db.String(100))
+    fund_category = db.Column(db.String(100))  # categoría Morningstar de los fondos
+    market_cap = db.Column(db.Float)
+    total_assets = db.Column(db.Float)
+    expense_ratio = db.Column(db.Float)
+    ytd_return = db.Column(db.Float)
+    fetched_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)  # UTC
+
+    def __repr__(self):
+        return f"<AssetMetadata {self.symbol} '{self.name}' ({self.fetched_at})>"
+
+
+class AssetView(db.Model):
+    """Contador de visitas a la ficha de cada activo (prioridad del precalentamiento)."""
+    __tablename__ = 'asset_views'
+
+    symbol = db.Column(db.String(20), primary_key=True)
+    views = db.Column(db.Integer, nullable=False, default=0)
+    last_viewed_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<AssetView {self.symbol} views={self.views}>"
@@ -0,0 +1,103 @@
+"""
+Histórico real del valor del portfolio (gráfico del dashboard).
+
+Antes el gráfico salía de `get_simple_chart_data`, que inventaba ruido con
+`random.uniform` en cada petición. Aquí se combina el ledger del usuario con la
+serie diaria de cierres del almacén de velas ('1d') en una matriz
+(símbolos x días) y `financial_engine.build_portfolio_history` calcula en una
+sola pasada vectorizada el NAV, el efectivo, lo invertido y la TWR de cada día
+desde que se abrió la cuenta.
+
+El histórico se guarda por usuario para el día en curso y la última transacción
+aplicada: solo se recalcula al operar o al cambiar de día. El último punto se
+revalora en cada petición con los últimos precios conocidos, para que el
+gráfico termine en el mismo valor que el resumen.
+"""
+
+import dataclasses
+from datetime import datetime
+
+import numpy as np
+
+from app.domain.financial_engine import DAY_SECONDS, build_portfolio_history, epoch_day
+from app.market_service import read_daily_closes
+from app.models import Transaction
+from app.portfolio_state import get_ledger_state, valuation_prices
+from app.price_cache import PriceCache
+
+# Días hacia atrás de cada botón del gráfico (None = desde el alta)
+TIMEFRAME_DAYS = {'1D': 1, '1S': 7, '1M': 30, '3M': 91, '1A': 365, 'TODO': None}
+
+# Mientras falta alguna serie de cierres (se está descargando) el histórico caduca antes
+INCOMPLETE_TTL = 60
+
+_histories = PriceCache(max_size=1000, default_ttl=DAY_SECONDS)
+
+
+def _close_matrix(symbols, start_day, n_days):
+    """Matriz (símbolos x días) de cierres diarios desde `start_day`; NaN donde no hay vela."""
+    closes = np.full((len(symbols), n_days), np.nan)
+    series = read_daily_closes(symbols, since_ts=start_day * DAY_SECONDS)
+    complete = True
+    for i, symbol in enumerate(symbols):
+        rows = series.get(symbol)
+        if not rows:
+            complete = False
+            continue
+        rows = np.asarray(rows, dtype=float)
+        days = (rows[:, 0] // DAY_SECONDS).astype(np.int64) - start_day
+        keep = (days >= 0) & (days < n_days)
+        closes[i, days[keep]] = rows[keep, 1]
+    return closes, complete
+
+
+def get_portfolio_history(user, initial_capital, ledger=None):
+    """PortfolioHistory diaria del usuario (cacheada por día y última transacción)."""
+    ledger = ledger or get_ledger_state(user.id, initial_capital)
+    today = epoch_day(datetime.utcnow())
+    key = (today, ledger.last_transaction_id, initial_capital)
+
+    cached = _histories.get(user.id)
+    if cached is not None and cached[0] == key:
+        return cached[1]
+
+    txns = Transaction.query.filter_by(user_id=user.id).order_by(Transaction.id).all()
+    first_days = [epoch_day(t.timestamp) for t in txns if t.timestamp]
+    if user.created_at:
+        first_days.append(epoch_day(user.created_at))
+    start_day = min(first_days + [today])
+
+    symbols = sorted({t.symbol for t in txns})
+    closes, complete = _close_matrix(symbols, start_day, today - start_day + 1)
+    history = build_portfolio_history(txns, symbols, closes, start_day, initial_capital)
+
+    _histories.set(user.id, (key, history), ttl=None if complete else INCOMPLETE_TTL)
+    return history
+
+
+def current_portfolio_history(user, initial_capital, ledger=None):
+    """Histórico con el último día valorado a los últimos precios conocidos."""
+    ledger = ledger or get_ledger_state(user.id, initial_capital)
+    history = get_portfolio_history(user, initial_capital, ledger)
+
+    prices = valuation_prices(ledger)
+    invested_now = float(history.quantities @ np.array([prices.get(s, 0.0) for s in history.symbols]))
+    nav = history.nav.copy()
+    invested = history.invested.copy()
+    twr = history.twr.copy()
+    invested[-1] = invested_now
+    nav[-1] = history.cash[-1] + invested_now
+    if len(nav) > 1 and nav[-2] > 0:
+        twr[-1] = (1.0 + twr[-2]) * nav[-1] / nav[-2] - 1.0
+    return dataclasses.replace(history, nav=nav, invested=invested, twr=twr)
+
+
+def portfolio_chart_data(user, initial_capital, timeframe='TODO'):
+    """{'labels', 'values'} del valor total del portfolio en el periodo pedido."""
+    history = current_portfolio_history(user, initial_capital)
+    days_back = TIMEFRAME_DAYS.get(timeframe.upper())
+    if days_back is not None:
+        history = history.since(int(history.days[-1]) - days_back)
+
+    labels = history.days.astype('datetime64[D]').astype(str).tolist()
+    return {"labels": labels, "values": np.round(history.nav, 2).tolist()}
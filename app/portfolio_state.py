@@ -0,0 +1,379 @@
+"""
+Estado materializado del portfolio de cada usuario.
+
+Antes el dashboard y el feedback de cada compra/venta recalculaban el portfolio
+recorriendo todas las transacciones del usuario
+(`calculate_portfolio_from_transactions`), así que el coste crecía con la
+antigüedad de la cuenta. Aquí se guarda el resultado de ese recorrido:
+
+- `portfolio_states`: efectivo, P&L realizado y contadores de operaciones,
+- `portfolio_positions`: cantidad, coste y P&L realizado por símbolo,
+
+y cada operación lo actualiza en O(1) dentro de la misma transacción de BD que
+crea el `Transaction` (`record_trade`). El ledger sigue siendo la fuente de
+verdad: el recorrido completo queda para verificar y reconstruir el estado
+(`flask portfolio-state verify|rebuild`).
+
+Cada PORTFOLIO_CHECKPOINT_INTERVAL operaciones se guarda además un checkpoint
+(`portfolio_checkpoints`: el estado completo tras la transacción N). Reconstruir
+parte del último checkpoint y solo aplica las transacciones posteriores, así que
+cuesta como mucho un intervalo aunque la cuenta tenga cientos de miles.
+"""
+
+import click
+from sqlalchemy import update
+from sqlalchemy.exc import IntegrityError
+
+from app import db
+from app.domain.financial_engine import LedgerState, replay_transactions
+from app.models import (
+    PortfolioCheckpoint, PortfolioPosition, PortfolioState, SimulationConfig, Transaction, User
+)
+
+TOLERANCE = 1e-6
+CHECKPOINT_INTERVAL = 500  # operaciones entre checkpoints (0 = sin checkpoints)
+
+
+def default_initial_capital():
+    config = SimulationConfig.query.first()
+    return config.initial_capital if config and config.initial_capital else 10000.0
+
+
+# ========================================================================
+# LECTURA / ESCRITURA DEL ESTADO
+# ========================================================================
+
+def _load_positions(user_id, symbols=None, fresh=False):
+    if symbols is not None and not symbols:
+        return {}
+    query = PortfolioPosition.query.filter_by(user_id=user_id)
+    if symbols is not None:
+        query = query.filter(PortfolioPosition.symbol.in_(symbols))
+    if fresh:
+        query = query.populate_existing()
+    return {
+        p.symbol: {'quantity': p.quantity, 'cost_basis': p.cost_basis, 'realized_pnl': p.realized_pnl}
+        for p in query
+    }
+
+
+def _load(user_id, symbols=None, fresh=False, for_update=False):
+    """
+    LedgerState guardado del usuario (solo las posiciones de `symbols` si se dan) o None.
+    Con `fresh` se relee de BD aunque la fila ya esté en la sesión.
+    """
+    query = PortfolioState.query.filter_by(user_id=user_id)
+    if fresh:
+        query = query.populate_existing()
+    if for_update:
+        query = query.with_for_update()
+    row = query.first()
+    if row is None:
+        return None
+
+    return LedgerState(
+        cash=row.cash,
+        positions=_load_positions(user_id, symbols),
+        realized_pnl=row.realized_pnl,
+        trade_count=row.trade_count,
+        sell_count=row.sell_count,
+        winning_sell_count=row.winning_sell_count,
+        last_transaction_id=row.last_transaction_id
+    )
+
+
+def _store(user_id, state, symbols=None):
+    """Escribe el estado (y las posiciones de `symbols`, o todas) en la sesión, sin commit."""
+    row = db.session.get(PortfolioState, user_id)
+    if row is None:
+        row = PortfolioState(user_id=user_id)
+        db.session.add(row)
+    row.cash = state.cash
+    row.realized_pnl = state.realized_pnl
+    row.trade_count = state.trade_count
+    row.sell_count = state.sell_count
+    row.winning_sell_count = state.winning_sell_count
+    row.last_transaction_id = state.last_transaction_id
+
+    for symbol in (state.positions if symbols is None else symbols):
+        data = state.positions[symbol]
+        position = db.session.get(PortfolioPosition, (user_id, symbol))
+        if position is None:
+            position = PortfolioPosition(user_id=user_id, symbol=symbol)
+            db.session.add(position)
+        position.quantity = data['quantity']
+        position.cost_basis = data['cost_basis']
+        position.realized_pnl = data['realized_pnl']
+
+
+def _lock_user(user_id):
+    """
+    Bloquea las operaciones del usuario hasta el commit o el rollback.
+
+    SQLite ignora `FOR UPDATE`, así que el bloqueo es una escritura sin efecto
+    sobre la fila del usuario: en SQLite toma el lock de escritura de la BD y en
+    Postgres el de la fila. No hace autoflush, para que nada pendiente de la
+    sesión (la `Transaction` nueva) se escriba antes de tener el lock.
+    """
+    with db.session.no_autoflush:
+        db.session.execute(
+            update(User).where(User.id == user_id).values(capital=User.capital)
+            .execution_options(synchronize_session=False)
+        )
+
+
+def lock_user_ledger(user_id):
+    """
+    Serializa las operaciones del usuario: llamar antes de validar una orden y
+    mantener hasta el commit. Devuelve el `User` releído (capital incluido), de
+    modo que la validación ve lo que dejó la última operación confirmada.
+    """
+    _lock_user(user_id)
+    return User.query.filter_by(id=user_id).with_for_update().populate_existing().one()
+
+
+def _ledger(user_id, after_id=None, upto_id=None):
+    query = Transaction.query.filter_by(user_id=user_id)
+    if after_id is not None:
+        query = query.filter(Transaction.id > after_id)
+    if upto_id is not None:
+        query = query.filter(Transaction.id <= upto_id)
+    return query.order_by(Transaction.id).all()
+
+
+# ========================================================================
+# CHECKPOINTS
+# ========================================================================
+
+def latest_checkpoint(user_id):
+    """Último checkpoint del usuario como LedgerState, o None."""
+    row = PortfolioCheckpoint.query.filter_by(user_id=user_id)\
+                                   .order_by(PortfolioCheckpoint.transaction_id.desc())\
+                                   .first()
+    if row is None:
+        return None
+    return LedgerState(
+        cash=row.cash,
+        positions={symbol: dict(data) for symbol, data in row.positions.items()},
+        realized_pnl=row.realized_pnl,
+        trade_count=row.trade_count,
+        sell_count=row.sell_count,
+        winning_sell_count=row.winning_sell_count,
+        last_transaction_id=row.transaction_id
+    )
+
+
+def write_checkpoint(user_id, state):
+    """Guarda `state` (con todas sus posiciones) como checkpoint, sin commit. None si ya existía."""
+    if state.last_transaction_id is None:
+        return None
+    exists = PortfolioCheckpoint.query.filter_by(
+        user_id=user_id, transaction_id=state.last_transaction_id
+    ).first()
+    if exists:
+        return None
+    checkpoint = PortfolioCheckpoint(
+        user_id=user_id,
+        transaction_id=state.last_transaction_id,
+        cash=state.cash,
+        realized_pnl=state.realized_pnl,
+        trade_count=state.trade_count,
+        sell_count=state.sell_count,
+        winning_sell_count=state.winning_sell_count,
+        positions={symbol: dict(data) for symbol, data in state.positions.items()}
+    )
+    db.session.add(checkpoint)
+    return checkpoint
+
+
+# ========================================================================
+# API
+# ========================================================================
+
+def rebuild_portfolio_state(user_id, initial_capital=None, full=False):
+    """
+    Recalcula el estado desde el último checkpoint (o, con `full`, desde el
+    ledger completo) y lo deja en la sesión (sin commit).
+    """
+    checkpoint = None if full else latest_checkpoint(user_id)
+    if checkpoint is not None:
+        state = replay_transactions(_ledger(user_id, after_id=checkpoint.last_transaction_id), state=checkpoint)
+    else:
+        if initial_capital is None:
+            initial_capital = default_initial_capital()
+        state = replay_transactions(_ledger(user_id), initial_capital)
+    PortfolioPosition.query.filter_by(user_id=user_id).delete()
+    db.session.flush()
+    _store(user_id, state)
+    return state
+
+
+def get_ledger_state(user_id, initial_capital=None):
+    """
+    Estado del ledger del usuario. Si todavía no está materializado (usuarios
+    anteriores a esta tabla) se reconstruye una vez y se guarda.
+    """
+    state = _load(user_id)
+    if state is not None:
+        return state
+
+    # Con el lock, una operación simultánea no materializa a la vez
+    _lock_user(user_id)
+    state = _load(user_id, fresh=True)
+    if state is not None:
+        db.session.commit()
+        return state
+    state = rebuild_portfolio_state(user_id, initial_capital)
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # Otra petición lo materializó a la vez: vale cualquiera de los dos
+        db.session.rollback()
+    return state
+
+
+def record_trade(txn, initial_capital=None):
+    """
+    Aplica `txn` (ya añadida a la sesión) al estado de su usuario. Llamar antes
+    del commit para que estado y ledger se guarden juntos.
+
+    Se aplican las transacciones posteriores a la última aplicada (normalmente
+    solo `txn`), así que solo se leen y escriben la fila del estado y la posición
+    de los símbolos afectados. Las operaciones del usuario van en serie
+    (`lock_user_ledger`, que el controlador toma antes de validar la orden): el
+    lock se toma antes de asignar el id de `txn`, así que los ids de un usuario
+    se confirman en orden y ninguno queda por detrás de `last_transaction_id`.
+    """
+    _lock_user(txn.user_id)
+    db.session.flush()  # asigna txn.id
+    state = _load(txn.user_id, symbols=(), fresh=True, for_update=True)
+    if state is None:
+        # Primera operación con estado materializado: el ledger ya incluye `txn`
+        return rebuild_portfolio_state(txn.user_id, initial_capital)
+
+    pending = _ledger(txn.user_id, after_id=state.last_transaction_id)
+    symbols = {t.symbol for t in pending}
+    state.positions = _load_positions(txn.user_id, symbols, fresh=True)
+    trades_before = state.trade_count
+    replay_transactions(pending, state=state)
+    _store(txn.user_id, state, symbols=symbols)
+
+    # Checkpoint al cruzar un múltiplo del intervalo (necesita todas las posiciones)
+    if CHECKPOINT_INTERVAL and state.trade_count // CHECKPOINT_INTERVAL > trades_before // CHECKPOINT_INTERVAL:
+        full_state = state.copy()
+        full_state.positions = {**_load_positions(txn.user_id), **state.positions}
+        write_checkpoint(txn.user_id, full_state)
+    return state
+
+
+def valuation_prices(state, overrides=None):
+    """
+    Precio de cada posición abierta: último precio conocido (sin esperar a la red)
+    o, para activos nunca cotizados, su coste medio. `overrides` manda sobre ambos.
+    """
+    from app.market_service import get_last_known_price
+
+    prices = {}
+    for symbol, position in state.positions.items():
+        if position['quantity'] > 0.0001:
+            prices[symbol] = get_last_known_price(symbol) or position['cost_basis'] / position['quantity']
+    prices.update(overrides or {})
+    return prices
+
+
+def _diff(stored, expected):
+    diffs = []
+    for field in ('cash', 'realized_pnl', 'trade_count', 'sell_count', 'winning_sell_count', 'last_transaction_id'):
+        got, want = getattr(stored, field), getattr(expected, field)
+        if got != want and not (isinstance(want, float) and abs(got - want) <= TOLERANCE):
+            diffs.append(f"{field}: guardado {got} != ledger {want}")
+
+    empty = {'quantity': 0.0, 'cost_basis': 0.0, 'realized_pnl': 0.0}
+    for symbol in sorted(set(stored.positions) | set(expected.positions)):
+        got = stored.positions.get(symbol, empty)
+        want = expected.positions.get(symbol, empty)
+        for key in ('quantity', 'cost_basis', 'realized_pnl'):
+            if abs(got[key] - want[key]) > TOLERANCE:
+                diffs.append(f"{symbol}.{key}: guardado {got[key]} != ledger {want[key]}")
+    return diffs
+
+
+def verify_portfolio_state(user_id, initial_capital=None):
+    """
+    Diferencias (textos) entre lo guardado (estado materializado y último
+    checkpoint) y el recálculo completo del ledger.
+    """
+    if initial_capital is None:
+        initial_capital = default_initial_capital()
+    stored = _load(user_id)
+    if stored is None:
+        return ["sin estado materializado"]
+
+    diffs = []
+    checkpoint = latest_checkpoint(user_id)
+    if checkpoint is not None:
+        at_checkpoint = replay_transactions(_ledger(user_id, upto_id=checkpoint.last_transaction_id), initial_capital)
+        diffs += [f"checkpoint {checkpoint.last_transaction_id}: {d}" for d in _diff(checkpoint, at_checkpoint)]
+        expected = replay_transactions(_ledger(user_id, after_id=checkpoint.last_transaction_id), state=at_checkpoint)
+    else:
+        expected = replay_transactions(_ledger(user_id), initial_capital)
+    return diffs + _diff(stored, expected)
+
+
+# ========================================================================
+# CLI
+# ========================================================================
+
+def register_portfolio_state(app):
+    """Lee el intervalo de checkpoints y registra los comandos `flask portfolio-state ...`."""
+    global CHECKPOINT_INTERVAL
+    CHECKPOINT_INTERVAL = app.config.get('PORTFOLIO_CHECKPOINT_INTERVAL', CHECKPOINT_INTERVAL)
+
+    group = click.Group('portfolio-state', help='Estado materializado de los portfolios.')
+
+    def _user_ids(user_id):
+        if user_id is not None:
+            return [user_id]
+        return [uid for (uid,) in db.session.query(User.id).order_by(User.id)]
+
+    @group.command('verify')
+    @click.option('--user-id', type=int, default=None, help='Solo este usuario.')
+    def verify_command(user_id):
+        """Compara el estado guardado con el recálculo completo del ledger."""
+        initial_capital = default_initial_capital()
+        failed = 0
+        for uid in _user_ids(user_id):
+            diffs = verify_portfolio_state(uid, initial_capital)
+            if diffs:
+                failed += 1
+                print(f"❌ Usuario {uid}: " + "; ".join(diffs))
+        print(f"✅ Estado verificado ({failed} usuarios con diferencias)")
+        if failed:
+            raise SystemExit(1)
+
+    @group.command('rebuild')
+    @click.option('--user-id', type=int, default=None, help='Solo este usuario.')
+    @click.option('--full', is_flag=True, help='Desde el ledger completo, sin usar checkpoints.')
+    def rebuild_command(user_id, full):
+        """Reconstruye el estado materializado desde el último checkpoint y el ledger."""
+        initial_capital = default_initial_capital()
+        user_ids = _user_ids(user_id)
+        for uid in user_ids:
+            rebuild_portfolio_state(uid, initial_capital, full=full)
+        db.session.commit()
+        print(f"✅ Estado reconstruido para {len(user_ids)} usuarios")
+
+    @group.command('checkpoint')
+    @click.option('--user-id', type=int, default=None, help='Solo este usuario.')
+    def checkpoint_command(user_id):
+        """Guarda ya un checkpoint del estado de cada usuario."""
+        initial_capital = default_initial_capital()
+        written = 0
+        for uid in _user_ids(user_id):
+            state = get_ledger_state(uid, initial_capital)
+            if write_checkpoint(uid, state) is not None:
+                written += 1
+        db.session.commit()
+        print(f"✅ {written} checkpoints guardados")
+
+    app.cli.add_command(group)
@@ -0,0 +1,95 @@
+"""
+Caché de precios unificada (TTL + LRU, segura entre hilos).
+
+Sustituye a las cachés sueltas del mercado, del dashboard y de Flask-Caching:
+el refresco del mercado, el dashboard y las operaciones leen y escriben aquí,
+así un precio descargado para una vista sirve para todas.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+DEFAULT_MAX_SIZE = 5000
+DEFAULT_TTL = 600  # segundos
+
+
+class PriceCache:
+    """
+    Diccionario acotado con expiración por clave.
+
+    - Al superar `max_size` se expulsa la entrada usada hace más tiempo (LRU);
+      con `max_size=None` no se expulsa nada.
+    - Cada entrada tiene su propio TTL; una entrada expirada cuenta como fallo.
+    - Todas las operaciones están protegidas por un único lock.
+    """
+
+    def __init__(self, max_size=DEFAULT_MAX_SIZE, default_ttl=DEFAULT_TTL):
+        self.max_size = max_size
+        self.default_ttl = default_ttl
+        self._data = OrderedDict()  # key -> (value, stored_at, expires_at)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, max_age=None):
+        """
+        Devuelve el valor si existe y no ha expirado (ni supera `max_age` segundos), o None.
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, stored_at, expires_at = entry
+            if now >= expires_at:
+                del self._data[key]
+                self.misses += 1
+                return None
+            if max_age is not None and now - stored_at > max_age:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, ttl=None):
+        now = time.time()
+        ttl = self.default_ttl if ttl is None else ttl
+        with self._lock:
+            self._data[key] = (value, now, now + ttl)
+            self._data.move_to_end(key)
+            while self.max_size is not None and len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def __len__(self):
+        with self._lock:
+            return len(self._data)
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'size': len(self._data),
+                'max_size': self.max_size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': (self.hits / total) if total else 0.0,
+            }
+
+
+# Instancia compartida por todo el proceso
+price_cache = PriceCache()
@@ -0,0 +1,191 @@
+"""
+Protección del proveedor de mercado real: limitador de tasa, reintentos y circuit breaker.
+
+Sin esto, una caída o un 429 de yfinance hacía fallar los símbolos uno a uno, cada
+uno esperando su propio timeout, y las compras seguían golpeando al proveedor.
+
+- TokenBucket: limita las llamadas de todo el proceso a `rate` por segundo (ráfagas de `burst`).
+- Reintentos con backoff exponencial (con jitter) para errores transitorios.
+- CircuitBreaker: tras `failure_threshold` fallos seguidos se abre y rechaza al
+  instante durante `reset_timeout` segundos; después deja pasar una sonda
+  (half-open) y se cierra si tiene éxito.
+
+Mientras el circuito está abierto las llamadas lanzan `ProviderUnavailableError`
+sin tocar la red, y el servicio de mercado sirve los últimos precios conocidos.
+"""
+
+import random
+import threading
+import time
+
+from app.market_providers import EmptyResponseError, MarketDataError, MarketDataProvider
+
+
+class ProviderUnavailableError(MarketDataError):
+    """Circuito abierto o límite de tasa agotado: no se ha consultado al proveedor"""
+    pass
+
+
+class TokenBucket:
+    """Cubo de tokens seguro entre hilos."""
+
+    def __init__(self, rate, burst):
+        self.rate = float(rate)
+        self.capacity = float(max(burst, 1))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, timeout=None):
+        """Toma un token esperando como mucho `timeout` segundos. Devuelve False si no llega."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return True
+                wait = (1 - self._tokens) / self.rate if self.rate > 0 else 0.1
+            if deadline is not None and now + wait > deadline:
+                return False
+            time.sleep(wait)
+
+
+class CircuitBreaker:
+    """Estados: 'closed' (normal), 'open' (rechaza todo) y 'half_open' (una sonda en vuelo)."""
+
+    def __init__(self, failure_threshold=5, reset_timeout=60):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = 'closed'
+        self.failures = 0
+        self.opened_at = 0.0
+        self.times_opened = 0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """True si la llamada puede ir al proveedor."""
+        with self._lock:
+            if self.state == 'closed':
+                return True
+            if self.state == 'open' and time.time() - self.opened_at >= self.reset_timeout:
+                self.state = 'half_open'
+                self._probe_in_flight = False
+            if self.state == 'half_open' and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            return False
+
+    def release_probe(self):
+        """La llamada autorizada por `allow` no llegó al proveedor: otra puede hacer de sonda."""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def record_success(self):
+        with self._lock:
+            if self.state != 'closed':
+                print("✅ Proveedor de mercado recuperado, circuito cerrado")
+            self.state = 'closed'
+            self.failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == 'half_open' or self.failures >= self.failure_threshold:
+                if self.state != 'open':
+                    self.times_opened += 1
+                    print(f"🔌 Circuito del proveedor abierto tras {self.failures} fallos "
+                          f"(reintento en {self.reset_timeout}s)")
+                self.state = 'open'
+                self.opened_at = time.time()
+                self._probe_in_flight = False
+
+    def is_open(self):
+        with self._lock:
+            return self.state == 'open' and time.time() - self.opened_at < self.reset_timeout
+
+    def stats(self):
+        with self._lock:
+            return {
+                'state': self.state,
+                'failures': self.failures,
+                'opened_at': self.opened_at or None,
+                'times_opened': self.times_opened,
+            }
+
+
+class GuardedProvider(MarketDataProvider):
+    """Envuelve otro proveedor con limitador de tasa, reintentos y circuit breaker."""
+
+    def __init__(self, inner, rate=5.0, burst=10, failure_threshold=5, reset_timeout=60,
+                 max_retries=2, backoff_base=0.5, backoff_max=8.0, acquire_timeout=5.0):
+        self.inner = inner
+        self.name = inner.name
+        self.bucket = TokenBucket(rate, burst)
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.acquire_timeout = acquire_timeout
+        self.rejected = 0
+
+    def available(self):
+        return not self.breaker.is_open()
+
+    def _call(self, what, fn, *args, **kwargs):
+        for attempt in range(self.max_retries + 1):
+            if not self.breaker.allow():
+                self.rejected += 1
+                raise ProviderUnavailableError(f"Proveedor no disponible (circuito abierto): {what}")
+            if not self.bucket.acquire(timeout=self.acquire_timeout):
+                # Sin llamada no hay resultado: si era la sonda half-open hay que soltarla
+                self.breaker.release_probe()
+                self.rejected += 1
+                raise ProviderUnavailableError(f"Límite de peticiones al proveedor agotado: {what}")
+            try:
+                result = fn(*args, **kwargs)
+            except EmptyResponseError as e:
+                # Vacío donde debía haber datos: el proveedor está fallando aunque no lo diga
+                error = e
+            except MarketDataError:
+                # Respuesta definitiva (dato inexistente): ni se reintenta ni abre el circuito
+                self.breaker.record_success()
+                raise
+            except Exception as e:
+                error = e
+            else:
+                self.breaker.record_success()
+                return result
+
+            self.breaker.record_failure()
+            if attempt >= self.max_retries or self.breaker.is_open():
+                raise error
+            delay = min(self.backoff_max, self.backoff_base * 2 ** attempt)
+            delay *= random.uniform(0.5, 1.0)
+            print(f"⏳ {what}: {error} (reintento {attempt + 1} en {delay:.1f}s)")
+            time.sleep(delay)
+
+    def get_info(self, symbol):
+        return self._call(f"info {symbol}", self.inner.get_info, symbol)
+
+    def get_history(self, symbol, interval='1d', period=None, start=None, auto_adjust=True):
+        return self._call(
+            f"history {symbol} {interval}", self.inner.get_history,
+            symbol, interval=interval, period=period, start=start, auto_adjust=auto_adjust
+        )
+
+    def get_bulk_closes(self, symbols, period='1mo', interval='1d'):
+        return self._call(
+            f"bulk {len(symbols)} símbolos", self.inner.get_bulk_closes,
+            symbols, period=period, interval=interval
+        )
+
+    def stats(self):
+        return {**self.breaker.stats(), 'rejected': self.rejected, 'provider': self.name}
@@ -0,0 +1,78 @@
+"""
+Elección del proceso refrescador del mercado.
+
+Todos los workers del host compiten por un lock exclusivo (`flock`) sobre un
+fichero de lease. El que lo obtiene es el único que consulta al proveedor y
+publica el snapshot; el resto solo lee la tabla compartida. Si el líder muere,
+el sistema operativo libera el lock y otro worker lo toma en su siguiente intento.
+El líder escribe un latido periódico en el fichero para diagnóstico.
+"""
+
+import json
+import os
+import socket
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows: sin flock, cada proceso se considera líder
+    fcntl = None
+
+
+class LeaderLease:
+    """Lease de liderazgo basado en `flock` no bloqueante."""
+
+    def __init__(self, path, role='refrescador del mercado'):
+        self.path = path
+        self.role = role
+        self._fd = None
+        self.acquired_at = None
+
+    @property
+    def is_leader(self):
+        return self._fd is not None
+
+    def try_acquire(self):
+        """Intenta tomar el liderazgo. Devuelve True si este proceso es (o ya era) el líder."""
+        if self._fd is not None:
+            return True
+        if fcntl is None:
+            self._fd = -1
+            self.acquired_at = time.time()
+            return True
+
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+
+        self._fd = fd
+        self.acquired_at = time.time()
+        self.heartbeat()
+        print(f"👑 Proceso {os.getpid()} es ahora el {self.role}")
+        return True
+
+    def heartbeat(self):
+        """Actualiza el latido del líder en el fichero de lease."""
+        if self._fd is None or self._fd < 0:
+            return
+        payload = json.dumps({
+            'pid': os.getpid(),
+            'host': socket.gethostname(),
+            'acquired_at': self.acquired_at,
+            'heartbeat_at': time.time(),
+        }).encode()
+        os.ftruncate(self._fd, 0)
+        os.pwrite(self._fd, payload, 0)
+
+    def release(self):
+        if self._fd is None:
+            return
+        if self._fd >= 0:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+            os.close(self._fd)
+        self._fd = None
+        self.acquired_at = None
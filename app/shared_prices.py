@@ -0,0 +1,235 @@
+"""
+Tabla de precios compartida entre procesos (fichero mapeado en memoria).
+
+Con gunicorn cada worker tenía su propio `market_cache`: N veces las descargas,
+N veces la memoria y precios distintos según el worker. Aquí un único proceso
+escritor (el que refresca el mercado) publica el snapshot en un array de tamaño
+fijo indexado por símbolo, y todos los workers lo leen directamente del mmap.
+
+Formato del fichero:
+    cabecera (64 bytes) | símbolos (n x 24 bytes) | filas (n x slot)
+    slot = price, prev_close, ts, n_spark, spark[spark_len]
+
+La consistencia se garantiza con un seqlock: el escritor deja `seq` impar mientras
+escribe y par al terminar; el lector reintenta si `seq` cambió durante la lectura.
+"""
+
+import mmap
+import os
+import threading
+import time
+
+import numpy as np
+
+MAGIC = b'SVPT'
+LAYOUT_VERSION = 1
+SYMBOL_BYTES = 24
+
+HEADER_DTYPE = np.dtype([
+    ('magic', 'S4'),
+    ('layout', '<u4'),
+    ('n', '<u4'),
+    ('spark_len', '<u4'),
+    ('seq', '<u8'),
+    ('published_at', '<f8'),
+    ('reserved', '<u8', (4,)),
+])
+
+
+def _slot_dtype(spark_len):
+    return np.dtype([
+        ('price', '<f8'),
+        ('prev_close', '<f8'),
+        ('ts', '<f8'),
+        ('n_spark', '<u4'),
+        ('pad', '<u4'),
+        ('spark', '<f8', (spark_len,)),
+    ])
+
+
+class SharedPriceTable:
+    """Vista numpy sobre el fichero mapeado; el escritor lo crea, los lectores lo abren."""
+
+    def __init__(self, path, symbols=None, spark_len=10, writer=False):
+        self.path = path
+        self.writer = writer
+        self.spark_len = spark_len
+        self._symbols = list(symbols or [])
+        self._write_lock = threading.Lock()
+        self._mm = None
+        self._inode = None
+        self._positions_cache = None
+        self.index = {}
+        if writer:
+            self._create()
+
+    # ------------------------------------------------------------------
+    # Mapeo del fichero
+    # ------------------------------------------------------------------
+    def _size(self, n, spark_len):
+        return HEADER_DTYPE.itemsize + n * SYMBOL_BYTES + n * _slot_dtype(spark_len).itemsize
+
+    def _create(self):
+        """Crea (o reutiliza si la disposición coincide) el fichero de la tabla."""
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        n = len(self._symbols)
+        if self._open() and self.header['n'] == n and self.header['spark_len'] == self.spark_len \
+                and [s.decode() for s in self.symbols_block] == self._symbols:
+            # Un escritor que murió a mitad de publicación deja `seq` impar: se redondea a
+            # par antes de la primera escritura para no invertir la paridad del seqlock
+            if int(self.header['seq']) % 2:
+                self.header['seq'] += 1
+            return
+
+        # Disposición nueva: fichero temporal + rename atómico para no romper a los lectores
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp, 'wb') as fh:
+            fh.truncate(self._size(n, self.spark_len))
+        with open(tmp, 'r+b') as fh:
+            mm = mmap.mmap(fh.fileno(), 0)
+            header = np.ndarray((), dtype=HEADER_DTYPE, buffer=mm)
+            header['magic'] = MAGIC
+            header['layout'] = LAYOUT_VERSION
+            header['n'] = n
+            header['spark_len'] = self.spark_len
+            symbols = np.ndarray((n,), dtype=f'S{SYMBOL_BYTES}', buffer=mm, offset=HEADER_DTYPE.itemsize)
+            symbols[:] = [s.encode() for s in self._symbols]
+            mm.flush()
+            del header, symbols
+            mm.close()
+        os.replace(tmp, self.path)
+        self._open()
+
+    def _open(self):
+        """(Re)mapea el fichero si no estaba mapeado o si el escritor lo reemplazó."""
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return False
+        if self._mm is not None and stat.st_ino == self._inode:
+            return True
+        if stat.st_size < HEADER_DTYPE.itemsize:
+            return False
+
+        with open(self.path, 'r+b') as fh:
+            mm = mmap.mmap(fh.fileno(), 0)
+        header = np.ndarray((), dtype=HEADER_DTYPE, buffer=mm)
+        if header['magic'] != MAGIC or header['layout'] != LAYOUT_VERSION:
+            return False
+        n, spark_len = int(header['n']), int(header['spark_len'])
+        if stat.st_size < self._size(n, spark_len):
+            return False
+
+        self._mm = mm
+        self._inode = stat.st_ino
+        self.header = header
+        self.spark_len = spark_len
+        offset = HEADER_DTYPE.itemsize
+        self.symbols_block = np.ndarray((n,), dtype=f'S{SYMBOL_BYTES}', buffer=mm, offset=offset)
+        self.slots = np.ndarray(
+            (n,), dtype=_slot_dtype(spark_len), buffer=mm, offset=offset + n * SYMBOL_BYTES
+        )
+        self.index = {s.decode(): i for i, s in enumerate(self.symbols_block)}
+        return True
+
+    # ------------------------------------------------------------------
+    # Escritura (solo el proceso refrescador)
+    # ------------------------------------------------------------------
+    def become_writer(self):
+        """Promociona este proceso a escritor (al ganar la elección de refrescador)."""
+        if not self.writer:
+            self.writer = True
+            self._create()
+
+    def _positions(self, symbols):
+        """Posición en la tabla de cada símbolo de `symbols` (-1 si no está), cacheada por fichero."""
+        key = (self._inode, id(symbols), len(symbols))
+        if self._positions_cache is None or self._positions_cache[0] != key:
+            positions = np.array([self.index.get(s, -1) for s in symbols], dtype=np.int64)
+            self._positions_cache = (key, positions)
+        return self._positions_cache[1]
+
+    def write_columns(self, symbols, price, previous_close, updated_at, history, history_len,
+                      published_at=None):
+        """
+        Publica de una vez un snapshot en columnas alineadas con `symbols`. Solo se
+        escriben las filas con precio; el resto (y los símbolos fuera de la tabla) se conservan.
+        """
+        if not self.writer:
+            raise RuntimeError("Solo el proceso escritor puede publicar en la tabla")
+
+        with self._write_lock:
+            self._open()
+            rows = self.slots.copy()
+            positions = self._positions(symbols)
+            write = (positions >= 0) & (price > 0)
+            target = positions[write]
+            spark_len = min(self.spark_len, history.shape[1])
+
+            rows['price'][target] = price[write]
+            rows['prev_close'][target] = np.where(previous_close > 0, previous_close, price)[write]
+            rows['ts'][target] = updated_at[write]
+            rows['n_spark'][target] = np.minimum(history_len[write], spark_len)
+            rows['spark'][target, :spark_len] = history[write, :spark_len]
+
+            self.header['seq'] += 1      # impar: escritura en curso
+            self.slots[:] = rows
+            self.header['published_at'] = published_at or time.time()
+            self.header['seq'] += 1      # par: snapshot consistente
+
+    # ------------------------------------------------------------------
+    # Lectura (cualquier worker)
+    # ------------------------------------------------------------------
+    def _consistent(self, read):
+        for _ in range(100):
+            seq = int(self.header['seq'])
+            if seq % 2:
+                time.sleep(0)
+                continue
+            result = read()
+            if int(self.header['seq']) == seq:
+                return result
+        return None
+
+    def published_at(self):
+        if not self._open():
+            return 0.0
+        return float(self.header['published_at'])
+
+    def read(self, symbol):
+        """Fila de un símbolo como dict, o None si no existe o no tiene precio."""
+        if not self._open():
+            return None
+        i = self.index.get(symbol)
+        if i is None:
+            return None
+        row = self._consistent(lambda: self.slots[i].copy())
+        if row is None or row['price'] <= 0:
+            return None
+        return self._row_to_dict(row)
+
+    def read_columns(self, symbols):
+        """
+        (published_at, filas) con las filas alineadas con `symbols` (array estructurado;
+        precio 0 donde no hay dato), o (0.0, None) si la tabla no se puede leer.
+        """
+        if not self._open():
+            return 0.0, None
+        snapshot = self._consistent(lambda: (float(self.header['published_at']), self.slots.copy()))
+        if snapshot is None:
+            return 0.0, None
+        published_at, slots = snapshot
+        positions = self._positions(symbols)
+        found = positions >= 0
+        rows = np.zeros(len(symbols), dtype=slots.dtype)
+        rows[found] = slots[positions[found]]
+        return published_at, rows
+
+    def _row_to_dict(self, row):
+        n = int(row['n_spark'])
+        return {
+            'price': float(row['price']),
+            'previous_close': float(row['prev_close']),
+            'updated_at': float(row['ts']),
+            'history': row['spark'][:n].tolist(),
+        }
@@ -0,0 +1,288 @@
+"""
+Mercado sintético para pruebas de carga y modo demo sin proveedor de datos.
+
+Genera trayectorias de precio con movimiento browniano geométrico (GBM) y
+volatilidad propia de cada clase de activo. Las trayectorias son deterministas
+(dependen solo de la semilla, el símbolo y el tiempo), así que el precio actual,
+los históricos de cualquier intervalo y las cotizaciones en bloque son coherentes
+entre sí y entre procesos.
+
+- Cierres diarios: GBM desde `start_date` (profundidad del histórico).
+- Intradía: puente browniano entre cierres consecutivos a `tick_seconds` de resolución.
+"""
+
+import threading
+import time
+import zlib
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+from app.market_providers import MarketDataProvider, MarketDataError, PERIOD_SECONDS
+from app.universe import universe
+
+DAY = 86400
+TRADING_DAYS = 365  # el mercado sintético cotiza todos los días
+
+# Deriva (mu) y volatilidad (sigma) anuales por clase de activo, y rango de precio inicial
+CATEGORY_PARAMS = {
+    'acciones':   {'mu': 0.08, 'sigma': 0.30, 'price_range': (20.0, 600.0)},
+    'etfs':       {'mu': 0.07, 'sigma': 0.18, 'price_range': (20.0, 500.0)},
+    'fondos':     {'mu': 0.06, 'sigma': 0.12, 'price_range': (10.0, 150.0)},
+    'renta-fija': {'mu': 0.03, 'sigma': 0.06, 'price_range': (20.0, 120.0)},
+    'crypto':     {'mu': 0.20, 'sigma': 0.75, 'price_range': (0.01, 60000.0)},
+}
+DEFAULT_CATEGORY = 'acciones'
+
+INTERVAL_SECONDS = {
+    '1m': 60, '2m': 120, '5m': 300, '15m': 900, '30m': 1800,
+    '60m': 3600, '1h': 3600, '1d': DAY, '5d': 5 * DAY, '1wk': 7 * DAY,
+}
+
+_CHUNK_DAYS = 256
+
+# Etiquetas para separar los flujos aleatorios de cada uso
+_STREAM_PARAMS, _STREAM_DAILY, _STREAM_INTRADAY = 1, 2, 3
+
+
+def simulate_gbm_paths(start_prices, mu, sigma, n_steps, dt, rng):
+    """
+    Simula trayectorias GBM vectorizadas.
+
+    Args:
+        start_prices: array (n,) de precios iniciales
+        mu, sigma: escalares o arrays (n,) anuales
+        n_steps: número de pasos
+        dt: tamaño del paso en años
+        rng: numpy Generator
+
+    Returns:
+        array (n, n_steps + 1) con el precio inicial en la columna 0
+    """
+    start_prices = np.asarray(start_prices, dtype=float).reshape(-1)
+    mu = np.broadcast_to(np.asarray(mu, dtype=float), start_prices.shape)[:, None]
+    sigma = np.broadcast_to(np.asarray(sigma, dtype=float), start_prices.shape)[:, None]
+
+    shocks = rng.standard_normal((start_prices.size, n_steps))
+    log_steps = (mu - 0.5 * sigma ** 2) * dt + sigma * np.sqrt(dt) * shocks
+    log_paths = np.concatenate(
+        [np.zeros((start_prices.size, 1)), np.cumsum(log_steps, axis=1)], axis=1
+    )
+    return start_prices[:, None] * np.exp(log_paths)
+
+
+class SyntheticMarketProvider(MarketDataProvider):
+    """Proveedor GBM determinista para todo el universo de activos (y cualquier otro símbolo)."""
+    name = 'synthetic'
+
+    def __init__(self, seed=0, tick_seconds=60, start_date='2015-01-01'):
+        if DAY % int(tick_seconds):
+            raise ValueError("tick_seconds debe dividir un día exacto")
+        self.seed = int(seed)
+        self.tick_seconds = int(tick_seconds)
+        self.epoch = int(
+            datetime.fromisoformat(str(start_date)).replace(tzinfo=timezone.utc).timestamp()
+        )
+        self._assets = universe.by_symbol
+        self._daily = {}  # symbol -> array de log-cierres diarios (índice = día desde epoch)
+        self._lock = threading.Lock()
+
+    # ------------------------------------------------------------------
+    # Parámetros y trayectorias
+    # ------------------------------------------------------------------
+    def _rng(self, symbol, stream, index=0):
+        return np.random.default_rng([self.seed, zlib.crc32(symbol.encode()), stream, index])
+
+    def _params(self, symbol):
+        category = self._assets.get(symbol, {}).get('category', DEFAULT_CATEGORY)
+        params = CATEGORY_PARAMS.get(category, CATEGORY_PARAMS[DEFAULT_CATEGORY])
+        low, high = params['price_range']
+        start = float(np.exp(self._rng(symbol, _STREAM_PARAMS).uniform(np.log(low), np.log(high))))
+        return params['mu'], params['sigma'], start
+
+    def _log_closes(self, symbol, day):
+        """Log-cierres diarios desde el día 0 hasta `day` (incluido), ampliados por bloques."""
+        with self._lock:
+            closes = self._daily.get(symbol)
+            if closes is not None and closes.size > day:
+                return closes
+
+            mu, sigma, start = self._params(symbol)
+            dt = 1.0 / TRADING_DAYS
+            chunks = [closes] if closes is not None else []
+            last = closes[-1] if closes is not None else np.log(start)
+            chunk = (closes.size // _CHUNK_DAYS) if closes is not None else 0
+            while closes is None or closes.size <= day:
+                shocks = self._rng(symbol, _STREAM_DAILY, chunk).standard_normal(_CHUNK_DAYS)
+                steps = (mu - 0.5 * sigma ** 2) * dt + sigma * np.sqrt(dt) * shocks
+                block = last + np.cumsum(steps)
+                chunks.append(block)
+                closes = np.concatenate(chunks)
+                last = block[-1]
+                chunk += 1
+            self._daily[symbol] = closes
+            return closes
+
+    def _day_of(self, ts):
+        return int((ts - self.epoch) // DAY)
+
+    def _intraday_ticks(self, symbol, day, log_open, log_close):
+        """Puente browniano de un día: log-precio al final de cada tick."""
+        _, sigma, _ = self._params(symbol)
+        n = DAY // self.tick_seconds
+        dt = 1.0 / (TRADING_DAYS * n)
+        walk = np.cumsum(self._rng(symbol, _STREAM_INTRADAY, day).standard_normal(n) * np.sqrt(dt))
+        frac = np.arange(1, n + 1) / n
+        bridge = walk - frac * walk[-1]
+        return log_open + (log_close - log_open) * frac + sigma * bridge
+
+    def _tick_series(self, symbol, start_ts, end_ts):
+        """Tiempos (fin de tick) y log-precios entre start_ts y end_ts."""
+        first_day = max(self._day_of(start_ts), 0)
+        last_day = self._day_of(end_ts)
+        if last_day < first_day:
+            return np.empty(0), np.empty(0)
+        closes = self._log_closes(symbol, last_day)
+        _, _, start_price = self._params(symbol)
+
+        n = DAY // self.tick_seconds
+        offsets = np.arange(1, n + 1) * self.tick_seconds
+        times, prices = [], []
+        for day in range(first_day, last_day + 1):
+            log_open = closes[day - 1] if day > 0 else np.log(start_price)
+            times.append(self.epoch + day * DAY + offsets)
+            prices.append(self._intraday_ticks(symbol, day, log_open, closes[day]))
+        times = np.concatenate(times)
+        prices = np.concatenate(prices)
+        mask = (times > start_ts) & (times <= end_ts)
+        return times[mask], prices[mask]
+
+    def current_price(self, symbol, now=None):
+        now = time.time() if now is None else now
+        day = self._day_of(now)
+        closes = self._log_closes(symbol, day)
+        log_open = closes[day - 1] if day > 0 else np.log(self._params(symbol)[2])
+        ticks = int((now - (self.epoch + day * DAY)) // self.tick_seconds)
+        if ticks <= 0:
+            return float(np.exp(log_open))
+        path = self._intraday_ticks(symbol, day, log_open, closes[day])
+        return float(np.exp(path[ticks - 1]))
+
+    # ------------------------------------------------------------------
+    # Velas
+    # ------------------------------------------------------------------
+    def _intraday_bars(self, symbol, step, start_ts, end_ts):
+        times, log_prices = self._tick_series(symbol, start_ts, end_ts)
+        if times.size == 0:
+            return pd.DataFrame(columns=['Open', 'High', 'Low', 'Close', 'Volume'])
+        prices = np.exp(log_prices)
+
+        # Agrupar ticks por vela (la vela empieza en un múltiplo de `step`)
+        bar_ids = (times - 1) // step
+        starts = np.flatnonzero(np.r_[True, bar_ids[1:] != bar_ids[:-1]])
+        close = prices[np.r_[starts[1:] - 1, prices.size - 1]]
+        opens = np.r_[prices[0], close[:-1]]
+        high = np.maximum(np.maximum.reduceat(prices, starts), opens)
+        low = np.minimum(np.minimum.reduceat(prices, starts), opens)
+        volume = self._volume(symbol, bar_ids[starts])
+        index = pd.to_datetime(bar_ids[starts] * step, unit='s', utc=True)
+        return pd.DataFrame(
+            {'Open': opens, 'High': high, 'Low': low, 'Close': close, 'Volume': volume}, index=index
+        )
+
+    def _daily_bars(self, symbol, start_ts, end_ts):
+        first_day = max(self._day_of(start_ts), 0)
+        last_day = self._day_of(end_ts)
+        if last_day < first_day:
+            return pd.DataFrame(columns=['Open', 'High', 'Low', 'Close', 'Volume'])
+        log_closes = self._log_closes(symbol, last_day)
+        _, sigma, start_price = self._params(symbol)
+
+        days = np.arange(first_day, last_day + 1)
+        close = np.exp(log_closes[days])
+        close[-1] = self.current_price(symbol, end_ts)  # el día en curso cierra en el precio actual
+        opens = np.exp(np.where(days > 0, log_closes[np.maximum(days - 1, 0)], np.log(start_price)))
+
+        # Máximos/mínimos aproximados con un recorrido intradía típico
+        spread = self._noise(symbol, days, 'range') * sigma / np.sqrt(TRADING_DAYS)
+        high = np.maximum(opens, close) * np.exp(spread)
+        low = np.minimum(opens, close) * np.exp(-spread)
+        index = pd.to_datetime(self.epoch + days * DAY, unit='s', utc=True)
+        return pd.DataFrame(
+            {'Open': opens, 'High': high, 'Low': low, 'Close': close,
+             'Volume': self._volume(symbol, days)},
+            index=index,
+        )
+
+    def _noise(self, symbol, keys, salt):
+        """Ruido uniforme [0, 1) determinista por clave (no depende de la ventana pedida)."""
+        keys = np.asarray(keys, dtype=np.uint64)
+        mixed = (keys * np.uint64(2654435761) + np.uint64(zlib.crc32(f"{symbol}:{salt}".encode())))
+        mixed ^= mixed >> np.uint64(13)
+        return (mixed % np.uint64(10_000)).astype(float) / 10_000.0
+
+    def _volume(self, symbol, keys):
+        base = zlib.crc32(symbol.encode()) % 1_000_000 + 10_000
+        return base * (0.5 + self._noise(symbol, keys, 'volume'))
+
+    def _bars(self, symbol, interval, start_ts, end_ts):
+        step = INTERVAL_SECONDS.get(interval)
+        if step is None:
+            raise MarketDataError(f"Intervalo no soportado en modo sintético: {interval}")
+        if step < DAY:
+            return self._intraday_bars(symbol, step, start_ts, end_ts)
+
+        daily = self._daily_bars(symbol, start_ts, end_ts)
+        if step == DAY or daily.empty:
+            return daily
+        rule = 'W-MON' if interval == '1wk' else f'{step // DAY}D'
+        return daily.resample(rule, label='left', closed='left').agg(
+            {'Open': 'first', 'High': 'max', 'Low': 'min', 'Close': 'last', 'Volume': 'sum'}
+        ).dropna(subset=['Close'])
+
+    def _window(self, period, start):
+        end_ts = time.time()
+        if start is not None:
+            start_ts = pd.Timestamp(start)
+            if start_ts.tzinfo is None:
+                start_ts = start_ts.tz_localize('UTC')
+            return start_ts.timestamp(), end_ts
+        seconds = PERIOD_SECONDS.get(period or '1mo', PERIOD_SECONDS['1mo'])
+        return max(end_ts - seconds, self.epoch), end_ts
+
+    # ------------------------------------------------------------------
+    # Interfaz del proveedor
+    # ------------------------------------------------------------------
+    def get_info(self, symbol):
+        asset = self._assets.get(symbol, {})
+        now = time.time()
+        price = self.current_price(symbol, now)
+        day = self._day_of(now)
+        previous_close = float(np.exp(self._log_closes(symbol, day)[max(day - 1, 0)]))
+        name = asset.get('name', symbol)
+        return {
+            'symbol': symbol,
+            'longName': name,
+            'shortName': name,
+            'currentPrice': price,
+            'regularMarketPrice': price,
+            'previousClose': previous_close,
+            'regularMarketPreviousClose': previous_close,
+            'longBusinessSummary': 'Activo simulado (mercado sintético GBM).',
+            'sector': 'Simulado',
+            'industry': asset.get('category', DEFAULT_CATEGORY),
+        }
+
+    def get_history(self, symbol, interval='1d', period=None, start=None, auto_adjust=True):
+        start_ts, end_ts = self._window(period, start)
+        return self._bars(symbol, interval, start_ts, end_ts)
+
+    def get_bulk_closes(self, symbols, period='1mo', interval='1d'):
+        start_ts, end_ts = self._window(period, None)
+        closes = {}
+        for symbol in symbols:
+            bars = self._bars(symbol, interval, start_ts, end_ts)
+            if not bars.empty:
+                closes[symbol] = bars['Close']
+        return closes
@@ -0,0 +1,94 @@
+"""
+Universo de activos del mercado, cargado desde un fichero de datos.
+
+Antes era una lista escrita a mano en `utils.py`: añadir un activo era cambiar
+código y buscar uno (`asset_detail`) recorría la lista entera. Ahora se lee de
+`app/data/market_universe.csv` (columnas `symbol,name,category`; otra ruta con
+MARKET_UNIVERSE_PATH) y al cargar se construyen una vez los índices por símbolo
+y por categoría.
+
+`MARKET_UNIVERSE` (en `app.utils.utils`) sigue siendo la lista de dicts de
+siempre, en el orden del fichero.
+"""
+
+import csv
+import os
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'market_universe.csv')
+
+# Orden de las pestañas del mercado; las categorías nuevas del fichero van detrás
+CATEGORY_LABELS = {
+    'acciones': 'Acciones',
+    'fondos': 'Fondos',
+    'etfs': 'ETFs',
+    'renta-fija': 'Renta Fija',
+    'crypto': 'Criptomonedas',
+}
+
+
+class AssetUniverse:
+    """Activos en el orden del fichero, con índices por símbolo y por categoría."""
+
+    def __init__(self, assets):
+        self.assets = []
+        self.by_symbol = {}
+        self.by_category = {}
+        for asset in assets:
+            symbol = asset['symbol']
+            if symbol in self.by_symbol:
+                print(f"⚠️ Activo repetido en el universo: {symbol} (se usa la primera entrada)")
+                continue
+            self.assets.append(asset)
+            self.by_symbol[symbol] = asset
+            self.by_category.setdefault(asset['category'], []).append(asset)
+
+        known = [c for c in CATEGORY_LABELS if c in self.by_category]
+        self.categories = known + [c for c in self.by_category if c not in CATEGORY_LABELS]
+
+    def __len__(self):
+        return len(self.assets)
+
+    def __contains__(self, symbol):
+        return symbol in self.by_symbol
+
+    def get(self, symbol):
+        """Activo de `symbol` (dict con symbol, name y category) o None."""
+        return self.by_symbol.get(symbol)
+
+    def category_of(self, symbol):
+        asset = self.by_symbol.get(symbol)
+        return asset['category'] if asset else None
+
+    def name_of(self, symbol, default=None):
+        asset = self.by_symbol.get(symbol)
+        return asset['name'] if asset else default
+
+    def in_category(self, category):
+        """Activos de una categoría (todos si `category` es None o 'all')."""
+        if category in (None, 'all'):
+            return self.assets
+        return self.by_category.get(category, [])
+
+    def category_label(self, category):
+        return CATEGORY_LABELS.get(category, category.replace('-', ' ').title())
+
+
+def load_universe(path=None):
+    """Lee el CSV del universo. Las filas sin símbolo o sin categoría se ignoran."""
+    path = path or os.getenv('MARKET_UNIVERSE_PATH', DEFAULT_PATH)
+    assets = []
+    with open(path, newline='', encoding='utf-8') as fh:
+        for row in csv.DictReader(fh):
+            symbol = (row.get('symbol') or '').strip().upper()
+            category = (row.get('category') or '').strip()
+            if not symbol or not category:
+                continue
+            assets.append({
+                'name': (row.get('name') or '').strip() or symbol,
+                'symbol': symbol,
+                'category': category,
+            })
+    return AssetUniverse(assets)
+
+
+universe = load_universe()
@@ -0,0 +1,49 @@
+"""
+Reducción de series para gráficos con Largest-Triangle-Three-Buckets (LTTB).
+
+Conserva la forma visual de la serie (picos y valles) con muchos menos puntos:
+el primero y el último se mantienen y de cada cubo intermedio se elige el punto
+que forma el triángulo de mayor área con el punto elegido en el cubo anterior y
+la media del cubo siguiente.
+"""
+
+import numpy as np
+
+
+def lttb_indices(x, y, n_out):
+    """
+    Índices (ordenados) de los `n_out` puntos que LTTB conserva de la serie (x, y).
+    Si la serie ya tiene `n_out` puntos o menos se devuelven todos.
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    # Cubos intermedios: n - 2 puntos repartidos en n_out - 2 cubos
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+    selected = np.empty(n_out, dtype=int)
+    selected[0] = 0
+    selected[-1] = n - 1
+
+    a = 0
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+        # Media del cubo siguiente (el último punto para el último cubo)
+        if i + 2 < len(edges):
+            next_start, next_end = edges[i + 1], edges[i + 2]
+            avg_x = x[next_start:next_end].mean()
+            avg_y = y[next_start:next_end].mean()
+        else:
+            avg_x, avg_y = x[-1], y[-1]
+
+        # Área (x2) del triángulo con el punto anterior, cada candidato y la media siguiente
+        areas = np.abs(
+            (x[a] - avg_x) * (y[start:end] - y[a])
+            - (x[a] - x[start:end]) * (avg_y - y[a])
+        )
+        a = start + int(np.argmax(areas))
+        selected[i + 1] = a
+
+    return selected
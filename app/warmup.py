@@ -0,0 +1,214 @@
+"""
+Precalentamiento priorizado de las cachés de mercado.
+
+Antes `preload_favorites` recorría el universo en serie (activo x periodo, unas
+400 descargas seguidas) y nunca se llamaba. Aquí se calientan, con un pool de
+hilos acotado y por orden de prioridad:
+
+1. los activos que tienen los usuarios en cartera,
+2. los más visitados (tabla `asset_views`),
+3. el resto del universo.
+
+Para cada activo: metadatos, series de velas de los gráficos y, si no está en
+el universo, su precio. El snapshot en vivo no se toca: lo llena el refrescador
+elegido (`refresh_leader`), el único proceso que lo consulta y publica. Solo se
+descarga lo que falta o ha caducado, así que repetirlo (otro worker, un
+reinicio) apenas cuesta. Cada tarea descarga de forma bloqueante dentro del
+pool, así que `workers` limita de verdad las consultas simultáneas al proveedor.
+
+Se lanza al arrancar el servidor (MARKET_WARMUP_ON_START, desde
+`start_background_services`; un solo worker gracias a un lock) o a mano con
+`flask market-warmup`. Importar el paquete no lo arranca.
+"""
+
+import concurrent.futures
+import threading
+import time
+from datetime import datetime
+
+import click
+
+from app.asset_metadata import get_cached_metadata, is_metadata_fresh, is_metadata_miss
+from app.bar_store import get_bar_store
+from app.last_known_prices import get_last_known
+from app.refresh_leader import LeaderLease
+from app.universe import universe
+
+# Periodos de gráfico que se precalientan (y por tanto sus series de velas)
+WARMUP_PERIODS = ('1D', '1S', '1M', '6M')
+DEFAULT_WORKERS = 8
+
+
+# Visitas a fichas de activo: se cuentan en memoria y se escriben en BD por lotes
+# desde un hilo aparte (write-behind), como los últimos precios conocidos
+VIEWS_FLUSH_SECONDS = 30
+
+_app = None
+_pending_views = {}  # symbol -> (visitas, última visita)
+_views_lock = threading.Lock()
+_views_flush_lock = threading.Lock()
+_views_flush_scheduled = False
+
+
+def record_asset_view(symbol):
+    """Suma una visita a la ficha de `symbol` sin tocar la BD en la petición."""
+    global _views_flush_scheduled
+    with _views_lock:
+        count, _ = _pending_views.get(symbol, (0, None))
+        _pending_views[symbol] = (count + 1, datetime.utcnow())
+        if _views_flush_scheduled or _app is None:
+            return
+        _views_flush_scheduled = True
+    threading.Thread(target=_flush_views_later, name="asset-views-flush", daemon=True).start()
+
+
+def _flush_views_later():
+    global _views_flush_scheduled
+    time.sleep(VIEWS_FLUSH_SECONDS)
+    with _views_lock:
+        _views_flush_scheduled = False
+    flush_asset_views()
+
+
+def flush_asset_views():
+    """Escribe en BD (un único commit) las visitas acumuladas. Devuelve cuántos símbolos."""
+    from app import db
+    from app.models import AssetView
+
+    with _views_lock:
+        batch = dict(_pending_views)
+        _pending_views.clear()
+    if not batch or _app is None:
+        return 0
+
+    with _views_flush_lock:
+        try:
+            with _app.app_context():
+                existing = {
+                    v.symbol: v
+                    for v in AssetView.query.filter(AssetView.symbol.in_(list(batch))).all()
+                }
+                for symbol, (count, viewed_at) in batch.items():
+                    view = existing.get(symbol)
+                    if view is None:
+                        db.session.add(AssetView(symbol=symbol, views=count, last_viewed_at=viewed_at))
+                    else:
+                        view.views = AssetView.views + count  # incremento atómico en SQL
+                        view.last_viewed_at = viewed_at
+                db.session.commit()
+        except Exception as e:
+            print(f"⚠️ No se pudieron registrar {len(batch)} visitas a activos: {e}")
+            return 0
+    return len(batch)
+
+
+def prioritized_symbols():
+    """Símbolos del universo (y de las carteras) ordenados por prioridad de precalentamiento."""
+    from app import db
+    from app.models import AssetView, Holding
+
+    held, viewed = [], []
+    try:
+        held = [
+            symbol for symbol, _ in db.session.query(Holding.symbol, db.func.count(Holding.id))
+            .filter(Holding.quantity > 0)
+            .group_by(Holding.symbol)
+            .order_by(db.func.count(Holding.id).desc())
+        ]
+        viewed = [v.symbol for v in AssetView.query.order_by(AssetView.views.desc())]
+    except Exception as e:
+        print(f"⚠️ Sin datos de prioridad para el precalentamiento: {e}")
+
+    ordered = list(dict.fromkeys(held + [s for s in viewed if s in universe] + list(universe.by_symbol)))
+    return ordered, len(held)
+
+
+def _series_needs_fill(symbol, interval, now):
+    from app.market_service import BAR_SERIES
+    info = get_bar_store().series_info(symbol, interval)
+    if info is None or not info['last_ts']:
+        return True
+    return now - info['last_fetch'] >= BAR_SERIES[interval]['topup_after']
+
+
+def _price_needs_fetch(symbol):
+    from app import market_service as ms
+    if ms.get_known_price(symbol):
+        return False
+    last_known = get_last_known(symbol)
+    return last_known is None or not ms.is_quote_current(symbol, last_known['updated_at'])
+
+
+def warm_up(app, workers=DEFAULT_WORKERS, periods=WARMUP_PERIODS):
+    """
+    Calienta precios fuera del universo, metadatos y series por prioridad con `workers` hilos.
+    Devuelve un resumen con el número de tareas, errores y el tiempo total.
+    """
+    from app import market_service as ms
+
+    started = time.time()
+    with app.app_context():
+        symbols, n_held = prioritized_symbols()
+    intervals = list(dict.fromkeys(ms.HISTORY_PERIODS[p]['interval'] for p in periods))
+    now = time.time()
+
+    # Tareas en orden de prioridad: el pool FIFO respeta ese orden. Se llama a las
+    # descargas bloqueantes (con single-flight), no a las lecturas que refrescan en otro hilo
+    tasks = []
+    for symbol in symbols:
+        if symbol not in universe and _price_needs_fetch(symbol):
+            tasks.append((f"price {symbol}", ms._refresh_price, (symbol,)))
+        if not is_metadata_fresh(get_cached_metadata(symbol), now) and not is_metadata_miss(symbol):
+            tasks.append((f"meta {symbol}", ms.single_flight, (("meta", symbol), ms._fetch_asset_metadata, symbol)))
+        for interval in intervals:
+            if _series_needs_fill(symbol, interval, now):
+                tasks.append((f"bars {symbol} {interval}", ms.update_bar_series, (symbol, interval)))
+
+    total = len(tasks)
+    print(f"🔥 Precalentamiento: {total} tareas para {len(symbols)} activos "
+          f"({n_held} en cartera) con {workers} hilos")
+    done = errors = 0
+    step = max(total // 10, 1)
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers, thread_name_prefix="warmup") as pool:
+        futures = {pool.submit(fn, *args): label for label, fn, args in tasks}
+        for future in concurrent.futures.as_completed(futures):
+            done += 1
+            try:
+                future.result()
+            except Exception as e:
+                errors += 1
+                print(f"❌ Precalentamiento {futures[future]}: {e}")
+            if done % step == 0 or done == total:
+                print(f"🔥 {done}/{total} ({done * 100 // max(total, 1)}%) en {time.time() - started:.1f}s")
+
+    elapsed = time.time() - started
+    print(f"✅ Precalentamiento terminado en {elapsed:.1f}s ({errors} errores)")
+    return {'symbols': len(symbols), 'tasks': total, 'errors': errors, 'seconds': round(elapsed, 2)}
+
+
+def start_warmup(app, lock_path, workers=DEFAULT_WORKERS):
+    """Precalienta en segundo plano si ningún otro worker del host lo está haciendo ya."""
+    def run():
+        lease = LeaderLease(lock_path, role='precalentador del mercado')
+        if not lease.try_acquire():
+            return
+        try:
+            warm_up(app, workers=workers)
+        finally:
+            lease.release()
+
+    thread = threading.Thread(target=run, name="market-warmup", daemon=True)
+    thread.start()
+    return thread
+
+
+def register_warmup(app):
+    """Registra el comando `flask market-warmup` y la escritura diferida de visitas."""
+    global _app
+    _app = app
+
+    @app.cli.command('market-warmup')
+    @click.option('--workers', default=DEFAULT_WORKERS, show_default=True, help='Hilos en paralelo.')
+    def market_warmup_command(workers):
+        """Precalienta metadatos, gráficos y precios fuera del universo por prioridad."""
+        warm_up(app, workers=workers)
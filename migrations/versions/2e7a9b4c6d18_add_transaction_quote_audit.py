@@ -0,0 +1,28 @@
+"""add quote age/source to transactions
+
+Revision ID: 2e7a9b4c6d18
+Revises: 8d3e6c2a1f57
+Create Date: 2026-10-16 14:05:27.551903
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '2e7a9b4c6d18'
+down_revision = '8d3e6c2a1f57'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('transactions', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('quote_age', sa.Float(), nullable=True))
+        batch_op.add_column(sa.Column('quote_source', sa.String(length=20), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('transactions', schema=None) as batch_op:
+        batch_op.drop_column('quote_source')
+        batch_op.drop_column('quote_age')
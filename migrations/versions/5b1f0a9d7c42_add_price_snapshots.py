@@ -0,0 +1,31 @@
+"""add price_snapshots (last known good prices)
+
+Revision ID: 5b1f0a9d7c42
+Revises: c23e80e28b2f
+Create Date: 2026-10-16 10:12:03.418230
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5b1f0a9d7c42'
+down_revision = 'c23e80e28b2f'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('price_snapshots',
+    sa.Column('symbol', sa.String(length=20), nullable=False),
+    sa.Column('name', sa.String(length=255), nullable=True),
+    sa.Column('price', sa.Float(), nullable=False),
+    sa.Column('previous_close', sa.Float(), nullable=True),
+    sa.Column('captured_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('symbol')
+    )
+
+
+def downgrade():
+    op.drop_table('price_snapshots')
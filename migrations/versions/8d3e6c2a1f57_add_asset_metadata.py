@@ -0,0 +1,37 @@
+"""add asset_metadata (long-lived asset info cache)
+
+Revision ID: 8d3e6c2a1f57
+Revises: 5b1f0a9d7c42
+Create Date: 2026-10-16 12:47:51.902114
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8d3e6c2a1f57'
+down_revision = '5b1f0a9d7c42'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('asset_metadata',
+    sa.Column('symbol', sa.String(length=20), nullable=False),
+    sa.Column('name', sa.String(length=255), nullable=True),
+    sa.Column('description', sa.Text(), nullable=True),
+    sa.Column('sector', sa.String(length=100), nullable=True),
+    sa.Column('industry', sa.String(length=100), nullable=True),
+    sa.Column('fund_category', sa.String(length=100), nullable=True),
+    sa.Column('market_cap', sa.Float(), nullable=True),
+    sa.Column('total_assets', sa.Float(), nullable=True),
+    sa.Column('expense_ratio', sa.Float(), nullable=True),
+    sa.Column('ytd_return', sa.Float(), nullable=True),
+    sa.Column('fetched_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('symbol')
+    )
+
+
+def downgrade():
+    op.drop_table('asset_metadata')
@@ -0,0 +1,29 @@
+"""add asset_views (per-asset page view counter)
+
+Revision ID: a4c8e1f3b925
+Revises: 2e7a9b4c6d18
+Create Date: 2026-10-16 15:21:40.284417
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a4c8e1f3b925'
+down_revision = '2e7a9b4c6d18'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('asset_views',
+    sa.Column('symbol', sa.String(length=20), nullable=False),
+    sa.Column('views', sa.Integer(), nullable=False),
+    sa.Column('last_viewed_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('symbol')
+    )
+
+
+def downgrade():
+    op.drop_table('asset_views')
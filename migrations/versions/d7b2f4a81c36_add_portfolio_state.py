@@ -0,0 +1,45 @@
+"""add portfolio_states and portfolio_positions (materialized ledger state)
+
+Revision ID: d7b2f4a81c36
+Revises: a4c8e1f3b925
+Create Date: 2026-10-16 18:02:11.530947
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd7b2f4a81c36'
+down_revision = 'a4c8e1f3b925'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('portfolio_states',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('cash', sa.Float(), nullable=False),
+    sa.Column('realized_pnl', sa.Float(), nullable=False),
+    sa.Column('trade_count', sa.Integer(), nullable=False),
+    sa.Column('sell_count', sa.Integer(), nullable=False),
+    sa.Column('winning_sell_count', sa.Integer(), nullable=False),
+    sa.Column('last_transaction_id', sa.Integer(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('user_id')
+    )
+    op.create_table('portfolio_positions',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('symbol', sa.String(length=20), nullable=False),
+    sa.Column('quantity', sa.Float(), nullable=False),
+    sa.Column('cost_basis', sa.Float(), nullable=False),
+    sa.Column('realized_pnl', sa.Float(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('user_id', 'symbol')
+    )
+
+
+def downgrade():
+    op.drop_table('portfolio_positions')
+    op.drop_table('portfolio_states')
@@ -0,0 +1,38 @@
+"""add portfolio_checkpoints (periodic ledger checkpoints)
+
+Revision ID: e91c5a3d7f20
+Revises: d7b2f4a81c36
+Create Date: 2026-10-16 19:10:42.118305
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e91c5a3d7f20'
+down_revision = 'd7b2f4a81c36'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('portfolio_checkpoints',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('transaction_id', sa.Integer(), nullable=False),
+    sa.Column('cash', sa.Float(), nullable=False),
+    sa.Column('realized_pnl', sa.Float(), nullable=False),
+    sa.Column('trade_count', sa.Integer(), nullable=False),
+    sa.Column('sell_count', sa.Integer(), nullable=False),
+    sa.Column('winning_sell_count', sa.Integer(), nullable=False),
+    sa.Column('positions', sa.JSON(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('user_id', 'transaction_id', name='uq_portfolio_checkpoint_txn')
+    )
+
+
+def downgrade():
+    op.drop_table('portfolio_checkpoints')
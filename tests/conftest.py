@@ -0,0 +1,24 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# La app lee la configuración al importarse: BD y almacén de velas temporales
+_tmpdir = tempfile.mkdtemp(prefix='simvest-tests-')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(_tmpdir, 'test.db')}"
+os.environ['BAR_STORE_PATH'] = os.path.join(_tmpdir, 'bars.db')
+
+
+@pytest.fixture
+def app():
+    from app import app as flask_app, db
+    with flask_app.app_context():
+        db.drop_all()
+        db.create_all()
+    yield flask_app
+    with flask_app.app_context():
+        db.session.remove()
@@ -0,0 +1,85 @@
+import threading
+
+from app import db
+from app.models import Transaction, User
+from app.portfolio_state import get_ledger_state, lock_user_ledger, record_trade, verify_portfolio_state
+
+INITIAL_CAPITAL = 100.0
+
+
+def _buy(user_id, quantity, price=10.0):
+    return Transaction(
+        user_id=user_id, symbol='AAPL', asset_name='Apple', type='BUY', quantity=quantity,
+        price_per_unit=price, total_amount=quantity * price, commission_amount=0.0, status='executed'
+    )
+
+
+def _trade(app, user_id, quantity, locked, release=None, results=None):
+    """Compra con el mismo flujo que el controlador, en su propia sesión (hilo)."""
+    with app.app_context():
+        user = lock_user_ledger(user_id)
+        locked.set()
+        if release is not None:
+            release.wait(5)
+        cost = quantity * 10.0
+        if user.capital < cost:
+            db.session.rollback()
+            results.append('rejected')
+            return
+        user.capital -= cost
+        txn = _buy(user_id, quantity)
+        db.session.add(txn)
+        record_trade(txn, INITIAL_CAPITAL)
+        db.session.commit()
+        results.append('executed')
+
+
+def test_interleaved_trades_of_one_user_are_serialized(app):
+    with app.app_context():
+        user = User(username='alice', email='alice@example.com', password_hash='x', capital=INITIAL_CAPITAL)
+        db.session.add(user)
+        db.session.commit()
+        user_id = user.id
+
+    results = []
+    a_locked, a_release, b_locked = threading.Event(), threading.Event(), threading.Event()
+    # Primera operación de ambos: ninguno tiene aún estado materializado
+    a = threading.Thread(target=_trade, args=(app, user_id, 8, a_locked, a_release, results))
+    b = threading.Thread(target=_trade, args=(app, user_id, 8, b_locked, None, results))
+    a.start()
+    assert a_locked.wait(5)
+    b.start()
+    # B espera al lock mientras A no confirme
+    assert not b_locked.wait(0.3)
+    a_release.set()
+    a.join(10)
+    b.join(10)
+
+    # La segunda compra se valida contra el capital que dejó la primera
+    assert sorted(results) == ['executed', 'rejected']
+    with app.app_context():
+        assert db.session.get(User, user_id).capital == INITIAL_CAPITAL - 80
+        assert verify_portfolio_state(user_id, INITIAL_CAPITAL) == []
+
+
+def test_concurrent_trades_keep_state_in_sync_with_the_ledger(app):
+    with app.app_context():
+        user = User(username='bob', email='bob@example.com', password_hash='x', capital=1e9)
+        db.session.add(user)
+        db.session.commit()
+        user_id = user.id
+
+    results = []
+    threads = [
+        threading.Thread(target=_trade, args=(app, user_id, 1, threading.Event(), None, results))
+        for _ in range(8)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(30)
+
+    assert results == ['executed'] * 8
+    with app.app_context():
+        assert verify_portfolio_state(user_id, INITIAL_CAPITAL) == []
+        assert get_ledger_state(user_id).trade_count == 8
@@ -0,0 +1,4 @@
+# Punto de entrada para servidores WSGI: `gunicorn wsgi:app`
+from app import app, start_background_services
+
+start_background_services(app)